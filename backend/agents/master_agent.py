@@ -1,28 +1,41 @@
 """
 Master Agent - Orchestrates the entire loan application workflow
 """
+from services.state_store import StateStore, create_state_store
+from services.metrics import metrics_registry
+from agents.pipeline import pipeline
+
+# A new conversation's state
+INITIAL_STATE = {
+    'stage': 'greeting',  # greeting, collect_info, kyc, underwriting, sanction
+    'data': {},
+    'application_id': None
+}
 
 class MasterAgent:
-    def __init__(self):
-        self.conversation_state = {}
+    def __init__(self, state_store: StateStore = None):
+        # Bounded, expiring store selected by STATE_STORE_BACKEND
+        self.state_store = state_store or create_state_store()
     
     def get_or_create_state(self, user_id: str) -> dict:
         """Get or create conversation state for a user"""
-        if user_id not in self.conversation_state:
-            self.conversation_state[user_id] = {
-                'stage': 'greeting',  # greeting, collect_info, kyc, underwriting, sanction
-                'data': {},
-                'application_id': None
-            }
-        return self.conversation_state[user_id]
+        state = self.state_store.get(user_id)
+        if state is None:
+            # An empty merge creates the state without overwriting one created meanwhile
+            state = self.state_store.merge(user_id, {}, INITIAL_STATE)
+        return state
     
     def update_state(self, user_id: str, stage: str = None, data: dict = None):
-        """Update conversation state"""
-        state = self.get_or_create_state(user_id)
+        """
+        Update conversation state. Applied as one atomic merge, so a background KYC job and
+        a chat turn updating the same user do not overwrite each other's data.
+        """
+        changes = {}
         if stage:
-            state['stage'] = stage
+            changes['stage'] = stage
         if data:
-            state['data'].update(data)
+            changes['data'] = data
+        self.state_store.merge(user_id, changes, INITIAL_STATE)
     
     def get_current_stage(self, user_id: str) -> str:
         """Get current conversation stage"""
@@ -36,8 +49,7 @@ class MasterAgent:
     
     def set_application_id(self, user_id: str, application_id: str):
         """Set the loan application ID"""
-        state = self.get_or_create_state(user_id)
-        state['application_id'] = application_id
+        self.state_store.merge(user_id, {'application_id': application_id}, INITIAL_STATE)
     
     def get_application_id(self, user_id: str) -> str:
         """Get the loan application ID"""
@@ -46,39 +58,15 @@ class MasterAgent:
     
     def reset_state(self, user_id: str):
         """Reset conversation state"""
-        if user_id in self.conversation_state:
-            del self.conversation_state[user_id]
+        self.state_store.delete(user_id)
     
     def route_message(self, user_id: str, message: str, has_file: bool = False) -> dict:
         """
-        Route message to appropriate agent based on current stage
+        Route message to the agent registered for the current stage
         Returns: dict with 'response', 'next_stage', and optional 'data'
         """
-        current_stage = self.get_current_stage(user_id)
-        
-        # Import agents here to avoid circular imports
-        from agents.sales_agent import sales_agent
-        from agents.verification_agent import verification_agent
-        from agents.underwriting_agent import underwriting_agent
-        from agents.sanction_agent import sanction_agent
-        
-        if current_stage == 'greeting' or current_stage == 'collect_info':
-            return sales_agent.process(user_id, message, self)
-        
-        elif current_stage == 'kyc':
-            return verification_agent.process(user_id, message, has_file, self)
-        
-        elif current_stage == 'underwriting':
-            return underwriting_agent.process(user_id, message, self)
-        
-        elif current_stage == 'sanction':
-            return sanction_agent.process(user_id, message, self)
-        
-        else:
-            return {
-                'response': 'I apologize, but something went wrong. Let\'s start over. What\'s your name?',
-                'next_stage': 'greeting'
-            }
+        return pipeline.dispatch(self.get_current_stage(user_id), user_id, message, has_file, self)
 
 # Singleton instance
 master_agent = MasterAgent()
+metrics_registry.register_collector('conversation_state', master_agent.state_store.stats)
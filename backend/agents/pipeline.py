@@ -0,0 +1,155 @@
+"""
+Agent Pipeline - Declarative stage graph: stage handlers, auto-trigger transitions and per-stage timing
+"""
+import importlib
+import os
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Union
+from services.agent_executor import agent_executor
+from services.metrics import metrics_registry
+from services.tracing import span
+
+# Agent modules that register the built-in stages when imported
+STAGE_MODULES = (
+    'agents.sales_agent',
+    'agents.verification_agent',
+    'agents.underwriting_agent',
+    'agents.sanction_agent',
+)
+
+UNKNOWN_STAGE_RESPONSE = {
+    'response': 'I apologize, but something went wrong. Let\'s start over. What\'s your name?',
+    'next_stage': 'greeting'
+}
+
+def _ms(seconds):
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+class Stage:
+    """A conversation stage: its handler, executor pool stage and outgoing auto-trigger transitions"""
+
+    def __init__(self, name: str, handler: Callable[..., dict], executor_stage: str,
+                 accepts_file: bool, transitions: Dict[str, str]):
+        self.name = name
+        self.handler = handler
+        self.executor_stage = executor_stage
+        self.accepts_file = accepts_file
+        # result flag -> stage to run next in the same turn (e.g. trigger_sanction -> sanction)
+        self.transitions = transitions
+        self.histogram = metrics_registry.histogram(f'pipeline.{name}.seconds')
+        self.calls = 0
+        self.errors = 0
+
+    def __call__(self, user_id: str, message: str, has_file: bool, master_agent) -> dict:
+        self.calls += 1
+        try:
+            # Observes self.histogram (pipeline.<stage>.seconds)
+            with span(f'pipeline.{self.name}'):
+                if self.accepts_file:
+                    return self.handler(user_id, message, has_file, master_agent)
+                return self.handler(user_id, message, master_agent)
+        except Exception:
+            self.errors += 1
+            raise
+
+class StagePipeline:
+    """
+    Stage graph for the loan conversation.
+
+    Agents register their handlers (and the stages their results can auto-trigger) at
+    import time; dispatch is a dict lookup on the user's current stage. run() executes
+    the routed stage, applies its next_stage, then follows transitions stage by stage,
+    each on its executor pool stage. Auto-triggered stages update the conversation state
+    themselves, as before.
+    """
+
+    def __init__(self):
+        self.table: Dict[str, Stage] = {}
+        self._loaded = False
+
+    def register(self, names: Union[str, Iterable[str]], handler: Callable[..., dict],
+                 executor_stage: str = None, accepts_file: bool = False,
+                 transitions: Dict[str, str] = None):
+        """
+        Register a handler for one or more conversation stages.
+        Handlers take (user_id, message, master_agent), or (user_id, message, has_file,
+        master_agent) with accepts_file=True, and return the agent result dict.
+        """
+        for name in ([names] if isinstance(names, str) else names):
+            self.table[name] = Stage(name, handler, executor_stage or name, accepts_file, dict(transitions or {}))
+
+    def add_transition(self, stage: str, flag: str, target: str):
+        """Make results of `stage` carrying `flag` continue to `target` (e.g. insert a fraud check)"""
+        self.table[stage].transitions[flag] = target
+
+    def load(self, modules: Iterable[str] = None):
+        """Import the agent modules so their stages are registered (plus PIPELINE_EXTRA_MODULES)"""
+        if self._loaded and modules is None:
+            return
+        # Set first: plugin modules may call load() to extend the built-in stages
+        self._loaded = True
+        extra = [m.strip() for m in os.getenv('PIPELINE_EXTRA_MODULES', '').split(',') if m.strip()]
+        for module in list(modules or STAGE_MODULES) + extra:
+            importlib.import_module(module)
+
+    def get(self, stage: str) -> Stage:
+        self.load()
+        return self.table.get(stage)
+
+    def executor_stage(self, stage: str) -> str:
+        entry = self.get(stage)
+        return entry.executor_stage if entry else 'sales'
+
+    def dispatch(self, stage: str, user_id: str, message: str, has_file: bool, master_agent) -> dict:
+        """Run the handler for `stage` in the calling thread"""
+        entry = self.get(stage)
+        if entry is None:
+            return dict(UNKNOWN_STAGE_RESPONSE)
+        return entry(user_id, message, has_file, master_agent)
+
+    def next_stage(self, stage: str, result: Dict[str, Any]) -> str:
+        entry = self.table.get(stage)
+        if entry is None:
+            return None
+        for flag, target in entry.transitions.items():
+            if result.get(flag):
+                return target
+        return None
+
+    async def run(self, user_id: str, message: str, has_file: bool, master_agent) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run one conversation turn, yielding each stage's result as soon as it is ready.
+        Yields dicts with 'stage', 'response' and 'data' keys.
+        """
+        stage = master_agent.get_current_stage(user_id)
+        result = await agent_executor.run(
+            self.executor_stage(stage), self.dispatch, stage, user_id, message, has_file, master_agent
+        )
+        if result.get('next_stage'):
+            master_agent.update_state(user_id, stage=result['next_stage'])
+        yield {'stage': stage, 'response': result.get('response', ''), 'data': result.get('data')}
+
+        # Auto-triggered stages run with an empty message
+        stage = self.next_stage(stage, result)
+        while stage:
+            result = await agent_executor.run(
+                self.executor_stage(stage), self.dispatch, stage, user_id, '', False, master_agent
+            )
+            yield {'stage': stage, 'response': result.get('response', ''), 'data': result.get('data')}
+            stage = self.next_stage(stage, result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                'executor_stage': entry.executor_stage,
+                'transitions': entry.transitions,
+                'calls': entry.calls,
+                'errors': entry.errors,
+                'p50_ms': _ms(entry.histogram.quantile(0.5)),
+                'p95_ms': _ms(entry.histogram.quantile(0.95))
+            }
+            for name, entry in self.table.items()
+        }
+
+# Singleton instance
+pipeline = StagePipeline()
+metrics_registry.register_collector('pipeline', pipeline.stats)
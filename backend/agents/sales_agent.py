@@ -3,6 +3,7 @@ Sales Agent - Greets users, explains loan products, and collects application det
 """
 from services.supabase_client import supabase_client
 import uuid
+from agents.pipeline import pipeline
 
 class SalesAgent:
     def __init__(self):
@@ -97,3 +98,4 @@ class SalesAgent:
 
 # Singleton instance
 sales_agent = SalesAgent()
+pipeline.register(('greeting', 'collect_info'), sales_agent.process, executor_stage='sales')
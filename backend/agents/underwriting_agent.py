@@ -3,6 +3,7 @@ Underwriting Agent - Applies credit scoring logic and makes approval decisions
 """
 from services.credit_scoring import credit_scoring_service
 from services.supabase_client import supabase_client
+from agents.pipeline import pipeline
 
 class UnderwritingAgent:
     def process(self, user_id: str, message: str, master_agent) -> dict:
@@ -15,21 +16,16 @@ class UnderwritingAgent:
         income = state_data.get('income', 0)
         employment_type = state_data.get('employment_type', 'other')
         
-        # Calculate credit score
-        credit_score = credit_scoring_service.calculate_credit_score(income, employment_type)
+        # Credit score, loan eligibility and approval status (memoized in deterministic mode)
+        eligibility = credit_scoring_service.assess_applicant(income, employment_type)
+        credit_score = eligibility['credit_score']
+        status = eligibility['status']
         
-        # Calculate loan eligibility
-        eligibility = credit_scoring_service.calculate_loan_eligibility(income, credit_score)
-        
-        # Determine approval status
-        if income >= 30000 and credit_score >= 700:
-            status = 'APPROVED'
+        if status == 'APPROVED':
             decision_message = "🎉 Congratulations! Your loan application has been APPROVED!"
-        elif income >= 20000 and credit_score >= 650:
-            status = 'REVIEW'
+        elif status == 'REVIEW':
             decision_message = "📋 Your application is under REVIEW. Our team will contact you within 24 hours."
         else:
-            status = 'REJECTED'
             decision_message = "😔 We're sorry, but we cannot approve your loan application at this time."
         
         # Update loan application in database
@@ -41,7 +37,7 @@ class UnderwritingAgent:
         }
         
         if application_id:
-            supabase_client.update_loan_application(application_id, update_data)
+            supabase_client.update_loan_application(application_id, update_data, user_id=user_id)
         
         # Log audit
         supabase_client.log_audit(
@@ -93,3 +89,4 @@ class UnderwritingAgent:
 
 # Singleton instance
 underwriting_agent = UnderwritingAgent()
+pipeline.register('underwriting', underwriting_agent.process, transitions={'trigger_sanction': 'sanction'})
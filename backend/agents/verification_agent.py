@@ -1,8 +1,10 @@
 """
 Verification Agent - Validates KYC documents using OCR
 """
+from services.document_extractor import document_extractor
 from services.ocr_service import ocr_service
 from services.supabase_client import supabase_client
+from agents.pipeline import pipeline
 
 class VerificationAgent:
     def process(self, user_id: str, message: str, has_file: bool, master_agent) -> dict:
@@ -22,14 +24,18 @@ class VerificationAgent:
                 'next_stage': 'kyc'
             }
         
-        # In a real implementation, the file would be processed here
-        # For now, we'll simulate successful verification
+        # /upload-kyc runs the document through the OCR provider router and stores the result
+        extraction = master_agent.get_or_create_state(user_id)['data'].get('kyc_extraction')
         
-        # Mock OCR extraction
-        mock_extracted_text = "PAN CARD\nIncome Tax Department\nPermanent Account Number\nABCDE1234F\nName: John Doe"
-        
-        # Validate document
-        validation_result = ocr_service.validate_kyc_document(mock_extracted_text, 'PAN')
+        if extraction:
+            validation_result = document_extractor.validate_extraction(
+                {**extraction, 'document_type': extraction.get('document_label')},
+                extraction.get('document_type', 'pan')
+            )
+        else:
+            # No upload recorded (chat-only demo flow): simulate a successful extraction
+            mock_extracted_text = "PAN CARD\nIncome Tax Department\nPermanent Account Number\nABCPE1234F\nName: John Doe"
+            validation_result = ocr_service.validate_kyc_document(mock_extracted_text, 'PAN')
         
         if validation_result['valid']:
             master_agent.update_state(user_id, data={'kyc_verified': True})
@@ -54,3 +60,5 @@ class VerificationAgent:
 
 # Singleton instance
 verification_agent = VerificationAgent()
+pipeline.register('kyc', verification_agent.process, accepts_file=True,
+                  transitions={'trigger_underwriting': 'underwriting'})
@@ -0,0 +1,437 @@
+"""
+Conversation load test - the full loan flow through /api/chat and /api/upload-kyc at a given concurrency
+
+Each virtual user runs greeting -> income -> employment -> KYC upload -> KYC confirmation
+(which auto-triggers underwriting and the sanction letter) against the real FastAPI app,
+in process over ASGI. Supabase is replaced by an in-memory table store (or, with
+--database sqlite, the real SQLite persistence backend) and EdenAI by a local HTTP server,
+each with a configurable latency, so runs are repeatable offline.
+
+Reports throughput, p50/p95/p99 per client step and per pipeline stage (server-side
+histogram bounds), and growth of MasterAgent's conversation state. Results are written to
+benchmarks/results/conversation_load/<commit>.json; --compare <commit> prints the deltas.
+
+Usage (from backend/):
+    python -m benchmarks.bench_conversation_load --users 200 --concurrency 20 --db-ms 5 --ocr-ms 300
+    python -m benchmarks.bench_conversation_load --users 200 --concurrency 20 --compare a1b2c3d
+    python -m benchmarks.bench_conversation_load --users 200 --concurrency 20 --database sqlite
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import pickle
+import random
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'conversation_load')
+
+# Client steps, in conversation order
+STEPS = ('greeting', 'income', 'employment', 'upload_kyc', 'kyc_confirm')
+PAN_NUMBER = 'ABCPE1234F'
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+class InMemoryTable:
+    """The subset of the supabase-py query builder the backend uses"""
+
+    def __init__(self, store: 'InMemorySupabase', name: str):
+        self.store = store
+        self.name = name
+        self._op = 'select'
+        self._rows = None
+        self._values = None
+        self._filters = []
+
+    def select(self, *columns, **kwargs):
+        return self
+
+    def insert(self, rows):
+        self._op, self._rows = 'insert', rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, **kwargs):
+        return self.insert(rows)
+
+    def update(self, values):
+        self._op, self._values = 'update', values
+        return self
+
+    def eq(self, column, value):
+        self._filters.append((column, value))
+        return self
+
+    def order(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args, **kwargs):
+        return self
+
+    def single(self):
+        return self
+
+    def execute(self):
+        time.sleep(self.store.latency)
+        with self.store.lock:
+            self.store.calls += 1
+            table = self.store.tables.setdefault(self.name, [])
+            if self._op == 'insert':
+                rows = [{'id': row.get('id') or str(uuid.uuid4()), **row} for row in self._rows]
+                table.extend(rows)
+                return SimpleNamespace(data=rows)
+            matches = [row for row in table if all(row.get(c) == v for c, v in self._filters)]
+            if self._op == 'update':
+                for row in matches:
+                    row.update(self._values)
+            return SimpleNamespace(data=matches)
+
+class InMemorySupabase:
+    """Stand-in for supabase.Client: tables are lists of dicts, every call sleeps `latency`"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.tables = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def table(self, name: str) -> InMemoryTable:
+        return InMemoryTable(self, name)
+
+class FakeEdenAIHandler(BaseHTTPRequestHandler):
+    """Answers every EdenAI OCR call with a PAN card reading after `latency` seconds"""
+    protocol_version = 'HTTP/1.1'
+    latency = 0.0
+
+    def _read_body(self) -> bytes:
+        length = self.headers.get('content-length')
+        if length:
+            return self.rfile.read(int(length))
+        body = b''
+        while True:
+            size = int(self.rfile.readline().strip(), 16)
+            if size == 0:
+                self.rfile.readline()
+                return body
+            body += self.rfile.read(size)
+            self.rfile.readline()
+
+    def do_POST(self):
+        payload = json.loads(self._read_body())
+        time.sleep(self.latency)
+        result = {
+            'status': 'success',
+            'text': f'INCOME TAX DEPARTMENT Permanent Account Number {PAN_NUMBER}',
+            'extracted_data': [{
+                'document_id': {'value': PAN_NUMBER},
+                'given_names': {'value': 'Load'},
+                'last_name': {'value': 'Tester'}
+            }]
+        }
+        data = json.dumps({p: result for p in payload['providers'].split(',')}).encode()
+        self.send_response(200)
+        self.send_header('content-type', 'application/json')
+        self.send_header('content-length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def start_fake_edenai(latency: float) -> ThreadingHTTPServer:
+    FakeEdenAIHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeEdenAIHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def card_image(user: int) -> bytes:
+    """A distinct PAN card image per user, so OCR result caching does not hide provider calls"""
+    if Image is None:
+        # Pillow missing: preprocessing passes documents through, a JPEG header is enough
+        return b'\xff\xd8\xff\xe0' + os.urandom(64 * 1024)
+    image = Image.new('L', (1000, 630), 235)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=56)
+    for i, line in enumerate(['INCOME TAX DEPARTMENT', PAN_NUMBER, f'Name: Load Tester {user}']):
+        draw.text((60, 100 + i * 140), line, fill=20, font=font)
+    image = Image.blend(image, Image.effect_noise(image.size, 12), 0.08)
+    out = io.BytesIO()
+    image.save(out, format='JPEG', quality=85)
+    return out.getvalue()
+
+def percentile(values, q: float):
+    """Nearest-rank percentile in milliseconds"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))] * 1000, 1)
+
+def stage_quantiles(before: dict, after: dict) -> dict:
+    """Count and p50/p95/p99 bucket bounds (ms) of the observations added between two histogram snapshots"""
+    bounds = [bound for bound in after['buckets'] if bound != '+Inf']
+    counts = [after['buckets'][b] - (before['buckets'][b] if before else 0) for b in bounds]
+    total = after['count'] - (before['count'] if before else 0)
+    result = {'count': total}
+    for q in (50, 95, 99):
+        bound = next((b for b, c in zip(bounds, counts) if total and c >= q / 100 * total), None)
+        result[f'p{q}_ms_le'] = round(float(bound) * 1000, 1) if bound else None
+    return result
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BACKEND_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def state_footprint(master_agent, user_ids) -> dict:
+    """Entries in the conversation state store and the pickled size of the given users' live states"""
+    sizes = [len(pickle.dumps(state)) for state in map(master_agent.state_store.get, user_ids) if state]
+    return {'entries': master_agent.state_store.size(), 'live': len(sizes), 'state_bytes': sum(sizes)}
+
+async def sample_state(master_agent, user_ids: list, peak: dict, interval: float = 0.05):
+    """
+    Track the peak state footprint while conversations are in flight (finished
+    conversations are reset by the sanction/underwriting agents, so the end state is not enough)
+    """
+    while True:
+        sample = state_footprint(master_agent, list(user_ids))
+        peak['entries'] = max(peak['entries'], sample['entries'])
+        peak['state_bytes'] = max(peak['state_bytes'], sample['state_bytes'])
+        if sample['live']:
+            peak['bytes_per_conversation'] = max(peak['bytes_per_conversation'], sample['state_bytes'] // sample['live'])
+        await asyncio.sleep(interval)
+
+async def run_conversation(client, user: int, image: bytes, latencies: dict, failures: dict, user_ids: list):
+    user_id = f'load-{user}-{uuid.uuid4().hex[:8]}'
+    user_ids.append(user_id)
+
+    async def step(name, request):
+        started_at = time.perf_counter()
+        try:
+            response = await request
+        except Exception:
+            response = None
+        latencies[name].append(time.perf_counter() - started_at)
+        if response is None or response.status_code >= 400:
+            failures[name] += 1
+            return None
+        return response
+
+    chat = lambda text, has_file=False: client.post(
+        '/api/chat', json={'user_id': user_id, 'message': text, 'has_file': has_file}
+    )
+    response = (
+        await step('greeting', chat(f'Tester {user}'))
+        and await step('income', chat(str(random.randint(40, 150) * 1000)))
+        and await step('employment', chat('Salaried'))
+        and await step('upload_kyc', client.post(
+            '/api/upload-kyc',
+            data={'user_id': user_id, 'document_type': 'pan'},
+            files={'file': (f'pan_{user}.jpg', image, 'image/jpeg')}
+        ))
+        and await step('kyc_confirm', chat('I have uploaded my PAN card', has_file=True))
+    )
+    if not response:
+        return None
+    return bool((response.json().get('data') or {}).get('sanction_letter_url'))
+
+async def drive(app, master_agent, users: int, concurrency: int, images: list) -> dict:
+    import httpx
+
+    latencies = {name: [] for name in STEPS}
+    failures = {name: 0 for name in STEPS}
+    user_ids = []
+    peak = {'entries': 0, 'state_bytes': 0, 'bytes_per_conversation': 0}
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+
+    async with httpx.AsyncClient(transport=transport, base_url='http://loadtest', timeout=120) as client:
+        async def one(user):
+            async with semaphore:
+                return await run_conversation(client, user, images[user], latencies, failures, user_ids)
+
+        sampler = asyncio.create_task(sample_state(master_agent, user_ids, peak))
+        started_at = time.perf_counter()
+        outcomes = await asyncio.gather(*(one(user) for user in range(users)))
+        elapsed = time.perf_counter() - started_at
+        sampler.cancel()
+
+    return {
+        'elapsed': elapsed,
+        'completed': sum(outcome is not None for outcome in outcomes),
+        'sanctioned': sum(outcome is True for outcome in outcomes),
+        'latencies': latencies,
+        'failures': failures,
+        'user_ids': user_ids,
+        'peak_state': peak
+    }
+
+def load_result(ref: str):
+    """A stored result by commit (or path); None if there is none"""
+    path = ref if ref.endswith('.json') else os.path.join(RESULTS_DIR, f'{ref}.json')
+    if not os.path.exists(path):
+        print(f'\nno stored result for {ref} ({path})')
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def compare(result: dict, baseline: dict):
+    def delta(new, old):
+        if new is None or not old:
+            return '     n/a'
+        return f'{(new - old) / old:+8.1%}'
+
+    print(f'\nvs {baseline["commit"]} ({baseline["timestamp"]}):')
+    print(f'  {"throughput":16s} {delta(result["conversations_per_second"], baseline["conversations_per_second"])}')
+    for name in STEPS:
+        new, old = result['steps'][name], baseline['steps'].get(name, {})
+        print(f'  {name:16s} p95 {delta(new["p95_ms"], old.get("p95_ms"))}   p99 {delta(new["p99_ms"], old.get("p99_ms"))}')
+    print(f'  {"state bytes/conv":16s} {delta(result["state"]["bytes_per_conversation"], baseline["state"].get("bytes_per_conversation"))}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=200, help='conversations to run')
+    parser.add_argument('--concurrency', type=int, default=20, help='conversations in flight')
+    parser.add_argument('--database', choices=('memory', 'sqlite'), default='memory',
+                        help='in-memory Supabase stand-in, or the SQLite backend (real local I/O)')
+    parser.add_argument('--db-ms', type=float, default=5.0, help='latency of each stand-in Supabase call')
+    parser.add_argument('--ocr-ms', type=float, default=300.0, help='latency of each stand-in EdenAI call')
+    parser.add_argument('--warmup', type=int, default=5, help='conversations run before measuring')
+    parser.add_argument('--compare', help='commit (or result file) to compare against')
+    parser.add_argument('--no-save', action='store_true', help='do not store the result')
+    args = parser.parse_args()
+
+    # Stand-ins must be configured before the app (and its service singletons) is imported
+    ocr_server = start_fake_edenai(args.ocr_ms / 1000)
+    pdf_dir = tempfile.mkdtemp(prefix='loadtest_pdfs_')
+    os.environ.update({
+        'SUPABASE_URL': '', 'SUPABASE_SERVICE_ROLE_KEY': '',
+        'EDENAI_API_KEY': 'local-standin', 'EDENAI_HEDGE_MODE': 'off',
+        'GEMINI_API_KEY': '', 'OCR_SPACE_API_KEY': '', 'LOCAL_OCR_ENABLED': 'false',
+        'KYC_UPLOAD_MODE': 'sync', 'PDF_STORE_DIR': pdf_dir,
+        'AUDIT_SPILL_PATH': os.path.join(pdf_dir, 'audit_spill.jsonl'),
+        'PERSISTENCE_BACKEND': 'sqlite' if args.database == 'sqlite' else 'supabase',
+        'PERSISTENCE_SQLITE_PATH': os.path.join(pdf_dir, 'loadtest.db'),
+    })
+
+    import main as app_module
+    from agents.master_agent import master_agent
+    from agents.pipeline import pipeline
+    from services.document_extractor import document_extractor
+    from services.metrics import metrics_registry
+    from services.supabase_client import supabase_client
+
+    database = None
+    if args.database == 'memory':
+        database = InMemorySupabase(args.db_ms / 1000)
+        supabase_client.client = database
+    document_extractor.get('edenai').base_url = f'http://127.0.0.1:{ocr_server.server_port}/v2'
+
+    random.seed(19)
+    images = [card_image(user) for user in range(args.users + args.warmup)]
+
+    async def run():
+        if args.warmup:
+            await drive(app_module.app, master_agent, args.warmup, args.warmup, images[args.users:])
+        before = {'rss': rss_bytes(), **state_footprint(master_agent, [])}
+        histograms = {name: stage.histogram.snapshot() for name, stage in pipeline.table.items()}
+        measured = await drive(app_module.app, master_agent, args.users, args.concurrency, images)
+        await app_module.shutdown_services()
+        return before, histograms, measured
+
+    before, histograms, measured = asyncio.run(run())
+    after = {'rss': rss_bytes(), **state_footprint(master_agent, measured['user_ids'])}
+    ocr_server.shutdown()
+    shutil.rmtree(pdf_dir, ignore_errors=True)
+
+    elapsed = measured['elapsed']
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'params': vars(args),
+        'conversations': args.users,
+        'completed': measured['completed'],
+        'sanctioned': measured['sanctioned'],
+        'elapsed_seconds': round(elapsed, 3),
+        'conversations_per_second': round(measured['completed'] / elapsed, 2),
+        'requests_per_second': round(sum(len(v) for v in measured['latencies'].values()) / elapsed, 1),
+        'steps': {
+            name: {
+                'count': len(values),
+                'failures': measured['failures'][name],
+                'p50_ms': percentile(values, 0.50),
+                'p95_ms': percentile(values, 0.95),
+                'p99_ms': percentile(values, 0.99)
+            }
+            for name, values in measured['latencies'].items()
+        },
+        'pipeline_stages': {
+            name: stage_quantiles(histograms.get(name), stage.histogram.snapshot())
+            for name, stage in pipeline.table.items()
+        },
+        'state': {
+            'entries_before': before['entries'],
+            'entries_peak': measured['peak_state']['entries'],
+            'entries_after': after['entries'],
+            'peak_state_bytes': measured['peak_state']['state_bytes'],
+            'bytes_per_conversation': measured['peak_state']['bytes_per_conversation'],
+            'rss_growth_bytes': after['rss'] - before['rss'] if after['rss'] and before['rss'] else None
+        },
+        'database_calls': database.calls if database else None
+    }
+
+    print(f'{result["completed"]}/{args.users} conversations in {elapsed:.2f}s at concurrency {args.concurrency} '
+          f'(db {"sqlite" if args.database == "sqlite" else f"{args.db_ms:g} ms"}, ocr {args.ocr_ms:g} ms)')
+    print(f'throughput: {result["conversations_per_second"]} conversations/s, {result["requests_per_second"]} requests/s\n')
+    print(f'{"step":14s} {"count":>6s} {"fail":>5s} {"p50 ms":>8s} {"p95 ms":>8s} {"p99 ms":>8s}')
+    for name, step in result['steps'].items():
+        print(f'{name:14s} {step["count"]:6d} {step["failures"]:5d} {step["p50_ms"] or 0:8.1f} '
+              f'{step["p95_ms"] or 0:8.1f} {step["p99_ms"] or 0:8.1f}')
+    print(f'\n{"pipeline stage":14s} {"count":>6s} {"p50 <=":>8s} {"p95 <=":>8s} {"p99 <=":>8s}')
+    for name, stage in result['pipeline_stages'].items():
+        cells = ' '.join(f'{stage[f"p{q}_ms_le"]:8.1f}' if stage[f'p{q}_ms_le'] is not None else f'{"-":>8s}'
+                         for q in (50, 95, 99))
+        print(f'{name:14s} {stage["count"]:6d} {cells}')
+    state = result['state']
+    rss = f', RSS {state["rss_growth_bytes"] / 1e6:+.1f} MB' if state['rss_growth_bytes'] is not None else ''
+    print(f'\nconversation state: {state["entries_before"]} -> peak {state["entries_peak"]} -> {state["entries_after"]} entries, '
+          f'peak {state["peak_state_bytes"] / 1024:.1f} KB pickled ({state["bytes_per_conversation"]} bytes/conversation){rss}')
+    print(f'sanction letters issued: {result["sanctioned"]}/{result["completed"]}')
+
+    # Read the baseline before saving: it may be an earlier run of the same commit
+    baseline = load_result(args.compare) if args.compare else None
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f'{result["commit"]}.json')
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f'\nsaved {os.path.relpath(path, BACKEND_DIR)}')
+    if baseline:
+        compare(result, baseline)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Image preprocessing benchmark - bytes saved per KYC upload and the effect on end-to-end latency
+
+Generates synthetic phone photos and scans of PAN/Aadhaar cards, runs them through
+ImagePreprocessor and reports payload sizes (raw and base64, as sent to EdenAI),
+preprocessing time and the end-to-end change: preprocessing time + upload time at the
+given uplink bandwidth + a fixed provider processing time.
+
+Usage (from backend/):
+    python -m benchmarks.bench_image_preprocess --images 10 --uplink-mbps 20 --provider-ms 1500
+"""
+import argparse
+import io
+import random
+import statistics
+import time
+from services.document_stream import DocumentBuffer
+from services.image_preprocessor import ImagePreprocessor
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+# (label, width, height, format, JPEG quality)
+SAMPLES = (
+    ('phone photo 12MP JPEG', 4032, 3024, 'JPEG', 92),
+    ('phone photo 8MP JPEG', 3264, 2448, 'JPEG', 90),
+    ('flatbed scan 300dpi PNG', 2480, 1560, 'PNG', None),
+    ('screenshot WebP', 1600, 1000, 'WEBP', 90),
+)
+
+def card_photo(width: int, height: int, image_format: str, quality: int, rng: random.Random) -> bytes:
+    """A tinted card with printed fields and sensor-like noise"""
+    image = Image.new('RGB', (width, height), (236 + rng.randint(-8, 8), 230, 214))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=height // 14)
+    lines = ['INCOME TAX DEPARTMENT', 'Permanent Account Number', 'ABCPE1234F', 'Name: Asha Sharma', 'DOB: 01/02/1990']
+    for i, line in enumerate(lines):
+        draw.text((width // 16, height // 10 + i * height // 6), line, fill=(25, 25, 40), font=font)
+    noise = Image.effect_noise((width, height), 12).convert('RGB')
+    image = Image.blend(image, noise, 0.08)
+
+    out = io.BytesIO()
+    options = {'quality': quality} if quality else {}
+    image.save(out, format=image_format, **options)
+    return out.getvalue()
+
+def base64_size(size: int) -> int:
+    return (size + 2) // 3 * 4
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images', type=int, default=10, help='images per sample type')
+    parser.add_argument('--uplink-mbps', type=float, default=20.0)
+    parser.add_argument('--provider-ms', type=float, default=1500.0, help='provider processing time per call')
+    args = parser.parse_args()
+
+    if Image is None:
+        print('Pillow is required for this benchmark')
+        return
+
+    rng = random.Random(5)
+    preprocessor = ImagePreprocessor(enabled=True)
+    bytes_per_second = args.uplink_mbps * 1_000_000 / 8
+    print(f'uplink {args.uplink_mbps:g} Mbit/s, provider time {args.provider_ms:g} ms\n')
+    print(f'{"sample":26s} {"raw":>9s} {"sent":>9s} {"saved":>6s} {"prep ms":>8s} {"e2e before":>11s} {"e2e after":>10s}')
+
+    total_in = total_out = 0
+    for label, width, height, image_format, quality in SAMPLES:
+        sizes_in, sizes_out, prep_ms = [], [], []
+        for _ in range(args.images):
+            data = card_photo(width, height, image_format, quality, rng)
+            document = DocumentBuffer.from_bytes(data)
+            started_at = time.perf_counter()
+            prepared = preprocessor.process(document)
+            prep_ms.append((time.perf_counter() - started_at) * 1000)
+            sizes_in.append(document.size)
+            sizes_out.append(prepared.size)
+
+        size_in = statistics.mean(sizes_in)
+        size_out = statistics.mean(sizes_out)
+        prep = statistics.median(prep_ms)
+        before = base64_size(size_in) / bytes_per_second * 1000 + args.provider_ms
+        after = prep + base64_size(size_out) / bytes_per_second * 1000 + args.provider_ms
+        total_in += sum(sizes_in)
+        total_out += sum(sizes_out)
+        print(
+            f'{label:26s} {size_in / 1024:7.0f}KB {size_out / 1024:7.0f}KB {1 - size_out / size_in:6.0%} '
+            f'{prep:8.1f} {before:9.0f}ms {after:8.0f}ms'
+        )
+
+    print(f'\ntotal: {total_in / 1e6:.1f} MB -> {total_out / 1e6:.1f} MB ({1 - total_out / total_in:.0%} fewer bytes sent)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Local OCR throughput benchmark - synthetic PAN/Aadhaar images through the Tesseract process pool
+
+Generates card-like images with known fields, then OCRs them with a single worker and with the
+full pool, reporting images/sec and how many PAN/Aadhaar numbers were read back exactly.
+
+Usage (from backend/; needs the tesseract binary, pytesseract and Pillow):
+    python -m benchmarks.bench_local_ocr --images 40 --workers 4
+"""
+import argparse
+import io
+import random
+import string
+import time
+from concurrent.futures import wait
+from services.local_ocr_service import LocalOCRService
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+def random_pan(rng: random.Random) -> str:
+    letters = string.ascii_uppercase
+    return (
+        ''.join(rng.choice(letters) for _ in range(3)) + rng.choice('ABCFGHLJPT') + rng.choice(letters)
+        + ''.join(rng.choice(string.digits) for _ in range(4)) + rng.choice(letters)
+    )
+
+def random_aadhaar(rng: random.Random) -> str:
+    return str(rng.randint(2, 9)) + ''.join(rng.choice(string.digits) for _ in range(11))
+
+def card_image(lines: list) -> bytes:
+    """Render text lines onto a white card (PNG bytes)"""
+    font = ImageFont.load_default(size=28)
+    image = Image.new('L', (900, 60 + 48 * len(lines)), color=255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((40, 30 + 48 * i), line, fill=0, font=font)
+    out = io.BytesIO()
+    image.save(out, format='PNG')
+    return out.getvalue()
+
+def sample_documents(count: int, seed: int = 7) -> list:
+    """(document_type, expected_number, png_bytes), alternating PAN and Aadhaar"""
+    rng = random.Random(seed)
+    documents = []
+    for i in range(count):
+        name = f'Name: {rng.choice(["Asha", "Ravi", "Meera", "Arjun"])} {rng.choice(["Sharma", "Iyer", "Patel"])}'
+        dob = f'DOB: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1960, 2002)}'
+        if i % 2 == 0:
+            number = random_pan(rng)
+            lines = ['INCOME TAX DEPARTMENT', 'Permanent Account Number', number, name, dob]
+            documents.append(('pan', number, card_image(lines)))
+        else:
+            number = random_aadhaar(rng)
+            lines = ['GOVERNMENT OF INDIA', name, dob, f'{number[:4]} {number[4:8]} {number[8:]}']
+            documents.append(('aadhaar', number, card_image(lines)))
+    return documents
+
+def run(service: LocalOCRService, documents: list) -> tuple:
+    # Warm the pool so process start-up is not measured
+    wait([service.submit(documents[0][2]) for _ in range(service.workers)])
+
+    start = time.perf_counter()
+    futures = [service.submit(image) for _, _, image in documents]
+    results = [service._parse(future.result(), doc_type) for future, (doc_type, _, _) in zip(futures, documents)]
+    elapsed = time.perf_counter() - start
+
+    correct = 0
+    for result, (doc_type, expected, _) in zip(results, documents):
+        field = 'panNumber' if doc_type == 'pan' else 'aadhaarNumber'
+        correct += result['extracted_data'].get(field) == expected
+    return elapsed, correct
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--images', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=0, help='pool size (default: CPU count)')
+    args = parser.parse_args()
+
+    probe = LocalOCRService(workers=1)
+    if Image is None or not probe.available:
+        print('tesseract, pytesseract and Pillow are required for this benchmark')
+        return
+
+    documents = sample_documents(args.images)
+    print(f'{len(documents)} synthetic PAN/Aadhaar images')
+
+    for label, workers in (('single worker', 1), ('process pool', args.workers or None)):
+        service = LocalOCRService(workers=workers)
+        elapsed, correct = run(service, documents)
+        service.shutdown()
+        print(
+            f'{label:14s} workers={service.workers:2d}  {len(documents) / elapsed:7.1f} images/s  '
+            f'{elapsed * 1000 / len(documents):6.1f} ms/image  numbers read exactly: {correct}/{len(documents)}'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,11 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
+from contextlib import asynccontextmanager
 import os
+import json
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,17 +13,35 @@ load_dotenv()
 
 # Import agents
 from agents.master_agent import master_agent
-from agents.underwriting_agent import underwriting_agent
-from agents.sanction_agent import sanction_agent
+from agents.pipeline import pipeline
+
+# Register the conversation stages (built-in agents plus PIPELINE_EXTRA_MODULES)
+pipeline.load()
 
 # Import models
 from models.schemas import ChatMessage, ChatResponse
 
+# Import execution layer
+from services.agent_executor import agent_executor
+from services.metrics import metrics_registry
+from services.supabase_client import supabase_client, APPLICATION_LIST_COLUMNS
+from services.pagination import InvalidCursorError, InvalidFieldsError, clamp_limit, select_columns
+from services.sanction_renderer import sanction_renderer
+from services.local_ocr_service import local_ocr_service
+from services.http_transport import http_transport
+from services.tracing import TracingMiddleware
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await shutdown_services()
+
 # Create FastAPI app
 app = FastAPI(
     title="AI Loan Sales Assistant API",
     description="Backend API for AI-driven loan processing system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -32,6 +53,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request spans, http.request.seconds and slow-request profiles (PROFILE_SLOW_REQUESTS_MS)
+app.add_middleware(TracingMiddleware)
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -50,98 +74,149 @@ async def health_check():
         "environment": os.getenv("ENVIRONMENT", "development")
     }
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """Executor, cache and latency metrics snapshot"""
+    return metrics_registry.snapshot()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """The same metrics in Prometheus text format, for scraping"""
+    return PlainTextResponse(metrics_registry.prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+async def shutdown_services():
+    """Release the queues, executors and connection pools (run when the app's lifespan ends)"""
+    # Queues first: their cancelled jobs release payloads before the executors go away
+    await kyc_job_queue.stop()
+    await bulk_job_queue.stop()
+    agent_executor.shutdown(wait=False)
+    sanction_renderer.shutdown(wait=False)
+    local_ocr_service.shutdown(wait=False)
+    supabase_client.close()
+    await http_transport.aclose()
+    http_transport.close()
+
+# Replies that point at state the client will act on (the sanction letter URL); from the first
+# of these on, stages are held back until the turn's writes have committed
+COMMITTED_STAGES = {'sanction'}
+
+async def chat_stages(message: ChatMessage):
+    """
+    Run the conversation turn stage by stage, yielding each agent's reply as soon as it is ready:
+    the routed stage first, then the stages it auto-triggers (see agents/pipeline.py).
+    Yields dicts with 'stage', 'response' and 'data' keys.
+    The turn's database writes are collected and committed together once it ends; replies from
+    a COMMITTED_STAGES stage on are yielded only after that commit succeeds (it raises otherwise).
+    """
+    held = []
+    async with supabase_client.unit_of_work():
+        async for stage in pipeline.run(message.user_id, message.message, message.has_file, master_agent):
+            if held or stage['stage'] in COMMITTED_STAGES:
+                held.append(stage)
+            else:
+                yield stage
+    for stage in held:
+        yield stage
+
+CHAT_ERROR_MESSAGE = "I apologize, but I encountered an error. Please try again or contact support if the issue persists."
+
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(message: ChatMessage):
     """
     Main chat endpoint - routes messages to appropriate agents
     """
     try:
-        # Route message through master agent
-        result = master_agent.route_message(
-            user_id=message.user_id,
-            message=message.message,
-            has_file=message.has_file
-        )
-        
-        response_text = result.get('response', '')
-        next_stage = result.get('next_stage', '')
-        
-        # Update stage
-        if next_stage:
-            master_agent.update_state(message.user_id, stage=next_stage)
-        
-        # Auto-trigger underwriting if needed
-        if result.get('trigger_underwriting'):
-            underwriting_result = underwriting_agent.process(
-                message.user_id,
-                '',
-                master_agent
-            )
-            response_text += "\n\n" + underwriting_result['response']
-            
-            # Auto-trigger sanction if approved
-            if underwriting_result.get('trigger_sanction'):
-                sanction_result = sanction_agent.process(
-                    message.user_id,
-                    '',
-                    master_agent
-                )
-                response_text += "\n\n" + sanction_result['response']
-                
-                return ChatResponse(
-                    response=response_text,
-                    data=sanction_result.get('data')
-                )
+        responses = []
+        data = None
+        async for stage in chat_stages(message):
+            responses.append(stage['response'])
+            # The routed stage's data, replaced by the sanction letter data when one is issued
+            if not responses[1:] or stage['stage'] == 'sanction':
+                data = stage['data']
         
         return ChatResponse(
-            response=response_text,
-            data=result.get('data')
+            response="\n\n".join(responses),
+            data=data
         )
     
     except Exception as e:
         print(f"Error in chat endpoint: {e}")
         return ChatResponse(
-            response="I apologize, but I encountered an error. Please try again or contact support if the issue persists."
+            response=CHAT_ERROR_MESSAGE
         )
 
+@app.post("/api/chat/stream")
+async def chat_stream(message: ChatMessage):
+    """
+    Streaming chat endpoint (server-sent events).
+    Emits one `message` event per stage as soon as that agent finishes
+    (e.g. verification, then the underwriting decision, then the sanction letter URL once
+    the turn's writes are committed), followed by a `done` event, or an `error` event if
+    the turn or its commit failed.
+    """
+    async def events():
+        try:
+            async for stage in chat_stages(message):
+                yield f"event: message\ndata: {json.dumps(stage)}\n\n"
+        except Exception as e:
+            print(f"Error in chat stream: {e}")
+            yield f"event: error\ndata: {json.dumps({'response': CHAT_ERROR_MESSAGE})}\n\n"
+            return
+        yield "event: done\ndata: {}\n\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # Include KYC routes
-from routes.kyc_routes import router as kyc_router
+from routes.kyc_routes import router as kyc_router, kyc_job_queue
 app.include_router(kyc_router, prefix="/api", tags=["KYC"])
 
+# Include sanction letter download routes
+from routes.sanction_routes import router as sanction_router
+app.include_router(sanction_router, prefix="/api", tags=["Sanction"])
+
+# Include batch underwriting routes
+from routes.underwriting_routes import router as underwriting_router, bulk_job_queue
+app.include_router(underwriting_router, prefix="/api", tags=["Underwriting"])
 
-@app.get("/api/download-sanction/{filename}")
-async def download_sanction(filename: str):
-    """
-    Download sanction letter PDF
-    """
-    try:
-        pdf_path = os.path.join(os.path.dirname(__file__), 'generated_pdfs', filename)
-        
-        if not os.path.exists(pdf_path):
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        return FileResponse(
-            pdf_path,
-            media_type='application/pdf',
-            filename=filename
-        )
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+# Columns a caller may request with ?fields=
+APPLICATION_FIELDS = APPLICATION_LIST_COLUMNS + ('user_id',)
 
 @app.get("/api/user/{user_id}/applications")
-async def get_user_applications(user_id: str):
+async def get_user_applications(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = None
+):
     """
-    Get all loan applications for a user
+    Get a user's loan applications, newest first, one page at a time.
+    Pass the returned `next_cursor` as `cursor` for the next page; `fields` is an
+    optional comma-separated subset of the dashboard columns.
     """
-    from services.supabase_client import supabase_client
-    
-    try:
-        # This would fetch from Supabase in production
+    if not supabase_client.configured:
         return {
             "applications": [],
+            "next_cursor": None,
             "message": "Feature requires Supabase configuration"
         }
+    
+    try:
+        columns = select_columns(fields, APPLICATION_FIELDS, APPLICATION_LIST_COLUMNS)
+        return await agent_executor.run(
+            'database',
+            supabase_client.list_loan_applications,
+            user_id,
+            columns,
+            cursor,
+            clamp_limit(limit)
+        )
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 class ChatMessage(BaseModel):
@@ -31,3 +31,14 @@ class KYCDocument(BaseModel):
     document_type: str
     extracted_text: str
     verified: bool = False
+
+
+class UnderwritingApplicant(BaseModel):
+    income: float = Field(..., allow_inf_nan=False)  # NaN/Infinity would score as a valid income
+    employment_type: str
+    applicant_id: Optional[str] = None
+
+class BatchUnderwritingRequest(BaseModel):
+    applicants: List[UnderwritingApplicant]
+    seed: Optional[int] = None
+    deterministic: Optional[bool] = None  # defaults to CREDIT_SCORE_MODE
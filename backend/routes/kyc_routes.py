@@ -1,132 +1,245 @@
 """
-API endpoint for KYC document upload and verification using EdenAI OCR.
+API endpoint for KYC document upload and verification via the OCR provider router.
 """
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from services.edenai_ocr_service import EdenAIOCRService
-from services.supabase_client import supabase_client
+import json
 import os
-import uuid
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from services.document_extractor import document_extractor
+from services.document_stream import DocumentBuffer, UploadTooLargeError, MAX_UPLOAD_BYTES
+from services.supabase_client import supabase_client, KYC_DOCUMENT_COLUMNS, KYC_DOCUMENT_SUMMARY_COLUMNS
+from services.agent_executor import agent_executor
+from services.metrics import metrics_registry
+from services.job_queue import JobQueue, QueueFullError
+from services.pagination import InvalidCursorError, InvalidFieldsError, clamp_limit, select_columns
+from agents.master_agent import master_agent
 from datetime import datetime
 
 router = APIRouter()
 
-# Initialize EdenAI OCR service
-try:
-    edenai_ocr = EdenAIOCRService()
-except ValueError as e:
-    print(f"Warning: EdenAI OCR service not initialized: {e}")
-    edenai_ocr = None
+KYC_UPLOAD_MODE = os.getenv('KYC_UPLOAD_MODE', 'sync')
+
+edenai_ocr = document_extractor.get('edenai')
+
+if edenai_ocr:
+    metrics_registry.register_collector('ocr_result_cache', edenai_ocr.result_cache.stats)
+    metrics_registry.register_collector('ocr_hedging', lambda: {
+        'enabled': edenai_ocr.hedge_enabled,
+        'delays': dict(zip(edenai_ocr.providers, edenai_ocr.hedge_delays)),
+        'providers': edenai_ocr.hedge_stats
+    })
+
+async def buffer_upload(request: Request, file: UploadFile) -> DocumentBuffer:
+    """
+    Buffer an upload once (memory, spilling to disk past the spool threshold),
+    rejecting oversized files with 413 before and while reading.
+    """
+    declared_size = request.headers.get('content-length')
+    if declared_size and declared_size.isdigit() and int(declared_size) > MAX_UPLOAD_BYTES + 64 * 1024:
+        raise HTTPException(status_code=413, detail="File exceeds the maximum upload size")
+    
+    try:
+        return await DocumentBuffer.from_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+class TransientOCRError(RuntimeError):
+    """Every provider failed (not a bad document); the job is retried"""
+
+async def store_kyc_result(user_id: str, document_type: str, file_name: str,
+                           extraction_result: dict, validation_result: dict) -> dict:
+    """Insert the kyc_documents row, hand the result to the chat flow and build the API response"""
+    document_data = {
+        'user_id': user_id,
+        'document_type': document_type,
+        'file_name': file_name,
+        'extracted_data': extraction_result.get('extracted_data', {}),
+        'validation_status': 'verified' if validation_result.get('valid') else 'failed',
+        'confidence': extraction_result.get('confidence', 'medium'),
+        'created_at': datetime.utcnow().isoformat()
+    }
+    
+    # Insert into kyc_documents table
+    rows = await agent_executor.run('database', supabase_client.insert_kyc_document, document_data)
+    
+    # Hand the result to VerificationAgent for the chat flow
+    master_agent.update_state(user_id, data={
+        'kyc_extraction': {
+            'document_type': document_type,
+            'success': extraction_result.get('success', False),
+            'document_label': extraction_result.get('document_type', document_type),
+            'extracted_data': extraction_result.get('extracted_data', {}),
+            'confidence': extraction_result.get('confidence', 'medium'),
+            'provider': extraction_result.get('provider')
+        }
+    })
+    
+    return {
+        'success': True,
+        'message': 'Document processed successfully',
+        'document_id': rows[0]['id'] if rows else None,
+        'extracted_data': extraction_result.get('extracted_data', {}),
+        'validation': validation_result,
+        'confidence': extraction_result.get('confidence', 'medium'),
+        'provider': extraction_result.get('provider')
+    }
+
+async def run_kyc_job(payload: dict) -> dict:
+    """Job handler: OCR + validation + insert; provider outages raise so the job is retried"""
+    extraction_result, validation_result = await document_extractor.aextract_and_validate(
+        payload['document'],
+        payload['document_type']
+    )
+    if not extraction_result.get('success') and not extraction_result.get('rejected_locally'):
+        raise TransientOCRError(extraction_result.get('error', 'OCR failed'))
+    
+    return await store_kyc_result(
+        payload['user_id'],
+        payload['document_type'],
+        payload['file_name'],
+        extraction_result,
+        validation_result
+    )
+
+# Background KYC processing (KYC_UPLOAD_MODE=async, or mode=async per upload)
+kyc_job_queue = JobQueue('kyc', run_kyc_job)
+metrics_registry.register_collector('kyc_jobs', kyc_job_queue.stats)
 
 @router.post("/upload-kyc")
 async def upload_kyc_document(
+    request: Request,
     file: UploadFile = File(...),
     user_id: str = Form(...),
-    document_type: str = Form(...)
+    document_type: str = Form(...),
+    mode: Optional[str] = Form(None)
 ):
     """
-    Upload and process KYC document using EdenAI OCR.
+    Upload and process KYC document via the OCR provider router.
     
     Args:
         file: Document image file
         user_id: User ID from Supabase auth
         document_type: Type of document (pan, aadhaar, itr, balance_sheet)
+        mode: 'sync' (process in this request) or 'async' (return a job id immediately);
+              defaults to KYC_UPLOAD_MODE
     
     Returns:
-        Extracted document data and verification status
+        Extracted document data and verification status, or (async) the job id and status URLs
     """
     
-    if not edenai_ocr:
+    if not document_extractor.configured:
         raise HTTPException(
             status_code=500,
-            detail="OCR service not configured. Please set EDENAI_API_KEY."
+            detail="OCR service not configured. Configure an OCR provider (EDENAI_API_KEY, GEMINI_API_KEY, OCR_SPACE_API_KEY or tesseract)."
         )
     
-    try:
-        # Create temp directory if it doesn't exist
-        temp_dir = "temp_uploads"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Save uploaded file temporarily
-        file_extension = os.path.splitext(file.filename)[1]
-        temp_filename = f"{uuid.uuid4()}{file_extension}"
-        temp_filepath = os.path.join(temp_dir, temp_filename)
-        
-        with open(temp_filepath, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
-        # Extract text and data using EdenAI
-        extraction_result = edenai_ocr.extract_text_from_image(
-            temp_filepath,
-            document_type
-        )
+    document = await buffer_upload(request, file)
+    
+    if (mode or KYC_UPLOAD_MODE).lower() == 'async':
+        # The buffered document outlives this request; the queue closes it when the job finishes
+        try:
+            job = kyc_job_queue.submit(
+                {
+                    'document': document,
+                    'user_id': user_id,
+                    'document_type': document_type,
+                    'file_name': file.filename
+                },
+                on_finish=document.close
+            )
+        except QueueFullError as e:
+            document.close()
+            raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '5'})
         
-        # Validate the document
-        validation_result = edenai_ocr.validate_kyc_document(
-            temp_filepath,
+        return JSONResponse(status_code=202, content={
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/kyc-jobs/{job.id}',
+            'events_url': f'/api/kyc-jobs/{job.id}/events'
+        })
+    
+    try:
+        # Fastest healthy provider first, falling through on errors or low-quality results
+        extraction_result, validation_result = await document_extractor.aextract_and_validate(
+            document,
             document_type
         )
         
-        # Store document metadata in Supabase
-        document_data = {
-            'user_id': user_id,
-            'document_type': document_type,
-            'file_name': file.filename,
-            'extracted_data': extraction_result.get('extracted_data', {}),
-            'validation_status': 'verified' if validation_result.get('valid') else 'failed',
-            'confidence': extraction_result.get('confidence', 'medium'),
-            'created_at': datetime.utcnow().isoformat()
-        }
-        
-        # Insert into kyc_documents table
-        result = supabase_client.client.table('kyc_documents').insert(document_data).execute()
-        
-        # Clean up temp file
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
-        
-        return {
-            'success': True,
-            'message': 'Document processed successfully',
-            'document_id': result.data[0]['id'] if result.data else None,
-            'extracted_data': extraction_result.get('extracted_data', {}),
-            'validation': validation_result,
-            'confidence': extraction_result.get('confidence', 'medium')
-        }
+        return await store_kyc_result(user_id, document_type, file.filename, extraction_result, validation_result)
         
     except Exception as e:
-        # Clean up temp file on error
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
-        
         raise HTTPException(
             status_code=500,
             detail=f"Document processing failed: {str(e)}"
         )
+    finally:
+        document.close()
+
+@router.get("/kyc-jobs/{job_id}")
+async def get_kyc_job(job_id: str):
+    """Status of a background KYC job (queued, running, retrying, succeeded, dead)"""
+    job = kyc_job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
+
+@router.get("/kyc-jobs/{job_id}/events")
+async def stream_kyc_job(job_id: str):
+    """Server-sent events: one `status` event per job state change until it finishes"""
+    if not kyc_job_queue.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        async for snapshot in kyc_job_queue.subscribe(job_id):
+            if snapshot is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f'event: status\ndata: {json.dumps(snapshot)}\n\n'
+    
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 @router.get("/kyc-documents/{user_id}")
-async def get_user_kyc_documents(user_id: str):
+async def get_user_kyc_documents(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = None,
+    summary: bool = False
+):
     """
-    Get all KYC documents for a user.
+    Get a user's KYC documents, newest first, one page at a time.
     
     Args:
         user_id: User ID from Supabase auth
+        cursor: `next_cursor` from the previous page
+        limit: Page size (max 100)
+        fields: Optional comma-separated subset of the document columns
+        summary: Leave out the extracted_data JSON (status listings)
     
     Returns:
-        List of KYC documents with extracted data
+        A page of KYC documents and the cursor of the next page (None on the last page)
     """
+    default_columns = KYC_DOCUMENT_SUMMARY_COLUMNS if summary else KYC_DOCUMENT_COLUMNS
     try:
-        result = supabase_client.client.table('kyc_documents')\
-            .select('*')\
-            .eq('user_id', user_id)\
-            .order('created_at', desc=True)\
-            .execute()
+        columns = select_columns(fields, default_columns, default_columns)
+        page = await agent_executor.run(
+            'database',
+            supabase_client.list_kyc_documents,
+            user_id,
+            columns,
+            cursor,
+            clamp_limit(limit)
+        )
         
         return {
             'success': True,
-            'documents': result.data
+            **page
         }
         
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -135,6 +248,7 @@ async def get_user_kyc_documents(user_id: str):
 
 @router.post("/verify-document")
 async def verify_specific_document(
+    request: Request,
     file: UploadFile = File(...),
     document_type: str = Form(...)
 ):
@@ -149,41 +263,21 @@ async def verify_specific_document(
         Extracted data and verification status
     """
     
-    if not edenai_ocr:
+    if not document_extractor.configured:
         raise HTTPException(
             status_code=500,
-            detail="OCR service not configured. Please set EDENAI_API_KEY."
+            detail="OCR service not configured. Configure an OCR provider (EDENAI_API_KEY, GEMINI_API_KEY, OCR_SPACE_API_KEY or tesseract)."
         )
     
+    document = await buffer_upload(request, file)
+    
     try:
-        # Create temp directory
-        temp_dir = "temp_uploads"
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # Save file temporarily
-        file_extension = os.path.splitext(file.filename)[1]
-        temp_filename = f"{uuid.uuid4()}{file_extension}"
-        temp_filepath = os.path.join(temp_dir, temp_filename)
-        
-        with open(temp_filepath, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
-        
         # Extract and validate
-        extraction_result = edenai_ocr.extract_text_from_image(
-            temp_filepath,
+        extraction_result, validation_result = await document_extractor.aextract_and_validate(
+            document,
             document_type
         )
         
-        validation_result = edenai_ocr.validate_kyc_document(
-            temp_filepath,
-            document_type
-        )
-        
-        # Clean up
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
-        
         return {
             'success': True,
             'extracted_data': extraction_result.get('extracted_data', {}),
@@ -194,11 +288,9 @@ async def verify_specific_document(
         }
         
     except Exception as e:
-        # Clean up on error
-        if os.path.exists(temp_filepath):
-            os.remove(temp_filepath)
-        
         raise HTTPException(
             status_code=500,
             detail=f"Document verification failed: {str(e)}"
         )
+    finally:
+        document.close()
@@ -0,0 +1,98 @@
+"""
+API endpoints for downloading generated sanction letters.
+"""
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from services.pdf_store import pdf_store
+from services.metrics import metrics_registry
+
+router = APIRouter()
+
+metrics_registry.register_collector('pdf_store', pdf_store.stats)
+
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range `Range: bytes=start-end` header.
+    Returns inclusive (start, end), or None if the range is not satisfiable.
+    """
+    match = RANGE_HEADER.match(range_header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(0, size - int(last))
+        end = size - 1
+
+    if start > end or start >= size:
+        return None
+    return start, end
+
+def not_modified(request: Request, info: dict) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the stored PDF"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or info['etag'] in tags
+
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(info['mtime']) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+@router.get("/download-sanction/{filename}")
+async def download_sanction(filename: str, request: Request):
+    """
+    Download sanction letter PDF.
+    Supports ETag/Last-Modified conditional GETs and single byte ranges. The body is
+    streamed (Starlette iterates the file in its threadpool), never read whole.
+    """
+    info = pdf_store.stat(filename)
+    if not info:
+        raise HTTPException(status_code=404, detail="File not found")
+
+    headers = {
+        'ETag': info['etag'],
+        'Last-Modified': formatdate(info['mtime'], usegmt=True),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'private, max-age=86400',
+        'Content-Disposition': f'attachment; filename="{filename}"',
+    }
+
+    if not_modified(request, info):
+        return Response(status_code=304, headers=headers)
+
+    size = info['size']
+    range_header = request.headers.get('range')
+    if_range = request.headers.get('if-range')
+    if range_header and (if_range is None or if_range == info['etag']):
+        byte_range = parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+
+        start, end = byte_range
+        return StreamingResponse(
+            pdf_store.iter_range(filename, start, end),
+            status_code=206,
+            media_type='application/pdf',
+            headers={**headers, 'Content-Range': f'bytes {start}-{end}/{size}',
+                     'Content-Length': str(end - start + 1)}
+        )
+
+    return StreamingResponse(
+        pdf_store.iter_range(filename, 0, size - 1),
+        media_type='application/pdf',
+        headers={**headers, 'Content-Length': str(size)}
+    )
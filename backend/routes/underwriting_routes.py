@@ -0,0 +1,137 @@
+"""
+API endpoints for batch underwriting and bulk pre-approval imports.
+"""
+import os
+import time
+from typing import Optional
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from models.schemas import BatchUnderwritingRequest
+from services.agent_executor import agent_executor
+from services.batch_underwriting import underwrite_rows
+from services.bulk_preapproval import (
+    applicant_file_format, bulk_preapproval_pipeline, iter_text_lines, resolve_scoring_mode
+)
+from services.document_stream import DocumentBuffer, UploadTooLargeError
+from services.job_queue import JobQueue, QueueFullError
+from services.metrics import metrics_registry
+from services.supabase_client import supabase_client
+
+router = APIRouter()
+
+BULK_MAX_UPLOAD_BYTES = int(os.getenv('BULK_MAX_UPLOAD_MB', '512')) * 1024 * 1024
+
+@router.post("/underwrite/batch")
+async def underwrite_batch(request: BatchUnderwritingRequest):
+    """
+    Score many applicants in one vectorized pass.
+    
+    Args:
+        request: Applicants (income, employment_type, optional applicant_id), an
+            optional seed that makes the random score factor reproducible, and
+            whether to use deterministic (hash-derived) scoring
+    
+    Returns:
+        Credit score, eligibility, risk level and decision for every applicant, in order
+    """
+    rows = [applicant.model_dump(exclude_none=True) for applicant in request.applicants]
+    
+    seed, deterministic = resolve_scoring_mode(request.seed, request.deterministic)
+    
+    try:
+        started_at = time.perf_counter()
+        results = await agent_executor.run('underwriting', underwrite_rows, rows, seed, deterministic)
+        elapsed = time.perf_counter() - started_at
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        'count': len(results),
+        'elapsed_ms': round(elapsed * 1000, 2),
+        'results': results
+    }
+
+async def run_bulk_job(payload: dict) -> dict:
+    """Job handler: stream the buffered file through the pre-approval pipeline"""
+    document = payload['document']
+    return await agent_executor.run(
+        'underwriting',
+        bulk_preapproval_pipeline.run,
+        iter_text_lines(document.iter_chunks()),
+        payload['format'],
+        document.sha256,
+        payload['dry_run'],
+        payload['seed'],
+        payload['deterministic'],
+        payload['chunk_size']
+    )
+
+# One import at a time; a failed import is re-run by resubmitting (ids are stable per file)
+bulk_job_queue = JobQueue('bulk_preapproval', run_bulk_job, workers=1, max_queue=10, max_retries=0)
+metrics_registry.register_collector('bulk_jobs', bulk_job_queue.stats)
+
+@router.post("/underwrite/bulk")
+async def bulk_preapprove(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None),
+    dry_run: bool = Form(False),
+    chunk_size: Optional[int] = Form(None, ge=1, le=50000),
+    seed: Optional[int] = Form(None),
+    deterministic: Optional[bool] = Form(None)
+):
+    """
+    Import a CSV or JSONL file of applicants and pre-approve them in the background.
+    
+    Args:
+        file: Applicants, one per row/line: user_id, income, employment_type and an optional id
+        format: 'csv' or 'jsonl' (defaults to the file extension)
+        dry_run: Score and report without writing loan_applications
+        chunk_size: Applicants scored and upserted per batch (defaults to BULK_CHUNK_SIZE)
+        seed, deterministic: As for /underwrite/batch
+    
+    Returns:
+        The job id and status URL; the finished job's result has the row counts and rows/sec
+    """
+    try:
+        fmt = applicant_file_format(file.filename, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not dry_run and not supabase_client.configured:
+        raise HTTPException(status_code=500, detail="Database not configured; use dry_run to score only")
+    
+    try:
+        document = await DocumentBuffer.from_upload(file, max_size=BULK_MAX_UPLOAD_BYTES)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    try:
+        job = bulk_job_queue.submit(
+            {
+                'document': document,
+                'format': fmt,
+                'dry_run': dry_run,
+                'seed': seed,
+                'deterministic': deterministic,
+                'chunk_size': chunk_size
+            },
+            on_finish=document.close
+        )
+    except QueueFullError as e:
+        document.close()
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '30'})
+    
+    return JSONResponse(status_code=202, content={
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/underwrite/bulk/{job.id}'
+    })
+
+@router.get("/underwrite/bulk/{job_id}")
+async def get_bulk_job(job_id: str):
+    """Status of a bulk pre-approval job; `result` holds the import summary once it succeeds"""
+    job = bulk_job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.snapshot()
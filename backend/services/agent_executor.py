@@ -0,0 +1,111 @@
+"""
+Agent Executor - Runs blocking agent, OCR and database work off the event loop
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from services.metrics import metrics_registry
+
+# Default per-stage concurrency limits, overridable with STAGE_LIMIT_<STAGE> env vars
+DEFAULT_STAGE_LIMITS = {
+    'sales': 64,
+    'kyc': 32,
+    'underwriting': 32,
+    'sanction': 8,
+    'ocr': 16,
+    'database': 32,
+}
+
+class AgentExecutor:
+    """
+    Bounded thread pool with per-stage concurrency limits.
+    Async handlers await `run(stage, func, ...)` instead of calling sync code directly,
+    so one slow stage (e.g. PDF rendering) cannot stall the event loop.
+    """
+
+    def __init__(self, max_workers: int = None, stage_limits: Dict[str, int] = None):
+        self.max_workers = max_workers or int(os.getenv('AGENT_POOL_SIZE', '64'))
+        self.stage_limits = dict(DEFAULT_STAGE_LIMITS)
+        for stage in self.stage_limits:
+            env_limit = os.getenv(f'STAGE_LIMIT_{stage.upper()}')
+            if env_limit:
+                self.stage_limits[stage] = int(env_limit)
+        if stage_limits:
+            self.stage_limits.update(stage_limits)
+
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='agent')
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop = None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _semaphore(self, stage: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Semaphores are bound to the loop that first waits on them
+            self._loop = loop
+            self._semaphores = {}
+        if stage not in self._semaphores:
+            limit = self.stage_limits.get(stage, self.max_workers)
+            self._semaphores[stage] = asyncio.Semaphore(limit)
+        return self._semaphores[stage]
+
+    def _stage_stats(self, stage: str) -> Dict[str, int]:
+        with self._lock:
+            if stage not in self._stats:
+                self._stats[stage] = {'queued': 0, 'in_flight': 0, 'completed': 0, 'errors': 0}
+            return self._stats[stage]
+
+    def _bump(self, stats: Dict[str, int], **deltas):
+        with self._lock:
+            for key, delta in deltas.items():
+                stats[key] += delta
+
+    async def run(self, stage: str, func: Callable, *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) in the pool, respecting the stage's concurrency limit"""
+        stats = self._stage_stats(stage)
+        semaphore = self._semaphore(stage)
+
+        queued_at = time.perf_counter()
+        self._bump(stats, queued=1)
+        async with semaphore:
+            started_at = time.perf_counter()
+            self._bump(stats, queued=-1, in_flight=1)
+            metrics_registry.histogram(f'executor.{stage}.wait_seconds').observe(started_at - queued_at)
+
+            # Copy context so request-scoped contextvars are visible in the worker thread
+            context = contextvars.copy_context()
+            call = functools.partial(context.run, func, *args, **kwargs)
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(self._pool, call)
+            except Exception:
+                self._bump(stats, errors=1)
+                raise
+            finally:
+                self._bump(stats, in_flight=-1, completed=1)
+                metrics_registry.histogram(f'executor.{stage}.run_seconds').observe(
+                    time.perf_counter() - started_at
+                )
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, stage limits and per-stage queue/in-flight counters"""
+        with self._lock:
+            stages = {stage: dict(values) for stage, values in self._stats.items()}
+        return {
+            'max_workers': self.max_workers,
+            'stage_limits': dict(self.stage_limits),
+            'stages': stages
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+# Singleton instance
+agent_executor = AgentExecutor()
+metrics_registry.register_collector('executor', agent_executor.stats)
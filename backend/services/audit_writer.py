@@ -0,0 +1,181 @@
+"""
+Audit Log Writer - Queues audit events and flushes them to the database in batches
+"""
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+class AuditLogWriter:
+    """
+    Background writer for audit_logs rows.
+
+    Events are queued in-process and flushed by a daemon thread whenever
+    `batch_size` events are waiting or `flush_interval` seconds have passed.
+    Failed inserts are retried with exponential backoff; batches that still
+    fail are appended to a local JSONL spill file and replayed after the next
+    successful flush.
+    """
+
+    def __init__(
+        self,
+        insert_batch: Callable[[List[dict]], Any],
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        max_queue: int = 10000,
+        spill_path: str = 'audit_spill.jsonl'
+    ):
+        self.insert_batch = insert_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.spill_path = spill_path
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._flush_requested = threading.Event()
+        self._stopping = threading.Event()
+        self._idle = threading.Condition()
+        self._pending = 0
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.spilled = 0
+        self.replayed = 0
+
+    def enqueue(self, event: dict):
+        """Queue an event without blocking; spills to disk if the queue is full"""
+        self._ensure_started()
+        with self._idle:
+            self._pending += 1
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self._spill([event])
+            self._mark_done(1)
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            batch = self._collect_batch()
+            if batch:
+                self._write(batch)
+                self._mark_done(len(batch))
+
+    def _collect_batch(self) -> List[dict]:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if self._flush_requested.is_set() or self._stopping.is_set():
+                # Drain what is already queued without waiting for the window
+                timeout = 0
+            else:
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout else self._queue.get_nowait())
+            except queue.Empty:
+                if batch or self._stopping.is_set() or self._flush_requested.is_set():
+                    break
+                if time.monotonic() >= deadline:
+                    deadline = time.monotonic() + self.flush_interval
+        if self._queue.empty():
+            self._flush_requested.clear()
+        return batch
+
+    def _mark_done(self, count: int):
+        with self._idle:
+            self._pending -= count
+            if self._pending <= 0:
+                self._idle.notify_all()
+
+    def _write(self, batch: List[dict]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.insert_batch(batch)
+                self.written += len(batch)
+                self.batches += 1
+                self._replay_spill()
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"Error writing audit batch of {len(batch)}, spilling to disk: {e}")
+                    self._spill(batch)
+                    return
+                self.retries += 1
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _spill(self, events: List[dict]):
+        with self._spill_lock:
+            directory = os.path.dirname(os.path.abspath(self.spill_path))
+            os.makedirs(directory, exist_ok=True)
+            with open(self.spill_path, 'a', encoding='utf-8') as spill_file:
+                for event in events:
+                    spill_file.write(json.dumps(event, default=str) + '\n')
+            self.spilled += len(events)
+
+    def _replay_spill(self):
+        """Re-insert spilled events once the database is reachable again"""
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            replay_path = self.spill_path + '.replay'
+            os.replace(self.spill_path, replay_path)
+
+        with open(replay_path, encoding='utf-8') as replay_file:
+            events = [json.loads(line) for line in replay_file if line.strip()]
+        os.remove(replay_path)
+
+        for start in range(0, len(events), self.batch_size):
+            chunk = events[start:start + self.batch_size]
+            try:
+                self.insert_batch(chunk)
+                self.replayed += len(chunk)
+            except Exception as e:
+                print(f"Error replaying spilled audit events: {e}")
+                self._spill(events[start:])
+                return
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Ask the writer to flush now and wait until queued events are handled"""
+        if not self._thread:
+            return True
+        self._flush_requested.set()
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout=timeout)
+
+    def stop(self, timeout: float = 5.0):
+        """Flush remaining events and stop the background thread"""
+        if not self._thread:
+            return
+        self._stopping.set()
+        self._thread.join(timeout=timeout)
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': self.queue_depth(),
+            'written': self.written,
+            'batches': self.batches,
+            'retries': self.retries,
+            'spilled': self.spilled,
+            'replayed': self.replayed
+        }
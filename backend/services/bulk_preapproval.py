@@ -0,0 +1,314 @@
+"""
+Bulk Pre-approval - Stream CSV/JSONL applicant files through batch underwriting into loan_applications
+"""
+import codecs
+import csv
+import json
+import math
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from services.batch_underwriting import underwrite_rows
+from services.credit_scoring import credit_scoring_service
+from services.metrics import metrics_registry
+
+READ_CHUNK_BYTES = 64 * 1024
+# A "line" longer than this is not an applicant record (wrong file, or no line breaks)
+MAX_LINE_CHARS = int(os.getenv('BULK_MAX_LINE_KB', '1024')) * 1024
+MAX_ERROR_SAMPLES = 20
+# Namespace for application ids derived from (source, line), so a re-run upserts the same rows
+BULK_ID_NAMESPACE = uuid.UUID('6f1c2a8e-4b7d-4e59-9a63-0d2f8c71b5e4')
+
+def resolve_scoring_mode(seed: Optional[int], deterministic: Optional[bool]) -> Tuple[Optional[int], bool]:
+    """Defaults shared with /underwrite/batch: CREDIT_SCORE_MODE and its seed"""
+    if deterministic is None:
+        deterministic = credit_scoring_service.mode == 'deterministic'
+    if seed is None and deterministic:
+        seed = credit_scoring_service.seed
+    return seed, deterministic
+
+def iter_text_lines(chunks: Iterable[bytes], encoding: str = 'utf-8-sig',
+                    max_line_chars: int = MAX_LINE_CHARS) -> Iterator[str]:
+    """
+    Decode byte chunks incrementally into lines (line endings kept, for the csv module).
+    Raises ValueError once a line exceeds max_line_chars, instead of buffering it whole.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        lines = pending.split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + '\n'
+        if len(pending) > max_line_chars:
+            raise ValueError(f'Line longer than {max_line_chars} characters; expected one applicant per line')
+    pending += decoder.decode(b'', final=True)
+    if len(pending) > max_line_chars:
+        raise ValueError(f'Line longer than {max_line_chars} characters; expected one applicant per line')
+    if pending:
+        yield pending
+
+def iter_file_chunks(file) -> Iterator[bytes]:
+    return iter(lambda: file.read(READ_CHUNK_BYTES), b'')
+
+def applicant_file_format(filename: Optional[str], declared: Optional[str] = None) -> str:
+    """'csv' or 'jsonl', from the declared format or the file extension"""
+    fmt = (declared or os.path.splitext(filename or '')[1].lstrip('.')).lower()
+    if fmt in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    if fmt in ('csv', 'txt', ''):
+        return 'csv'
+    raise ValueError(f'Unsupported applicant file format: {fmt}')
+
+def iter_records(lines: Iterable[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """(line number, raw record) pairs; JSONL lines that are not valid JSON yield the error"""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_no, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f'invalid JSON: {e}')
+
+def parse_applicant(record: Any, require_user: bool) -> Dict[str, Any]:
+    """Validate one raw record; raises ValueError with a short reason"""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError('record must be an object')
+    try:
+        income = float(str(record.get('income', '')).replace(',', ''))
+    except ValueError:
+        raise ValueError(f"invalid income {record.get('income')!r}")
+    if not math.isfinite(income):
+        raise ValueError(f"income must be a finite number, got {record.get('income')!r}")
+    if income <= 0:
+        raise ValueError('income must be positive')
+    employment_type = str(record.get('employment_type') or '').strip()
+    if not employment_type:
+        raise ValueError('employment_type is required')
+    user_id = str(record.get('user_id') or '').strip() or None
+    if require_user and not user_id:
+        raise ValueError('user_id is required')
+    return {
+        'id': str(record.get('id') or record.get('application_id') or '').strip() or None,
+        'user_id': user_id,
+        'income': income,
+        'employment_type': employment_type
+    }
+
+def application_row(result: Dict[str, Any]) -> Dict[str, Any]:
+    """loan_applications row for a scored applicant (same fields UnderwritingAgent writes)"""
+    return {
+        'id': result['id'],
+        'user_id': result['user_id'],
+        'income': result['income'],
+        'employment_type': result['employment_type'],
+        'credit_score': result['credit_score'],
+        'loan_amount': result['max_loan_amount'],
+        'interest_rate': result['interest_rate'],
+        'status': result['status']
+    }
+
+class BulkPreapprovalPipeline:
+    """
+    Reads applicants lazily, scores them `chunk_size` at a time with underwrite_rows and
+    upserts each chunk into loan_applications as one request. Up to `write_concurrency`
+    chunk writes overlap with scoring; reading waits when that many are in flight, so
+    memory is bounded by (write_concurrency + 1) chunks whatever the file size.
+
+    Rows without an id get one derived from (source_id, line number), so retrying or
+    re-importing the same file updates rows instead of duplicating them.
+    """
+
+    def __init__(self, database=None, chunk_size: int = None, write_concurrency: int = None):
+        if database is None:
+            from services.supabase_client import supabase_client
+            database = supabase_client
+        self.database = database
+        self.chunk_size = chunk_size or int(os.getenv('BULK_CHUNK_SIZE', '5000'))
+        self.write_concurrency = write_concurrency or int(os.getenv('BULK_WRITE_CONCURRENCY', '2'))
+        self.histogram = metrics_registry.histogram('bulk_preapproval.chunk_seconds')
+        self.totals = {'runs': 0, 'rows': 0, 'written': 0, 'invalid': 0, 'write_failed': 0}
+
+    def run(self, lines: Iterable[str], fmt: str, source_id: str, dry_run: bool = False,
+            seed: Optional[int] = None, deterministic: Optional[bool] = None, chunk_size: int = None,
+            on_results: Callable[[List[Dict[str, Any]]], None] = None,
+            on_progress: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
+        """
+        Score (and unless dry_run, store) every applicant in `lines`, chunk_size at a time.
+        on_results receives each scored chunk; on_progress the running summary after each chunk.
+        Returns: summary with row counts, status counts, error samples and rows_per_second.
+        """
+        seed, deterministic = resolve_scoring_mode(seed, deterministic)
+        chunk_size = chunk_size or self.chunk_size
+        summary = {
+            'rows': 0, 'scored': 0, 'written': 0, 'invalid': 0, 'write_failed': 0,
+            'status_counts': {'APPROVED': 0, 'REVIEW': 0, 'REJECTED': 0},
+            'errors': [], 'dry_run': dry_run, 'elapsed_seconds': 0.0, 'rows_per_second': 0.0
+        }
+        started_at = time.perf_counter()
+        records = iter_records(lines, fmt)
+        pending: Set[Future] = set()
+
+        with ThreadPoolExecutor(max_workers=self.write_concurrency, thread_name_prefix='bulk-write') as writers:
+            while True:
+                batch = list(islice(records, chunk_size))
+                if not batch:
+                    break
+                chunk_started_at = time.perf_counter()
+                applicants = self._parse(batch, source_id, not dry_run, summary)
+                results = underwrite_rows(applicants, seed, deterministic) if applicants else []
+                summary['scored'] += len(results)
+                for result in results:
+                    summary['status_counts'][result['status']] += 1
+                if on_results:
+                    on_results(results)
+
+                if not dry_run and results:
+                    while len(pending) >= self.write_concurrency:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        self._collect(done, summary)
+                    rows = [application_row(result) for result in results]
+                    pending.add(writers.submit(self._write, rows))
+
+                self.histogram.observe(time.perf_counter() - chunk_started_at)
+                self._update_rate(summary, started_at)
+                if on_progress:
+                    on_progress(summary)
+
+            self._collect(pending, summary)
+
+        self._update_rate(summary, started_at)
+        self.totals['runs'] += 1
+        for key in ('rows', 'written', 'invalid', 'write_failed'):
+            self.totals[key] += summary[key]
+        return summary
+
+    @classmethod
+    def _parse(cls, batch: List[Tuple[int, Any]], source_id: str, require_user: bool,
+               summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Valid applicants of one chunk, unique by id (one upsert cannot touch a row twice):
+        when an explicit id repeats, the last row wins and earlier ones count as invalid.
+        """
+        applicants: Dict[str, Dict[str, Any]] = {}
+        for line_no, record in batch:
+            summary['rows'] += 1
+            try:
+                applicant = parse_applicant(record, require_user)
+            except ValueError as e:
+                cls._reject(summary, line_no, str(e))
+                continue
+            applicant['id'] = applicant['id'] or str(uuid.uuid5(BULK_ID_NAMESPACE, f'{source_id}:{line_no}'))
+            applicant['line'] = line_no
+            previous = applicants.pop(applicant['id'], None)
+            if previous is not None:
+                cls._reject(summary, previous['line'], f"duplicate id {applicant['id']}, superseded by line {line_no}")
+            applicants[applicant['id']] = applicant
+        return list(applicants.values())
+
+    @staticmethod
+    def _reject(summary: Dict[str, Any], line_no: int, error: str):
+        summary['invalid'] += 1
+        if len(summary['errors']) < MAX_ERROR_SAMPLES:
+            summary['errors'].append({'line': line_no, 'error': error})
+
+    def _write(self, rows: List[Dict[str, Any]]) -> Tuple[int, Optional[str], int]:
+        """Upsert one chunk; returns (rows written, error, rows failed) instead of raising"""
+        try:
+            self.database.upsert_loan_applications(rows)
+            return len(rows), None, 0
+        except Exception as e:
+            return 0, str(e), len(rows)
+
+    @staticmethod
+    def _collect(done: Iterable[Future], summary: Dict[str, Any]):
+        for future in done:
+            written, error, failed = future.result()
+            summary['written'] += written
+            if error:
+                summary['write_failed'] += failed
+                if len(summary['errors']) < MAX_ERROR_SAMPLES:
+                    summary['errors'].append({'line': None, 'error': f'write failed for {failed} rows: {error}'})
+
+    @staticmethod
+    def _update_rate(summary: Dict[str, Any], started_at: float):
+        elapsed = time.perf_counter() - started_at
+        summary['elapsed_seconds'] = round(elapsed, 3)
+        summary['rows_per_second'] = round(summary['rows'] / elapsed, 1) if elapsed else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {'chunk_size': self.chunk_size, 'write_concurrency': self.write_concurrency, **self.totals}
+
+# Singleton instance
+bulk_preapproval_pipeline = BulkPreapprovalPipeline()
+metrics_registry.register_collector('bulk_preapproval', bulk_preapproval_pipeline.stats)
+
+def main():
+    import argparse
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='Pre-approve a CSV/JSONL file of applicants in bulk')
+    parser.add_argument('path', help="applicant file ('-' for stdin); columns: user_id, income, employment_type[, id]")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help='defaults to the file extension')
+    parser.add_argument('--chunk-size', type=int)
+    parser.add_argument('--dry-run', action='store_true', help='score only, do not write loan_applications')
+    parser.add_argument('--output', help='also write every scored applicant to this JSONL file')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--deterministic', action=argparse.BooleanOptionalAction, default=None)
+    args = parser.parse_args()
+
+    pipeline = bulk_preapproval_pipeline
+    if not args.dry_run and not pipeline.database.configured:
+        parser.error('No database configured (Supabase or PERSISTENCE_BACKEND=sqlite); use --dry-run to score only')
+
+    fmt = applicant_file_format(None if args.path == '-' else args.path, args.format)
+    source = sys.stdin.buffer if args.path == '-' else open(args.path, 'rb')
+    if args.path == '-':
+        source_id = f'stdin:{time.time()}'
+    else:
+        info = os.stat(args.path)
+        source_id = f'{os.path.abspath(args.path)}:{info.st_size}:{info.st_mtime_ns}'
+    output = open(args.output, 'w') if args.output else None
+
+    def write_results(results):
+        for result in results:
+            output.write(json.dumps(result) + '\n')
+
+    def progress(summary):
+        print(f"\r{summary['rows']:,} rows  {summary['rows_per_second']:,.0f} rows/s  "
+              f"written {summary['written']:,}  invalid {summary['invalid']:,}", end='', file=sys.stderr)
+
+    try:
+        summary = pipeline.run(
+            iter_text_lines(iter_file_chunks(source)), fmt, source_id,
+            dry_run=args.dry_run, seed=args.seed, deterministic=args.deterministic, chunk_size=args.chunk_size,
+            on_results=write_results if output else None, on_progress=progress
+        )
+    except ValueError as e:
+        parser.exit(1, f'\n{e}\n')
+    finally:
+        source.close()
+        if output:
+            output.close()
+        if not args.dry_run:
+            pipeline.database.close()
+
+    print(file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,85 @@
+import hashlib
+import os
 import random
+from services.lru_cache import LRUCache
+from services.metrics import metrics_registry
 
 class CreditScoringService:
     """
     Mock credit scoring service
     In production, this would integrate with actual credit bureaus
+    
+    Scoring modes (CREDIT_SCORE_MODE):
+    - random: the random factor changes on every call (original behaviour)
+    - deterministic: the random factor is derived from a stable hash of the applicant
+      inputs and CREDIT_SCORE_SEED, and results are memoized in an LRU cache
     """
     
+    # Employment factor; unknown types score 30
+    EMPLOYMENT_SCORES = {
+        'salaried': 80,
+        'self-employed': 50,
+        'business': 60,
+        'professional': 70,
+        'other': 20
+    }
+    DEFAULT_EMPLOYMENT_SCORE = 30
+    
+    def __init__(self, mode: str = None, seed: int = None, cache_size: int = None):
+        self.mode = (mode or os.getenv('CREDIT_SCORE_MODE', 'random')).lower()
+        self.seed = seed if seed is not None else int(os.getenv('CREDIT_SCORE_SEED', '0'))
+        self.assessment_cache = LRUCache(
+            max_size=cache_size or int(os.getenv('CREDIT_SCORE_CACHE_SIZE', '10000'))
+        )
+    
     @staticmethod
-    def calculate_credit_score(income: float, employment_type: str) -> int:
+    def normalize_inputs(income: float, employment_type: str) -> tuple:
+        """Inputs as the scoring rules see them (income to paisa, lower-cased employment)"""
+        return round(float(income), 2), employment_type.lower()
+    
+    @staticmethod
+    def stable_random_factor(income: float, employment_type: str, seed: int = 0) -> int:
+        """Random factor in [-20, 20] derived from a stable hash of the applicant inputs"""
+        income_key, employment_key = CreditScoringService.normalize_inputs(income, employment_type)
+        digest = hashlib.blake2b(
+            f'{seed}|{income_key:.2f}|{employment_key}'.encode('utf-8'),
+            digest_size=8
+        ).digest()
+        return int.from_bytes(digest, 'big') % 41 - 20
+    
+    def assess_applicant(self, income: float, employment_type: str) -> dict:
+        """
+        Credit score, eligibility and decision for an applicant using the configured mode
+        Returns: dict with credit_score, status and the calculate_loan_eligibility fields
+        """
+        if self.mode != 'deterministic':
+            return self._assess(income, employment_type, None)
+        
+        # Keyed on the exact income the thresholds see; rounding here would let 29999.996
+        # and 30000.004 share an entry despite scoring on opposite sides of 30000
+        key = (self.seed, float(income), employment_type.lower())
+        cached = self.assessment_cache.get(key)
+        if cached is None:
+            random_factor = self.stable_random_factor(income, employment_type, self.seed)
+            cached = self._assess(income, employment_type, random_factor)
+            self.assessment_cache.set(key, cached)
+        return dict(cached)
+    
+    def _assess(self, income: float, employment_type: str, random_factor: int = None) -> dict:
+        credit_score = self.calculate_credit_score(income, employment_type, random_factor=random_factor)
+        return {
+            'credit_score': credit_score,
+            'status': self.determine_status(income, credit_score),
+            **self.calculate_loan_eligibility(income, credit_score)
+        }
+    
+    @staticmethod
+    def calculate_credit_score(income: float, employment_type: str, rng: random.Random = None,
+                               random_factor: int = None) -> int:
         """
         Calculate a mock credit score based on income and employment
+        Pass a seeded random.Random as rng to make the random factor reproducible,
+        or an explicit random_factor to skip the draw entirely
         Returns: Credit score between 300-850
         """
         base_score = 600
@@ -25,18 +95,14 @@ class CreditScoringService:
             income_score = 0
         
         # Employment factor
-        employment_scores = {
-            'salaried': 80,
-            'self-employed': 50,
-            'business': 60,
-            'professional': 70,
-            'other': 20
-        }
-        
-        employment_score = employment_scores.get(employment_type.lower(), 30)
+        employment_score = CreditScoringService.EMPLOYMENT_SCORES.get(
+            employment_type.lower(),
+            CreditScoringService.DEFAULT_EMPLOYMENT_SCORE
+        )
         
         # Add some randomness for realism
-        random_factor = random.randint(-20, 20)
+        if random_factor is None:
+            random_factor = (rng or random).randint(-20, 20)
         
         # Calculate final score
         final_score = base_score + income_score + employment_score + random_factor
@@ -59,6 +125,19 @@ class CreditScoringService:
         else:
             return 'HIGH'
     
+    @staticmethod
+    def determine_status(income: float, credit_score: int) -> str:
+        """
+        Underwriting decision for an applicant
+        Returns: 'APPROVED', 'REVIEW', or 'REJECTED'
+        """
+        if income >= 30000 and credit_score >= 700:
+            return 'APPROVED'
+        elif income >= 20000 and credit_score >= 650:
+            return 'REVIEW'
+        else:
+            return 'REJECTED'
+    
     @staticmethod
     def calculate_loan_eligibility(income: float, credit_score: int) -> dict:
         """
@@ -95,3 +174,4 @@ class CreditScoringService:
 
 # Singleton instance
 credit_scoring_service = CreditScoringService()
+metrics_registry.register_collector('credit_score_cache', credit_scoring_service.assessment_cache.stats)
@@ -0,0 +1,359 @@
+"""
+Document Extractor - One OCR router across local Tesseract, EdenAI, Gemini and OCR.space
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from services.agent_executor import agent_executor
+from services.document_stream import DocumentBuffer
+from services.edenai_ocr_service import EdenAIOCRService
+from services.image_preprocessor import ImageRejectedError, image_preprocessor
+from services.gemini_ocr_service import gemini_ocr_service
+from services.kyc_validators import validate_document_fields, validate_extraction
+from services.local_ocr_service import DOCUMENT_TYPE_NAMES, local_ocr_service, parse_document_text
+from services.metrics import metrics_registry
+from services.ocr_service import ocr_service
+from services.tracing import span
+
+# Document types whose results must carry extracted fields (others only need text)
+STRUCTURED_TYPES = ('pan', 'aadhaar', 'itr', 'balance_sheet')
+
+class CircuitBreaker:
+    """
+    closed -> open when the rolling error rate reaches `error_rate` over at least `min_calls`;
+    open -> half_open after `open_seconds` (one trial call); trial success closes, failure reopens.
+    """
+
+    def __init__(self, error_rate: float, min_calls: int, open_seconds: float):
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = 'closed'
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        if self.state == 'closed':
+            return True
+        if self.state == 'open' and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = 'half_open'
+            self.trial_in_flight = False
+        if self.state == 'half_open' and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return False
+
+    def record(self, ok: bool, calls: int, errors: int) -> bool:
+        """Update state after a call; returns True when the window should be reset"""
+        if self.state == 'half_open':
+            if ok:
+                self.state = 'closed'
+                return True
+            self._open()
+            return False
+        if self.state == 'closed' and calls >= self.min_calls and errors / calls >= self.error_rate:
+            self._open()
+        return False
+
+    def release(self):
+        """An allowed call ended without an outcome (e.g. cancelled); let another call run the trial"""
+        if self.state == 'half_open':
+            self.trial_in_flight = False
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = time.monotonic()
+        self.trial_in_flight = False
+        self.times_opened += 1
+
+class ProviderHealth:
+    """
+    Rolling window of the last `window` calls within `window_seconds` (latency, ok) plus a
+    circuit breaker. Samples age out, so a provider that was slow or failing is probed again later.
+    """
+
+    def __init__(self, name: str, window: int, window_seconds: float, breaker: CircuitBreaker):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.calls = deque(maxlen=window)
+        self.breaker = breaker
+        self.rejected = 0
+        self._lock = threading.Lock()
+        # Observed by the ocr.<provider> span in DocumentExtractor._route
+        self.histogram = metrics_registry.histogram(f'ocr.{name}.seconds')
+
+    def _recent(self) -> list:
+        cutoff = time.monotonic() - self.window_seconds
+        with self._lock:
+            while self.calls and self.calls[0][0] < cutoff:
+                self.calls.popleft()
+            return list(self.calls)
+
+    def record(self, latency: float, ok: bool):
+        calls = self._recent()
+        with self._lock:
+            self.calls.append((time.monotonic(), latency, ok))
+            errors = sum(1 for _, _, success in calls if not success) + (not ok)
+            if self.breaker.record(ok, len(calls) + 1, errors):
+                self.calls.clear()
+
+    def allow(self) -> bool:
+        with self._lock:
+            return self.breaker.allow()
+
+    def release(self):
+        with self._lock:
+            self.breaker.release()
+
+    @property
+    def mean_latency(self) -> float:
+        """Mean over the window (failures count with the time they took); 0 until measured"""
+        calls = self._recent()
+        return sum(latency for _, latency, _ in calls) / len(calls) if calls else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        calls = self._recent()
+        return sum(1 for _, _, ok in calls if not ok) / len(calls) if calls else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'state': self.breaker.state,
+            'times_opened': self.breaker.times_opened,
+            'window_calls': len(self._recent()),
+            'error_rate': round(self.error_rate, 3),
+            'mean_latency_ms': round(self.mean_latency * 1000, 1),
+            'p95_ms': round((self.histogram.quantile(0.95) or 0) * 1000, 1),
+            'rejected_low_quality': self.rejected
+        }
+
+class LocalProvider:
+    name = 'local'
+    local = True
+
+    def __init__(self, service=local_ocr_service):
+        self.service = service
+
+    @property
+    def configured(self) -> bool:
+        return os.getenv('LOCAL_OCR_ENABLED', 'true').lower() == 'true' and self.service.available
+
+    async def extract(self, document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        return await self.service.aextract_document(document, document_type)
+
+class EdenAIProvider:
+    name = 'edenai'
+    local = False
+    configured = True
+
+    def __init__(self, service: EdenAIOCRService):
+        self.service = service
+
+    async def extract(self, document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        return await self.service.aextract_document(document, document_type)
+
+class GeminiProvider:
+    name = 'gemini'
+    local = False
+
+    def __init__(self, service=gemini_ocr_service):
+        self.service = service
+
+    @property
+    def configured(self) -> bool:
+        return self.service.model is not None
+
+    async def extract(self, document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        result = await agent_executor.run(
+            'ocr', self.service.extract_from_bytes, document.read_bytes(), document.mime_type
+        )
+        if not result.get('success'):
+            return {'success': False, 'error': result.get('error')}
+        structured = result.get('structured_data', {})
+        return {
+            'success': True,
+            'document_type': structured.get('document_type', DOCUMENT_TYPE_NAMES.get(document_type.lower(), 'general')),
+            'extracted_data': {k: v for k, v in (structured.get('extracted_data') or {}).items() if v},
+            'raw_text': structured.get('raw_text', result.get('text', '')),
+            'confidence': structured.get('confidence', 'medium')
+        }
+
+class OCRSpaceProvider:
+    name = 'ocr_space'
+    local = False
+
+    def __init__(self, service=ocr_service):
+        self.service = service
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.service.api_key)
+
+    def _extract(self, document: DocumentBuffer) -> Dict[str, Any]:
+        return self.service.extract_from_file(document.read_bytes(), document.filename or 'document.jpg')
+
+    async def extract(self, document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        result = await agent_executor.run('ocr', self._extract, document)
+        if not result.get('success'):
+            return {'success': False, 'error': result.get('error')}
+        return {
+            'success': True,
+            'document_type': DOCUMENT_TYPE_NAMES.get(document_type.lower(), 'general'),
+            'extracted_data': parse_document_text(result['text'], document_type),
+            'raw_text': result['text'],
+            'confidence': 'medium'
+        }
+
+class DocumentExtractor:
+    """
+    Routes each document local-first, then to the fastest healthy cloud provider.
+
+    - Local providers (`local = True`) always go first, in registration order; only cloud
+      providers are ranked, by rolling mean latency plus error rate x timeout (unmeasured
+      providers first, ties keep registration order)
+    - Each call is bounded by `timeout`, so a hanging provider costs one timeout, not the read timeout
+    - Errors and timeouts feed a per-provider circuit breaker; open providers are skipped
+    - Results without fields, with a PAN/Aadhaar number failing validation, or below
+      `min_confidence` where a score is reported fall through to the next provider
+      without counting against its health
+    """
+
+    def __init__(self, providers: List[Any], timeout: float = None, min_confidence: float = None,
+                 window: int = None, window_seconds: float = None, error_rate: float = None,
+                 min_calls: int = None, open_seconds: float = None):
+        self.providers = providers
+        self.timeout = timeout or float(os.getenv('OCR_PROVIDER_TIMEOUT', '10'))
+        # LOCAL_OCR_MIN_CONFIDENCE is the old name, from when only Tesseract reported a score
+        self.min_confidence = min_confidence if min_confidence is not None else float(
+            os.getenv('OCR_MIN_CONFIDENCE', os.getenv('LOCAL_OCR_MIN_CONFIDENCE', '70'))
+        )
+        window = window or int(os.getenv('OCR_HEALTH_WINDOW', '50'))
+        window_seconds = window_seconds or float(os.getenv('OCR_HEALTH_WINDOW_SECONDS', '120'))
+        error_rate = error_rate or float(os.getenv('OCR_BREAKER_ERROR_RATE', '0.5'))
+        min_calls = min_calls or int(os.getenv('OCR_BREAKER_MIN_CALLS', '5'))
+        open_seconds = open_seconds or float(os.getenv('OCR_BREAKER_OPEN_SECONDS', '30'))
+        self.health = {
+            provider.name: ProviderHealth(provider.name, window, window_seconds, CircuitBreaker(error_rate, min_calls, open_seconds))
+            for provider in providers
+        }
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.providers)
+
+    def get(self, name: str):
+        for provider in self.providers:
+            if provider.name == name:
+                return provider.service
+        return None
+
+    def expected_cost(self, name: str) -> float:
+        """Rolling mean latency plus the time a failure is expected to waste"""
+        health = self.health[name]
+        return health.mean_latency + health.error_rate * self.timeout
+
+    def ranked(self) -> List[Any]:
+        """Local providers first (never paid for), then cloud providers by expected cost"""
+        local = [provider for provider in self.providers if getattr(provider, 'local', False)]
+        cloud = [provider for provider in self.providers if not getattr(provider, 'local', False)]
+        order = {provider.name: i for i, provider in enumerate(cloud)}
+        return local + sorted(cloud, key=lambda p: (self.expected_cost(p.name), order[p.name]))
+
+    def acceptable(self, result: Dict[str, Any], document_type: str) -> bool:
+        if document_type.lower() in STRUCTURED_TYPES:
+            if not result.get('extracted_data'):
+                return False
+            if not validate_document_fields(document_type, result['extracted_data'], result.get('raw_text', ''))['valid']:
+                return False
+        elif not result.get('raw_text', '').strip():
+            return False
+        score = result.get('confidence_score')
+        return score is None or score >= self.min_confidence
+
+    async def aextract_document(self, document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        """Preprocess the image once, then try providers in ranked order"""
+        try:
+            prepared = await agent_executor.run('ocr', image_preprocessor.process, document)
+        except ImageRejectedError as e:
+            # Unusable scan: reject locally instead of paying for provider calls
+            return {'success': False, 'error': str(e), 'rejected_locally': True}
+
+        try:
+            return await self._route(prepared, document_type)
+        finally:
+            if prepared is not document:
+                prepared.close()
+
+    async def _route(self, document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        fallback: Optional[Dict[str, Any]] = None
+        last_error = 'No OCR provider configured'
+
+        for provider in self.ranked():
+            health = self.health[provider.name]
+            if not health.allow():
+                last_error = f'{provider.name} circuit open'
+                continue
+
+            # Every allowed call is recorded or released: a cancelled half-open trial
+            # (CancelledError is not an Exception) would otherwise keep the breaker shut
+            recorded = False
+            try:
+                # ocr.<provider>.seconds / ocr.<provider>.errors
+                with span(f'ocr.{provider.name}') as timing:
+                    try:
+                        result = await asyncio.wait_for(provider.extract(document, document_type), timeout=self.timeout)
+                    except asyncio.TimeoutError:
+                        result = {'success': False, 'error': f'{provider.name} timed out after {self.timeout:g}s'}
+                    except Exception as e:
+                        result = {'success': False, 'error': str(e)}
+                    timing.error = not result.get('success', False)
+                health.record(timing.seconds, result.get('success', False))
+                recorded = True
+            finally:
+                if not recorded:
+                    health.release()
+
+            if not result.get('success'):
+                last_error = result.get('error') or f'{provider.name} failed'
+                continue
+
+            result = {**result, 'provider': result.get('provider', provider.name)}
+            if self.acceptable(result, document_type):
+                return result
+            health.rejected += 1
+            fallback = fallback or result
+
+        return fallback or {'success': False, 'error': last_error}
+
+    async def aextract_and_validate(self, document: DocumentBuffer,
+                                    document_type: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        extraction_result = await self.aextract_document(document, document_type)
+        return extraction_result, self.validate_extraction(extraction_result, document_type)
+
+    def validate_extraction(self, extraction_result: Dict[str, Any], document_type: str) -> Dict[str, Any]:
+        # Every provider result is normalised to the EdenAI result shape
+        return validate_extraction(extraction_result, document_type)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'routing_order': [provider.name for provider in self.ranked()],
+            'providers': {name: health.stats() for name, health in self.health.items()}
+        }
+
+def create_document_extractor() -> DocumentExtractor:
+    """Register every configured provider (local first)"""
+    candidates = [LocalProvider()]
+    try:
+        candidates.append(EdenAIProvider(EdenAIOCRService()))
+    except ValueError as e:
+        print(f"Warning: EdenAI OCR service not initialized: {e}")
+    candidates.extend([GeminiProvider(), OCRSpaceProvider()])
+    return DocumentExtractor([provider for provider in candidates if provider.configured])
+
+# Singleton instance
+document_extractor = create_document_extractor()
+metrics_registry.register_collector('ocr_providers', document_extractor.stats)
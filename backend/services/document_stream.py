@@ -0,0 +1,159 @@
+"""
+Document Stream - Upload buffering and streamed base64 encoding for OCR providers
+"""
+import base64
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from typing import AsyncIterator, BinaryIO, Iterator, Optional, Tuple
+
+# Raw bytes per chunk; a multiple of 3 so base64 chunks concatenate without padding
+CHUNK_SIZE = 48 * 1024
+
+MAX_UPLOAD_BYTES = int(os.getenv('KYC_MAX_UPLOAD_MB', '10')) * 1024 * 1024
+SPOOL_THRESHOLD_BYTES = int(os.getenv('KYC_SPOOL_THRESHOLD_KB', '1024')) * 1024
+
+# Leading bytes -> (format, MIME type); WebP is RIFF....WEBP and is checked separately
+MAGIC_NUMBERS = (
+    (b'\xff\xd8\xff', 'jpeg', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png', 'image/png'),
+    (b'GIF87a', 'gif', 'image/gif'),
+    (b'GIF89a', 'gif', 'image/gif'),
+    (b'II*\x00', 'tiff', 'image/tiff'),
+    (b'MM\x00*', 'tiff', 'image/tiff'),
+    (b'BM', 'bmp', 'image/bmp'),
+    (b'%PDF-', 'pdf', 'application/pdf'),
+)
+
+def detect_format(head: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """(format, MIME type) from the first bytes of a file, or (None, None) if unrecognised"""
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp', 'image/webp'
+    for magic, image_format, mime_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return image_format, mime_type
+    return None, None
+
+class UploadTooLargeError(ValueError):
+    """The upload exceeded the configured maximum size"""
+
+class DocumentBuffer:
+    """
+    A document held once: in memory up to the spool threshold, on disk beyond it
+    (or backed directly by an existing file / bytes object without copying).
+
+    The SHA-256 and size are computed while the data is written, and every reader
+    (raw chunks or base64 chunks) tracks its own offset, so several provider
+    requests can stream the same document concurrently.
+    """
+
+    def __init__(self, file: BinaryIO, size: int, sha256: str, filename: str = None,
+                 content_type: str = None):
+        self._file = file
+        self._lock = threading.Lock()
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+        self.content_type = content_type
+        self._detected = None
+
+    @classmethod
+    def from_bytes(cls, data: bytes, filename: str = None, content_type: str = None) -> 'DocumentBuffer':
+        return cls(io.BytesIO(data), len(data), hashlib.sha256(data).hexdigest(), filename, content_type)
+
+    @classmethod
+    def from_path(cls, path: str, content_type: str = None) -> 'DocumentBuffer':
+        """Open an existing file in place (no copy); raises FileNotFoundError if missing"""
+        file = open(path, 'rb')
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+        return cls(file, size, digest.hexdigest(), os.path.basename(path), content_type)
+
+    @classmethod
+    async def from_upload(cls, upload, max_size: int = None, spool_threshold: int = None) -> 'DocumentBuffer':
+        """
+        Copy a FastAPI UploadFile chunk by chunk, enforcing max_size while reading.
+        Small files stay in memory; larger ones spool to a temp file.
+        """
+        max_size = max_size or MAX_UPLOAD_BYTES
+        spooled = tempfile.SpooledTemporaryFile(max_size=spool_threshold or SPOOL_THRESHOLD_BYTES)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(
+                        f'File exceeds the maximum upload size of {max_size // (1024 * 1024)} MB'
+                    )
+                digest.update(chunk)
+                spooled.write(chunk)
+        except Exception:
+            spooled.close()
+            raise
+
+        return cls(spooled, size, digest.hexdigest(), upload.filename, upload.content_type)
+
+    @property
+    def in_memory(self) -> bool:
+        rolled = getattr(self._file, '_rolled', None)
+        return isinstance(self._file, io.BytesIO) or rolled is False
+
+    def _detect(self) -> Tuple[Optional[str], Optional[str]]:
+        if self._detected is None:
+            self._detected = detect_format(self._read_at(0, 16))
+        return self._detected
+
+    @property
+    def image_format(self) -> Optional[str]:
+        """Format detected from magic bytes (jpeg, png, webp, tiff, bmp, gif, pdf) or None"""
+        return self._detect()[0]
+
+    @property
+    def mime_type(self) -> str:
+        """MIME type from the file contents; the client-declared type is only a fallback"""
+        return self._detect()[1] or self.content_type or 'application/octet-stream'
+
+    def _read_at(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            self._file.seek(offset)
+            return self._file.read(length)
+
+    def iter_chunks(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        offset = 0
+        while offset < self.size:
+            chunk = self._read_at(offset, chunk_size)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+
+    def iter_base64(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Base64 of the document in pieces; never holds the whole encoded string"""
+        for chunk in self.iter_chunks(chunk_size - chunk_size % 3):
+            yield base64.b64encode(chunk)
+
+    async def aiter_base64(self, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+        for encoded in self.iter_base64(chunk_size):
+            yield encoded
+
+    def read_bytes(self) -> bytes:
+        """Whole document as bytes (for consumers that need it, e.g. image decoders)"""
+        return self._read_at(0, self.size)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
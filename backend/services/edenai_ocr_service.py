@@ -1,8 +1,17 @@
 import os
+import asyncio
+import copy
+import time
 import requests
+import httpx
 import json
-import base64
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, Optional, Tuple
+from services.lru_cache import LRUCache
+from services.http_transport import http_transport
+from services.document_stream import DocumentBuffer
+from services.image_preprocessor import ImageRejectedError, image_preprocessor
+from services.metrics import metrics_registry
+from services.kyc_validators import validate_document_fields, validate_extraction
 
 class EdenAIOCRService:
     """
@@ -20,6 +29,23 @@ class EdenAIOCRService:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
+        
+        # Successful extractions keyed by image content hash, so re-uploads skip the API
+        self.result_cache = LRUCache(
+            max_size=int(os.getenv('EDENAI_CACHE_SIZE', '512')),
+            ttl_seconds=float(os.getenv('EDENAI_CACHE_TTL', '3600'))
+        )
+        
+        # Hedged mode: one request per provider, started at the given delays (seconds);
+        # the first result passing the quality bar wins and the rest are cancelled
+        self.hedge_enabled = os.getenv('EDENAI_HEDGE_MODE', 'off').lower() == 'on'
+        self.providers = [p.strip() for p in os.getenv('EDENAI_PROVIDERS', 'amazon,google,microsoft').split(',') if p.strip()]
+        hedge_delays = [float(d) for d in os.getenv('EDENAI_HEDGE_DELAYS', '0,0.5,1.0').split(',') if d.strip()]
+        self.hedge_delays = [
+            hedge_delays[i] if i < len(hedge_delays) else hedge_delays[-1] for i in range(len(self.providers))
+        ]
+        self.min_text_length = int(os.getenv('EDENAI_MIN_TEXT_LENGTH', '10'))
+        self.hedge_stats = {provider: {'wins': 0, 'errors': 0, 'rejected': 0, 'cancelled': 0} for provider in self.providers}
     
     def extract_text_from_image(self, image_path: str, document_type: str = "general") -> Dict[str, Any]:
         """
@@ -33,126 +59,273 @@ class EdenAIOCRService:
             Dictionary containing extracted text and structured data
         """
         try:
-            # Read and encode image
-            with open(image_path, 'rb') as image_file:
-                image_data = base64.b64encode(image_file.read()).decode('utf-8')
-            
-            # Determine which EdenAI API to use based on document type
-            if document_type.lower() in ['pan', 'aadhaar', 'pan_card', 'aadhaar_card']:
-                return self._extract_identity_document(image_data, document_type)
-            elif document_type.lower() in ['itr', 'income_tax', 'tax_return']:
-                return self._extract_financial_document(image_data, 'itr')
-            elif document_type.lower() in ['balance_sheet', 'financial_statement']:
-                return self._extract_financial_document(image_data, 'balance_sheet')
-            else:
-                return self._extract_general_ocr(image_data)
-                
+            document = DocumentBuffer.from_path(image_path)
         except FileNotFoundError:
             return {
                 'success': False,
                 'error': f'Image file not found: {image_path}'
             }
-        except Exception as e:
-            return {
-                'success': False,
-                'error': f'OCR extraction failed: {str(e)}'
-            }
+        
+        with document:
+            try:
+                prepared = image_preprocessor.process(document)
+            except ImageRejectedError as e:
+                return {'success': False, 'error': str(e)}
+            result = self.extract_document(prepared, document_type)
+            if prepared is not document:
+                prepared.close()
+            return result
+    
+    def extract_from_bytes(self, image_bytes: bytes, document_type: str = "general") -> Dict[str, Any]:
+        """
+        Extract data from raw image bytes, serving repeated images from the result cache.
+        """
+        return self.extract_document(DocumentBuffer.from_bytes(image_bytes), document_type)
     
-    def _extract_identity_document(self, image_data: str, doc_type: str) -> Dict[str, Any]:
-        """Extract data from identity documents (PAN/Aadhaar) using EdenAI Identity Parser."""
+    def extract_document(self, document: DocumentBuffer, document_type: str = "general") -> Dict[str, Any]:
+        """
+        Extract data from a buffered document, serving repeated images from the result cache.
+        The image is base64-encoded in chunks as the request body is sent.
+        """
+        cache_key = (document.sha256, document_type.lower())
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
         
-        url = f"{self.base_url}/ocr/identity_parser"
+        result = self._extract(document, document_type)
+        self._cache(cache_key, result)
+        return result
+    
+    async def aextract_document(self, document: DocumentBuffer, document_type: str = "general") -> Dict[str, Any]:
+        """
+        Async variant of extract_document for FastAPI handlers (uses the shared httpx client).
+        """
+        cache_key = (document.sha256, document_type.lower())
+        cached = self._cached(cache_key)
+        if cached is not None:
+            return cached
         
-        payload = {
-            "providers": "amazon,google,microsoft",  # Use multiple providers for accuracy
-            "file": f"data:image/jpeg;base64,{image_data}",
-            "fallback_providers": "google,microsoft"
-        }
+        result = await self._aextract(document, document_type)
+        self._cache(cache_key, result)
+        return result
+    
+    def _cached(self, cache_key: tuple) -> Optional[Dict[str, Any]]:
+        # Copies in and out: callers mutate results (e.g. extracted_data) without touching the cache
+        cached = self.result_cache.get(cache_key)
+        return copy.deepcopy(cached) if cached is not None else None
+    
+    def _cache(self, cache_key: tuple, result: Dict[str, Any]):
+        # Only cache successes so transient provider errors are retried
+        if result.get('success'):
+            self.result_cache.set(cache_key, copy.deepcopy(result))
+    
+    async def aextract_and_validate(self, document: DocumentBuffer, document_type: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Async single-pass extraction and validation of a buffered upload.
+        
+        Returns:
+            Tuple of (extraction_result, validation_result)
+        """
+        extraction_result = await self.aextract_document(document, document_type)
+        return extraction_result, self.validate_extraction(extraction_result, document_type)
+    
+    def _route(self, document_type: str) -> Tuple[str, Dict[str, Any], Callable[[Dict], Dict[str, Any]]]:
+        """Pick the EdenAI endpoint, extra payload fields and response parser for a document type."""
+        doc_type = document_type.lower()
         
+        if doc_type in ['pan', 'pan_card']:
+            return f"{self.base_url}/ocr/identity_parser", {}, self._parse_pan_response
+        elif doc_type in ['aadhaar', 'aadhaar_card']:
+            return f"{self.base_url}/ocr/identity_parser", {}, self._parse_aadhaar_response
+        elif doc_type in ['itr', 'income_tax', 'tax_return']:
+            # EdenAI financial parser
+            return f"{self.base_url}/ocr/financial_parser", {"document_type": "invoice"}, self._parse_itr_response
+        elif doc_type in ['balance_sheet', 'financial_statement']:
+            return f"{self.base_url}/ocr/financial_parser", {"document_type": "invoice"}, self._parse_balance_sheet_response
+        else:
+            return f"{self.base_url}/ocr/ocr", {"language": "en"}, self._parse_general_response
+    
+    def _body_parts(self, extra_fields: Dict[str, Any], provider: str = None,
+                    mime_type: str = 'image/jpeg') -> Tuple[bytes, bytes]:
+        """JSON body split around the base64 file value, which is streamed in between."""
+        if provider:
+            # Hedged request to a single provider
+            routing = {"providers": provider}
+        else:
+            routing = {
+                "providers": "amazon,google,microsoft",  # Use multiple providers for accuracy
+                "fallback_providers": "google,microsoft"
+            }
+        fields = json.dumps({**routing, **extra_fields})
+        head = fields[:-1] + f', "file": "data:{mime_type};base64,'
+        return head.encode('utf-8'), b'"}'
+    
+    def _body(self, document: DocumentBuffer, extra_fields: Dict[str, Any]) -> Iterator[bytes]:
+        head, tail = self._body_parts(extra_fields, mime_type=document.mime_type)
+        yield head
+        yield from document.iter_base64()
+        yield tail
+    
+    async def _abody(self, document: DocumentBuffer, extra_fields: Dict[str, Any], provider: str = None) -> AsyncIterator[bytes]:
+        head, tail = self._body_parts(extra_fields, provider, document.mime_type)
+        yield head
+        async for encoded in document.aiter_base64():
+            yield encoded
+        yield tail
+    
+    def _extract(self, document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        """Stream the base64-encoded image to the EdenAI API matching the document type."""
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
+            url, extra_fields, parse = self._route(document_type)
+            response = http_transport.post(url, data=self._body(document, extra_fields), headers=self.headers)
             response.raise_for_status()
-            result = response.json()
-            
-            # Parse the response based on document type
-            if doc_type.lower() in ['pan', 'pan_card']:
-                return self._parse_pan_response(result)
-            else:  # Aadhaar
-                return self._parse_aadhaar_response(result)
-                
+            return parse(response.json())
+        
         except requests.exceptions.RequestException as e:
             return {
                 'success': False,
                 'error': f'EdenAI API request failed: {str(e)}'
             }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'OCR extraction failed: {str(e)}'
+            }
     
-    def _extract_financial_document(self, image_data: str, doc_type: str) -> Dict[str, Any]:
-        """Extract data from financial documents (ITR/Balance Sheet) using EdenAI Financial Parser."""
-        
-        url = f"{self.base_url}/ocr/financial_parser"
-        
-        payload = {
-            "providers": "amazon,google,microsoft",
-            "file": f"data:image/jpeg;base64,{image_data}",
-            "document_type": "invoice",  # EdenAI financial parser
-            "fallback_providers": "google,microsoft"
-        }
+    async def _aextract(self, document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        """Async counterpart of _extract (hedged across providers when EDENAI_HEDGE_MODE=on)."""
+        if self.hedge_enabled:
+            return await self._ahedged_extract(document, document_type)
         
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
+            url, extra_fields, parse = self._route(document_type)
+            response = await http_transport.apost(url, content=self._abody(document, extra_fields), headers=self.headers)
             response.raise_for_status()
-            result = response.json()
-            
-            if doc_type == 'itr':
-                return self._parse_itr_response(result)
-            else:
-                return self._parse_balance_sheet_response(result)
-                
-        except requests.exceptions.RequestException as e:
+            return parse(response.json())
+        
+        except httpx.HTTPError as e:
             return {
                 'success': False,
                 'error': f'EdenAI API request failed: {str(e)}'
             }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'OCR extraction failed: {str(e)}'
+            }
     
-    def _extract_general_ocr(self, image_data: str) -> Dict[str, Any]:
-        """Extract text using general OCR for any document type."""
+    def _meets_quality_bar(self, result: Dict[str, Any], document_type: str) -> bool:
+        """Whether a single provider's result is good enough to stop hedging."""
+        if not result.get('success'):
+            return False
+        if result.get('document_type') == 'general':
+            return len(result.get('raw_text', '').strip()) >= self.min_text_length
+        # A PAN/Aadhaar number failing format or checksum checks does not win the race
+        return bool(result.get('extracted_data')) and validate_document_fields(
+            document_type, result['extracted_data']
+        )['valid']
+    
+    async def _aprovider_attempt(self, provider: str, delay: float, start_now: asyncio.Event,
+                                 start_next: Optional[asyncio.Event],
+                                 document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        """
+        One hedged request; waits for its delay unless start_now is set by the attempt
+        before it failing. On failure it sets start_next, releasing only the next provider.
+        """
+        if delay > 0:
+            try:
+                await asyncio.wait_for(start_now.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
         
-        url = f"{self.base_url}/ocr/ocr"
+        url, extra_fields, parse = self._route(document_type)
+        started_at = time.perf_counter()
+        try:
+            response = await http_transport.apost(
+                url,
+                content=self._abody(document, extra_fields, provider),
+                headers=self.headers
+            )
+            response.raise_for_status()
+            result = parse(response.json())
+        except asyncio.CancelledError:
+            self.hedge_stats[provider]['cancelled'] += 1
+            raise
+        except Exception:
+            self.hedge_stats[provider]['errors'] += 1
+            metrics_registry.histogram(f'ocr.edenai.{provider}.error_seconds').observe(time.perf_counter() - started_at)
+            if start_next is not None:
+                start_next.set()
+            raise
         
-        payload = {
-            "providers": "amazon,google,microsoft",
-            "file": f"data:image/jpeg;base64,{image_data}",
-            "language": "en",
-            "fallback_providers": "google,microsoft"
-        }
+        metrics_registry.histogram(f'ocr.edenai.{provider}.seconds').observe(time.perf_counter() - started_at)
+        if not self._meets_quality_bar(result, document_type):
+            self.hedge_stats[provider]['rejected'] += 1
+            if start_next is not None:
+                start_next.set()
+        return {**result, 'provider': provider}
+    
+    async def _ahedged_extract(self, document: DocumentBuffer, document_type: str) -> Dict[str, Any]:
+        """
+        Fire one request per provider (staggered by hedge_delays) and return the first
+        result that passes the quality bar, cancelling the stragglers.
+        """
+        # One event per provider, so a failure releases the next provider rather than all of them
+        events = [asyncio.Event() for _ in self.providers]
+        tasks = [
+            asyncio.create_task(self._aprovider_attempt(
+                provider, delay, events[i], events[i + 1] if i + 1 < len(events) else None,
+                document, document_type
+            ))
+            for i, (provider, delay) in enumerate(zip(self.providers, self.hedge_delays))
+        ]
+        fallback = None
+        last_error = None
         
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
-            response.raise_for_status()
-            result = response.json()
-            
-            # Extract text from the best provider
-            extracted_text = ""
-            if 'amazon' in result and result['amazon'].get('status') == 'success':
-                extracted_text = result['amazon'].get('text', '')
-            elif 'google' in result and result['google'].get('status') == 'success':
-                extracted_text = result['google'].get('text', '')
-            elif 'microsoft' in result and result['microsoft'].get('status') == 'success':
-                extracted_text = result['microsoft'].get('text', '')
-            
-            return {
-                'success': True,
-                'document_type': 'general',
-                'raw_text': extracted_text,
-                'extracted_data': {},
-                'confidence': 'high'
-            }
-            
-        except requests.exceptions.RequestException as e:
-            return {
-                'success': False,
-                'error': f'EdenAI API request failed: {str(e)}'
-            }
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    result = await next_done
+                except Exception as e:
+                    last_error = e
+                    continue
+                
+                if self._meets_quality_bar(result, document_type):
+                    self.hedge_stats[result['provider']]['wins'] += 1
+                    return result
+                if fallback is None and result.get('success'):
+                    fallback = result
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        if fallback is not None:
+            return fallback
+        return {
+            'success': False,
+            'error': f'EdenAI API request failed: {str(last_error) if last_error else "no provider returned a result"}'
+        }
+    
+    def _parse_general_response(self, result: Dict) -> Dict[str, Any]:
+        """Parse general OCR text from the best provider."""
+        
+        extracted_text = ""
+        if 'amazon' in result and result['amazon'].get('status') == 'success':
+            extracted_text = result['amazon'].get('text', '')
+        elif 'google' in result and result['google'].get('status') == 'success':
+            extracted_text = result['google'].get('text', '')
+        elif 'microsoft' in result and result['microsoft'].get('status') == 'success':
+            extracted_text = result['microsoft'].get('text', '')
+        
+        return {
+            'success': True,
+            'document_type': 'general',
+            'raw_text': extracted_text,
+            'extracted_data': {},
+            'confidence': 'high'
+        }
     
     def _parse_pan_response(self, result: Dict) -> Dict[str, Any]:
         """Parse PAN card data from EdenAI response."""
@@ -268,31 +441,28 @@ class EdenAIOCRService:
         Returns:
             Validation result with extracted data
         """
-        extracted_data = self.extract_text_from_image(image_path, document_type)
+        extraction_result = self.extract_text_from_image(image_path, document_type)
+        return self.validate_extraction(extraction_result, document_type)
+    
+    def extract_and_validate(self, image_path: str, document_type: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Run a single extraction and validate from its result.
         
-        if not extracted_data.get('success'):
-            return {
-                'valid': False,
-                'document_type': document_type,
-                'message': extracted_data.get('error', 'Extraction failed'),
-                'extracted_data': {}
-            }
+        Returns:
+            Tuple of (extraction_result, validation_result)
+        """
+        extraction_result = self.extract_text_from_image(image_path, document_type)
+        return extraction_result, self.validate_extraction(extraction_result, document_type)
+    
+    def validate_extraction(self, extraction_result: Dict[str, Any], document_type: str) -> Dict[str, Any]:
+        """
+        Validate an existing extraction result without calling the API again.
         
-        # Check if we have meaningful data
-        has_data = bool(extracted_data.get('extracted_data'))
+        Args:
+            extraction_result: Result returned by extract_text_from_image
+            document_type: Type of document (pan, aadhaar, itr, balance_sheet)
         
-        if has_data:
-            return {
-                'valid': True,
-                'document_type': extracted_data.get('document_type', document_type),
-                'message': 'Document verified successfully',
-                'confidence': extracted_data.get('confidence', 'medium'),
-                'extracted_data': extracted_data.get('extracted_data', {})
-            }
-        else:
-            return {
-                'valid': False,
-                'document_type': document_type,
-                'message': 'Could not extract sufficient data from document',
-                'extracted_data': {}
-            }
+        Returns:
+            Validation result with extracted data (PAN/Aadhaar numbers format- and checksum-checked)
+        """
+        return validate_extraction(extraction_result, document_type)
@@ -2,9 +2,13 @@ import os
 import base64
 import google.generativeai as genai
 from dotenv import load_dotenv
+from services.http_transport import http_transport
+from services.kyc_validators import validate_document_fields
 
 load_dotenv()
 
+GEMINI_API_HOST = 'generativelanguage.googleapis.com'
+
 class GeminiOCRService:
     def __init__(self):
         self.api_key = os.getenv("GEMINI_API_KEY", "")
@@ -19,6 +23,21 @@ class GeminiOCRService:
         Extract text and structured data from image using Gemini Vision API
         Returns: dict with 'success', 'text', 'structured_data', and 'error' keys
         """
+        try:
+            # Read and encode image
+            with open(image_path, 'rb') as image_file:
+                image_data = image_file.read()
+        except Exception as e:
+            return {
+                'success': False,
+                'text': '',
+                'structured_data': {},
+                'error': str(e)
+            }
+        return self.extract_from_bytes(image_data)
+    
+    def extract_from_bytes(self, image_data: bytes, mime_type: str = 'image/jpeg') -> dict:
+        """Same as extract_text_from_image, for image bytes already in memory"""
         if not self.api_key or not self.model:
             return {
                 'success': False,
@@ -28,10 +47,6 @@ class GeminiOCRService:
             }
         
         try:
-            # Read and encode image
-            with open(image_path, 'rb') as image_file:
-                image_data = image_file.read()
-            
             # Create prompt for document extraction
             prompt = """Analyze this document image and extract all text and structured information.
 
@@ -67,14 +82,18 @@ Provide the response in this exact JSON format:
     "confidence": "high/medium/low"
 }"""
 
-            # Upload image and generate content
-            response = self.model.generate_content([
-                prompt,
-                {
-                    'mime_type': 'image/jpeg',
-                    'data': image_data
-                }
-            ])
+            # Upload image and generate content (bounded per host, with a read timeout)
+            with http_transport.limit(GEMINI_API_HOST):
+                response = self.model.generate_content(
+                    [
+                        prompt,
+                        {
+                            'mime_type': mime_type,
+                            'data': image_data
+                        }
+                    ],
+                    request_options={'timeout': http_transport.read_timeout}
+                )
             
             # Parse response
             result_text = response.text
@@ -133,6 +152,17 @@ Provide the response in this exact JSON format:
         has_data = bool(extracted_data.get('extracted_data'))
         
         if has_data:
+            check = validate_document_fields(
+                document_type,
+                extracted_data['extracted_data'],
+                extracted_data.get('raw_text', '')
+            )
+            if not check['valid']:
+                return {
+                    'valid': False,
+                    'document_type': document_type,
+                    'message': check['error']
+                }
             return {
                 'valid': True,
                 'document_type': extracted_data.get('document_type', document_type),
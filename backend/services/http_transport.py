@@ -0,0 +1,161 @@
+"""
+HTTP Transport - Shared keep-alive connection pools for the OCR providers
+"""
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict
+from urllib.parse import urlsplit
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from services.metrics import metrics_registry
+
+class TransportBusyError(requests.exceptions.ConnectionError):
+    """No per-host request slot became free within the acquire timeout"""
+
+class HTTPTransport:
+    """
+    One pooled transport for all outbound provider calls.
+
+    - Sync calls share a requests.Session with a sized HTTPAdapter (keep-alive, no per-call TLS handshake)
+    - Async calls share an httpx.AsyncClient with the same pool size and timeouts
+    - Every call is given explicit connect/read timeouts
+    - At most `per_host_limit` requests run concurrently per host; callers that cannot get
+      a slot within `acquire_timeout` fail fast instead of piling up sockets
+    """
+
+    def __init__(self, pool_maxsize: int = None, connect_timeout: float = None,
+                 read_timeout: float = None, per_host_limit: int = None, acquire_timeout: float = None):
+        self.pool_maxsize = pool_maxsize or int(os.getenv('HTTP_POOL_MAXSIZE', '32'))
+        self.connect_timeout = connect_timeout or float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+        self.read_timeout = read_timeout or float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+        self.per_host_limit = per_host_limit or int(os.getenv('HTTP_PER_HOST_LIMIT', '16'))
+        self.acquire_timeout = acquire_timeout or float(os.getenv('HTTP_ACQUIRE_TIMEOUT', '10'))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._async_client = None
+        self._client_keeper = None
+        self._async_slots: Dict[str, asyncio.Semaphore] = {}
+        self._loop = None
+        self._in_flight: Dict[str, int] = {}
+        self.rejected = 0
+
+    @property
+    def timeout(self) -> tuple:
+        return (self.connect_timeout, self.read_timeout)
+
+    @staticmethod
+    def _host(url_or_host: str) -> str:
+        return urlsplit(url_or_host).netloc or url_or_host
+
+    def _count(self, host: str, delta: int):
+        with self._lock:
+            self._in_flight[host] = self._in_flight.get(host, 0) + delta
+
+    @contextmanager
+    def limit(self, url_or_host: str):
+        """Hold one of the host's concurrency slots (usable around non-requests SDK calls)"""
+        host = self._host(url_or_host)
+        with self._lock:
+            slots = self._host_slots.setdefault(host, threading.BoundedSemaphore(self.per_host_limit))
+        if not slots.acquire(timeout=self.acquire_timeout):
+            self.rejected += 1
+            raise TransportBusyError(f'Too many concurrent requests to {host}')
+        self._count(host, 1)
+        try:
+            yield
+        finally:
+            self._count(host, -1)
+            slots.release()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self.timeout)
+        with self.limit(url):
+            return self.session.request(method, url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def _ensure_async(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # httpx clients and asyncio semaphores are bound to one event loop
+            self._loop = loop
+            self._async_slots = {}
+            self._async_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize)
+            )
+            self._client_keeper = loop.create_task(self._close_on_loop_exit(self._async_client))
+
+    @staticmethod
+    async def _close_on_loop_exit(client: httpx.AsyncClient):
+        """
+        Close the client when this task is cancelled: by aclose(), or by asyncio.run() cancelling
+        the remaining tasks before it closes the loop - after that its sockets could not be closed
+        """
+        try:
+            await asyncio.Future()
+        finally:
+            await client.aclose()
+
+    @asynccontextmanager
+    async def alimit(self, url_or_host: str):
+        """Async counterpart of limit()"""
+        self._ensure_async()
+        host = self._host(url_or_host)
+        slots = self._async_slots.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+        try:
+            await asyncio.wait_for(slots.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise httpx.PoolTimeout(f'Too many concurrent requests to {host}')
+        self._count(host, 1)
+        try:
+            yield
+        finally:
+            self._count(host, -1)
+            slots.release()
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with self.alimit(url):
+            return await self._async_client.request(method, url, **kwargs)
+
+    async def apost(self, url: str, **kwargs) -> httpx.Response:
+        return await self.arequest('POST', url, **kwargs)
+
+    async def aclose(self):
+        """Close the current loop's client (clients of finished loops closed with their loop)"""
+        keeper, self._client_keeper = self._client_keeper, None
+        if keeper is not None and keeper.get_loop() is asyncio.get_running_loop():
+            keeper.cancel()
+            await asyncio.gather(keeper, return_exceptions=True)
+        self._async_client = None
+        self._loop = None
+
+    def close(self):
+        self.session.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            in_flight = dict(self._in_flight)
+        return {
+            'pool_maxsize': self.pool_maxsize,
+            'per_host_limit': self.per_host_limit,
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout,
+            'in_flight': in_flight,
+            'rejected': self.rejected
+        }
+
+# Singleton instance
+http_transport = HTTPTransport()
+metrics_registry.register_collector('http_transport', http_transport.stats)
@@ -0,0 +1,123 @@
+"""
+Image Preprocessor - Shrink KYC images before OCR and reject unusable ones locally
+"""
+import io
+import os
+import threading
+import time
+from typing import Any, Dict
+from services.document_stream import DocumentBuffer
+from services.metrics import metrics_registry
+
+try:
+    from PIL import Image, ImageOps, ImageStat
+except ImportError:  # optional: documents are sent to OCR unchanged
+    Image = None
+
+# Formats Pillow decodes; PDFs and unknown files pass through untouched
+RASTER_FORMATS = ('jpeg', 'png', 'webp', 'tiff', 'bmp', 'gif')
+
+class ImageRejectedError(ValueError):
+    """The image is blank, too small or undecodable, so OCR would only waste a provider call"""
+
+class ImagePreprocessor:
+    """
+    Turns an uploaded photo/scan into a compact OCR input:
+
+    1. detect the real format from magic bytes (not the client-declared MIME type)
+    2. decode at reduced scale where the codec allows it (JPEG draft mode)
+    3. apply the EXIF orientation
+    4. reject images whose short side is below `min_side` or whose contrast is near zero (blank)
+    5. convert to grayscale and downscale so the long side is at most `max_side`
+       (about 300 DPI for an ID card, 200 DPI for A4)
+    6. re-encode as JPEG at `quality`; the original is kept if that is not smaller
+    """
+
+    def __init__(self, enabled: bool = None, max_side: int = None, min_side: int = None,
+                 quality: int = None, grayscale: bool = None, blank_stddev: float = None):
+        self.enabled = enabled if enabled is not None else os.getenv('IMAGE_PREPROCESS', 'on').lower() == 'on'
+        self.max_side = max_side or int(os.getenv('IMAGE_MAX_SIDE', '2000'))
+        self.min_side = min_side or int(os.getenv('IMAGE_MIN_SIDE', '300'))
+        self.quality = quality or int(os.getenv('IMAGE_JPEG_QUALITY', '80'))
+        self.grayscale = grayscale if grayscale is not None else os.getenv('IMAGE_GRAYSCALE', 'true').lower() == 'true'
+        self.blank_stddev = blank_stddev if blank_stddev is not None else float(os.getenv('IMAGE_BLANK_STDDEV', '4'))
+        self._lock = threading.Lock()
+        self.counts = {'processed': 0, 'kept_original': 0, 'passed_through': 0, 'rejected': 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.histogram = metrics_registry.histogram('image_preprocess.seconds')
+
+    @property
+    def available(self) -> bool:
+        return self.enabled and Image is not None
+
+    def _count(self, outcome: str, bytes_in: int = 0, bytes_out: int = 0):
+        with self._lock:
+            self.counts[outcome] += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def process(self, document: DocumentBuffer) -> DocumentBuffer:
+        """
+        Returns the document to send to OCR: a new in-memory JPEG buffer, or the original
+        when preprocessing is off, unavailable, not applicable or would not save bytes.
+        Raises ImageRejectedError for blank, too-small or undecodable images.
+        """
+        if not self.available or document.image_format not in RASTER_FORMATS:
+            self._count('passed_through', document.size, document.size)
+            return document
+
+        started_at = time.perf_counter()
+        try:
+            image = Image.open(io.BytesIO(document.read_bytes()))
+            # JPEG: let the decoder downscale by 1/2, 1/4 or 1/8 while keeping >= max_side
+            image.draft('L' if self.grayscale else 'RGB', (self.max_side, self.max_side))
+            image = ImageOps.exif_transpose(image)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            self._count('rejected')
+            raise ImageRejectedError(f'Could not read image: {e}')
+
+        width, height = image.size
+        if min(width, height) < self.min_side:
+            self._count('rejected')
+            raise ImageRejectedError(
+                f'Image is too small ({width}x{height}); the shorter side must be at least {self.min_side}px'
+            )
+
+        image = image.convert('L') if self.grayscale else image.convert('RGB')
+        sample = image.copy()
+        sample.thumbnail((256, 256))
+        if max(ImageStat.Stat(sample).stddev) < self.blank_stddev:
+            self._count('rejected')
+            raise ImageRejectedError('Image appears to be blank')
+
+        if max(width, height) > self.max_side:
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+
+        out = io.BytesIO()
+        image.save(out, format='JPEG', quality=self.quality, optimize=True)
+        data = out.getvalue()
+        self.histogram.observe(time.perf_counter() - started_at)
+
+        if len(data) >= document.size:
+            self._count('kept_original', document.size, document.size)
+            return document
+
+        self._count('processed', document.size, len(data))
+        return DocumentBuffer.from_bytes(data, document.filename, 'image/jpeg')
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = self.bytes_in - self.bytes_out
+            return {
+                'enabled': self.available,
+                'max_side': self.max_side,
+                **self.counts,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'bytes_saved_ratio': round(saved / self.bytes_in, 3) if self.bytes_in else 0.0
+            }
+
+# Singleton instance
+image_preprocessor = ImagePreprocessor()
+metrics_registry.register_collector('image_preprocess', image_preprocessor.stats)
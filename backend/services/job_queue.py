@@ -0,0 +1,210 @@
+"""
+Job Queue - In-process asyncio job queue with retries, dead-lettering and status subscriptions
+"""
+import asyncio
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+from services.lru_cache import LRUCache
+from services.metrics import metrics_registry
+
+TERMINAL_STATES = ('succeeded', 'dead')
+
+class QueueFullError(RuntimeError):
+    """The queue already holds max_queue waiting jobs"""
+
+class Job:
+    """One unit of work; `payload` stays alive (and open) until the job finishes"""
+
+    def __init__(self, payload: Dict[str, Any], on_finish: Callable[[], None] = None):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.on_finish = on_finish
+        self.status = 'queued'
+        self.attempts = 0
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.updated_at = self.created_at
+        self.enqueued_at = time.perf_counter()
+        self.subscribers = []
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at
+        }
+
+class JobQueue:
+    """
+    Bounded asyncio queue drained by `workers` tasks running `handler(payload)`.
+
+    - A handler exception retries the job with exponential backoff (retry_backoff * 2^n)
+      up to max_retries times; then the job is dead-lettered
+    - Finished jobs stay queryable for `retention_seconds`
+    - subscribe() yields status snapshots as they change (for SSE)
+    - Workers start lazily on the first submit in the running event loop
+    """
+
+    def __init__(self, name: str, handler: Callable[[Dict[str, Any]], Awaitable[Any]], workers: int = None,
+                 max_queue: int = None, max_retries: int = None, retry_backoff: float = None,
+                 retention_seconds: float = None, dead_letter_size: int = 1000):
+        self.name = name
+        self.handler = handler
+        self.workers = workers or int(os.getenv('JOB_WORKERS', '8'))
+        self.max_queue = max_queue or int(os.getenv('JOB_MAX_QUEUE', '1000'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('JOB_MAX_RETRIES', '3'))
+        self.retry_backoff = retry_backoff if retry_backoff is not None else float(os.getenv('JOB_RETRY_BACKOFF', '2'))
+        retention_seconds = retention_seconds or float(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+
+        self.active: Dict[str, Job] = {}
+        self.finished = LRUCache(max_size=10000, ttl_seconds=retention_seconds)
+        self.dead_letter = deque(maxlen=dead_letter_size)
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+        self._retries = set()
+        self.running = 0
+        self.counts = {'submitted': 0, 'succeeded': 0, 'retried': 0, 'dead': 0, 'rejected': 0}
+        self.wait_histogram = metrics_registry.histogram(f'jobs.{name}.wait_seconds')
+        self.run_histogram = metrics_registry.histogram(f'jobs.{name}.run_seconds')
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # asyncio queues and tasks are bound to one event loop
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def submit(self, payload: Dict[str, Any], on_finish: Callable[[], None] = None) -> Job:
+        """Enqueue a job; raises QueueFullError when max_queue jobs are already waiting"""
+        self._ensure_started()
+        if self.depth >= self.max_queue:
+            self.counts['rejected'] += 1
+            raise QueueFullError(f'{self.name} queue is full ({self.max_queue} waiting jobs)')
+
+        job = Job(payload, on_finish)
+        self.active[job.id] = job
+        self.counts['submitted'] += 1
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.active.get(job_id) or self.finished.get(job_id)
+
+    def _update(self, job: Job, status: str, **fields):
+        job.status = status
+        job.updated_at = datetime.now(timezone.utc).isoformat()
+        for name, value in fields.items():
+            setattr(job, name, value)
+
+        if status in TERMINAL_STATES:
+            self.active.pop(job.id, None)
+            self.finished.set(job.id, job)
+            job.payload = None
+            if job.on_finish:
+                job.on_finish()
+
+        snapshot = job.snapshot()
+        for subscriber in job.subscribers:
+            subscriber.put_nowait(snapshot)
+
+    def _dead_letter(self, job: Job, error: str):
+        self.counts['dead'] += 1
+        self.dead_letter.append({'job_id': job.id, 'error': error, 'payload': {
+            k: v for k, v in (job.payload or {}).items() if isinstance(v, (str, int, float, bool))
+        }})
+        self._update(job, 'dead', error=error)
+
+    async def _retry_later(self, job: Job, delay: float):
+        await asyncio.sleep(delay)
+        job.enqueued_at = time.perf_counter()
+        self._queue.put_nowait(job)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self.wait_histogram.observe(time.perf_counter() - job.enqueued_at)
+            self.running += 1
+            self._update(job, 'running', attempts=job.attempts + 1)
+            started_at = time.perf_counter()
+            try:
+                result = await self.handler(job.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if job.attempts <= self.max_retries:
+                    self.counts['retried'] += 1
+                    self._update(job, 'retrying', error=str(e))
+                    retry = self._loop.create_task(self._retry_later(job, self.retry_backoff * 2 ** (job.attempts - 1)))
+                    self._retries.add(retry)
+                    retry.add_done_callback(self._retries.discard)
+                else:
+                    self._dead_letter(job, str(e))
+            else:
+                self.counts['succeeded'] += 1
+                self._update(job, 'succeeded', result=result, error=None)
+            finally:
+                self.running -= 1
+                self.run_histogram.observe(time.perf_counter() - started_at)
+
+    async def subscribe(self, job_id: str, keepalive: float = 15.0) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield the current snapshot, then each change until the job finishes.
+        Yields None every `keepalive` seconds without a change (for SSE comments).
+        """
+        job = self.get(job_id)
+        if job is None:
+            return
+        updates = asyncio.Queue()
+        job.subscribers.append(updates)
+        try:
+            snapshot = job.snapshot()
+            yield snapshot
+            while snapshot['status'] not in TERMINAL_STATES:
+                try:
+                    snapshot = await asyncio.wait_for(updates.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield snapshot
+        finally:
+            job.subscribers.remove(updates)
+
+    async def stop(self):
+        """
+        Cancel the workers and pending retries, then dead-letter every unfinished job
+        (queued, retrying or running) so its payload is released and its status is terminal.
+        """
+        tasks = self._tasks + list(self._retries)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for job in list(self.active.values()):
+            self._dead_letter(job, 'Job queue shut down before the job finished')
+        self._tasks = []
+        self._queue = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'queue_depth': self.depth,
+            'running': self.running,
+            'active_jobs': len(self.active),
+            'dead_letter': len(self.dead_letter),
+            **self.counts
+        }
@@ -0,0 +1,218 @@
+"""
+KYC Validators - Precompiled PAN/Aadhaar checks with OCR-confusion correction
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# PAN: 5 letters (4th = holder type), 4 digits, 1 letter
+PAN_ENTITY_TYPES = 'ABCFGHLJPT'
+PAN_PATTERN = re.compile(r'[A-Z]{3}[ABCFGHLJPT][A-Z][0-9]{4}[A-Z]')
+# Aadhaar: 12 digits, never starting with 0 or 1
+AADHAAR_PATTERN = re.compile(r'[2-9][0-9]{11}')
+
+# Candidates in raw OCR text, before correction (letters and digits may be swapped)
+PAN_CANDIDATE = re.compile(r'(?<![A-Z0-9])[A-Z0-9]{10}(?![A-Z0-9])')
+AADHAAR_CANDIDATE = re.compile(r'(?<![0-9A-Z])[0-9OQDILSBZG]{4}[ -]?[0-9OQDILSBZG]{4}[ -]?[0-9OQDILSBZG]{4}(?![0-9A-Z])')
+SEPARATORS = re.compile(r'[\s-]')
+
+# Common OCR confusions, applied only where the position expects the other class
+TO_DIGIT = str.maketrans('OQDILSBZG', '000115826')
+TO_LETTER = str.maketrans('012586', 'OIZSBG')
+
+# Verhoeff tables: multiplication (d), permutation (p) and inverse
+VERHOEFF_D = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 2, 3, 4, 0, 6, 7, 8, 9, 5),
+    (2, 3, 4, 0, 1, 7, 8, 9, 5, 6),
+    (3, 4, 0, 1, 2, 8, 9, 5, 6, 7),
+    (4, 0, 1, 2, 3, 9, 5, 6, 7, 8),
+    (5, 9, 8, 7, 6, 0, 4, 3, 2, 1),
+    (6, 5, 9, 8, 7, 1, 0, 4, 3, 2),
+    (7, 6, 5, 9, 8, 2, 1, 0, 4, 3),
+    (8, 7, 6, 5, 9, 3, 2, 1, 0, 4),
+    (9, 8, 7, 6, 5, 4, 3, 2, 1, 0),
+)
+VERHOEFF_P = (
+    (0, 1, 2, 3, 4, 5, 6, 7, 8, 9),
+    (1, 5, 7, 6, 2, 8, 3, 0, 9, 4),
+    (5, 8, 0, 3, 7, 9, 6, 1, 4, 2),
+    (8, 9, 1, 6, 0, 4, 3, 5, 2, 7),
+    (9, 4, 5, 3, 1, 2, 8, 7, 0, 6),
+    (4, 2, 8, 6, 5, 7, 3, 9, 0, 1),
+    (2, 7, 9, 3, 8, 0, 6, 4, 1, 5),
+    (7, 0, 4, 6, 9, 1, 3, 2, 5, 8),
+)
+VERHOEFF_INV = (0, 4, 3, 2, 1, 5, 6, 7, 8, 9)
+
+# Per-position lookup keyed by digit character, for positions counted from the right
+_VERHOEFF_POSITIONS = tuple(
+    {str(digit): VERHOEFF_P[i % 8][digit] for digit in range(10)} for i in range(16)
+)
+
+def verhoeff_valid(number: str) -> bool:
+    """Verhoeff checksum over a digit string (last digit is the check digit)"""
+    check = 0
+    for position, char in enumerate(reversed(number)):
+        check = VERHOEFF_D[check][_VERHOEFF_POSITIONS[position][char]]
+    return check == 0
+
+def verhoeff_check_digit(number: str) -> str:
+    """Check digit to append to `number`"""
+    check = 0
+    for position, char in enumerate(reversed(number)):
+        check = VERHOEFF_D[check][_VERHOEFF_POSITIONS[position + 1][char]]
+    return str(VERHOEFF_INV[check])
+
+def normalize_pan(value: str) -> str:
+    """Uppercase, strip separators, and fix letter/digit swaps by position (AAAAA9999A)"""
+    value = SEPARATORS.sub('', value).upper()
+    if len(value) != 10:
+        return value
+    return value[:5].translate(TO_LETTER) + value[5:9].translate(TO_DIGIT) + value[9].translate(TO_LETTER)
+
+def normalize_aadhaar(value: str) -> str:
+    """Strip separators and map letter look-alikes to digits"""
+    return SEPARATORS.sub('', value).upper().translate(TO_DIGIT)
+
+def validate_pan(value: str) -> Dict[str, Any]:
+    """
+    Returns: dict with 'valid', 'value' (normalized), 'corrected' (OCR fixes applied)
+    and 'error' keys
+    """
+    raw = SEPARATORS.sub('', value or '').upper()
+    normalized = normalize_pan(raw)
+    if PAN_PATTERN.fullmatch(normalized):
+        return {'valid': True, 'value': normalized, 'corrected': normalized != raw, 'error': None}
+    if len(normalized) == 10 and normalized[:3].isalpha() and normalized[3] not in PAN_ENTITY_TYPES:
+        error = f'Invalid PAN holder type "{normalized[3]}"'
+    else:
+        error = 'PAN must be 5 letters, 4 digits and a letter'
+    return {'valid': False, 'value': normalized, 'corrected': False, 'error': error}
+
+def validate_aadhaar(value: str) -> Dict[str, Any]:
+    """Same result shape as validate_pan; also checks the Verhoeff check digit"""
+    raw = SEPARATORS.sub('', value or '').upper()
+    normalized = normalize_aadhaar(raw)
+    if not AADHAAR_PATTERN.fullmatch(normalized):
+        return {'valid': False, 'value': normalized, 'corrected': False,
+                'error': 'Aadhaar must be 12 digits not starting with 0 or 1'}
+    if not verhoeff_valid(normalized):
+        return {'valid': False, 'value': normalized, 'corrected': False, 'error': 'Aadhaar checksum mismatch'}
+    return {'valid': True, 'value': normalized, 'corrected': normalized != raw, 'error': None}
+
+def find_pan(text: str) -> Optional[str]:
+    """First PAN in OCR text that is valid after correction"""
+    for candidate in PAN_CANDIDATE.findall(text.upper()):
+        result = validate_pan(candidate)
+        if result['valid']:
+            return result['value']
+    return None
+
+def find_aadhaar(text: str) -> Optional[str]:
+    """First Aadhaar number in OCR text that is valid (format and checksum) after correction"""
+    for candidate in AADHAAR_CANDIDATE.findall(text.upper()):
+        result = validate_aadhaar(candidate)
+        if result['valid']:
+            return result['value']
+    return None
+
+# Document type -> (field holding the number, validator, finder)
+ID_FIELDS = {
+    'pan': ('panNumber', validate_pan, find_pan),
+    'aadhaar': ('aadhaarNumber', validate_aadhaar, find_aadhaar),
+}
+
+# Exact document type labels (lowercased, '_'/'-' read as spaces) -> ID_FIELDS key
+DOCUMENT_ALIASES = {
+    'pan': 'pan', 'pan card': 'pan', 'pancard': 'pan', 'permanent account number': 'pan',
+    'aadhaar': 'aadhaar', 'aadhaar card': 'aadhaar', 'aadhar': 'aadhaar', 'aadhar card': 'aadhaar',
+}
+
+def document_kind(document_type: str) -> str:
+    """Map labels such as 'PAN', 'PAN Card' or 'Aadhaar Card' to the ID_FIELDS key (others lowercased)"""
+    lowered = (document_type or '').lower()
+    label = ' '.join(lowered.replace('_', ' ').replace('-', ' ').split())
+    return DOCUMENT_ALIASES.get(label, lowered)
+
+def validate_document_fields(document_type: str, extracted_data: Dict[str, Any],
+                             raw_text: str = '') -> Dict[str, Any]:
+    """
+    Check the ID number of a PAN/Aadhaar extraction.
+    The canonical field is used when present; otherwise the other field values and the
+    raw text are searched (providers such as Gemini use free-form field names).
+
+    Returns: dict with 'valid', 'field', 'value', 'corrected' and 'error' keys
+    ('valid' is True for document types without an ID check)
+    """
+    kind = document_kind(document_type)
+    if kind not in ID_FIELDS:
+        return {'valid': True, 'field': None, 'value': None, 'corrected': False, 'error': None}
+
+    field, validate, find = ID_FIELDS[kind]
+    value = extracted_data.get(field)
+    if value:
+        return {'field': field, **validate(str(value))}
+
+    # Free-form fields: a value that is the number itself (possibly spaced), else search the text
+    length = 10 if kind == 'pan' else 12
+    candidate = None
+    for other in extracted_data.values():
+        if isinstance(other, str) and len(SEPARATORS.sub('', other)) == length and any(c.isdigit() for c in other):
+            result = validate(other)
+            if result['valid']:
+                return {'field': field, **result}
+            candidate = candidate or result
+
+    found = find(' '.join(str(v) for v in extracted_data.values()) + '\n' + (raw_text or ''))
+    if found:
+        return {'field': field, 'valid': True, 'value': found, 'corrected': False, 'error': None}
+    if candidate:
+        return {'field': field, **candidate}
+    label = 'PAN' if kind == 'pan' else 'Aadhaar number'
+    return {'field': field, 'valid': False, 'value': None, 'corrected': False, 'error': f'{label} not found in document'}
+
+def validate_batch(documents: Iterable[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Validate many (document_type, extracted_data) pairs"""
+    return [validate_document_fields(document_type, extracted_data) for document_type, extracted_data in documents]
+
+def validate_extraction(extraction_result: Dict[str, Any], document_type: str) -> Dict[str, Any]:
+    """
+    Validate an OCR extraction result (EdenAI result shape): the extraction must have
+    succeeded with fields, and PAN/Aadhaar numbers must pass the format/checksum checks.
+    Corrected numbers replace the OCR values in the returned extracted_data.
+    """
+    if not extraction_result.get('success'):
+        return {
+            'valid': False,
+            'document_type': document_type,
+            'message': extraction_result.get('error', 'Extraction failed'),
+            'extracted_data': {}
+        }
+
+    extracted_data = extraction_result.get('extracted_data') or {}
+    if not extracted_data:
+        return {
+            'valid': False,
+            'document_type': document_type,
+            'message': 'Could not extract sufficient data from document',
+            'extracted_data': {}
+        }
+
+    check = validate_document_fields(document_type, extracted_data, extraction_result.get('raw_text', ''))
+    if not check['valid']:
+        return {
+            'valid': False,
+            'document_type': document_type,
+            'message': f"{check['error']}. Please upload a clearer image.",
+            'extracted_data': extracted_data
+        }
+    if check['field']:
+        extracted_data = {**extracted_data, check['field']: check['value']}
+
+    return {
+        'valid': True,
+        'document_type': extraction_result.get('document_type', document_type),
+        'message': 'Document verified successfully',
+        'confidence': extraction_result.get('confidence', 'medium'),
+        'extracted_data': extracted_data
+    }
@@ -0,0 +1,191 @@
+"""
+Local OCR Service - Offline Tesseract OCR in a process pool
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Tuple
+from services.document_stream import DocumentBuffer
+from services.image_preprocessor import ImageRejectedError, image_preprocessor
+from services.kyc_validators import find_aadhaar, find_pan, validate_extraction
+
+try:
+    import pytesseract
+    from PIL import Image
+except ImportError:  # optional: the local engine is simply unavailable
+    pytesseract = None
+    Image = None
+
+DOB_PATTERN = re.compile(r'\b(\d{2}[/-]\d{2}[/-]\d{4})\b')
+NAME_PATTERN = re.compile(r'^\s*Name\s*[:\-]?\s*(.+)$', re.IGNORECASE | re.MULTILINE)
+FATHER_PATTERN = re.compile(r"^\s*Father'?s?\s*Name\s*[:\-]?\s*(.+)$", re.IGNORECASE | re.MULTILINE)
+
+DOCUMENT_TYPE_NAMES = {
+    'pan': 'PAN Card',
+    'aadhaar': 'Aadhaar Card',
+}
+
+def parse_document_text(text: str, document_type: str) -> Dict[str, str]:
+    """Pull PAN/Aadhaar fields out of plain OCR text (empty dict for other document types)"""
+    doc_type = document_type.lower()
+    extracted_data = {}
+
+    name = NAME_PATTERN.search(text)
+    dob = DOB_PATTERN.search(text)
+    if doc_type == 'pan':
+        father = FATHER_PATTERN.search(text)
+        extracted_data = {
+            'name': name.group(1).strip() if name else '',
+            'panNumber': find_pan(text) or '',
+            'dob': dob.group(1) if dob else '',
+            'fatherName': father.group(1).strip() if father else '',
+        }
+    elif doc_type == 'aadhaar':
+        extracted_data = {
+            'name': name.group(1).strip() if name else '',
+            'aadhaarNumber': find_aadhaar(text) or '',
+            'dob': dob.group(1) if dob else '',
+        }
+    return {k: v for k, v in extracted_data.items() if v}
+
+def _ocr_in_worker(image_bytes: bytes, language: str, config: str) -> Dict[str, Any]:
+    """Run Tesseract on one image (executes inside a pool worker process)"""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        data = pytesseract.image_to_data(
+            image, lang=language, config=config, output_type=pytesseract.Output.DICT
+        )
+
+    lines: Dict[Tuple[int, int, int], list] = {}
+    confidences = []
+    for i, word in enumerate(data['text']):
+        word = word.strip()
+        confidence = float(data['conf'][i])
+        if not word or confidence < 0:
+            continue
+        confidences.append(confidence)
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+
+    return {
+        'text': '\n'.join(' '.join(words) for words in lines.values()),
+        'confidence': sum(confidences) / len(confidences) if confidences else 0.0,
+        'words': len(confidences)
+    }
+
+class LocalOCRService:
+    """
+    Tesseract-based OCR with the same contract as EdenAIOCRService
+    (extract_text_from_image / validate_kyc_document / extract_and_validate).
+
+    OCR runs in a process pool sized to the CPU count (LOCAL_OCR_WORKERS overrides),
+    so the event loop and agent threads never block on image decoding.
+    """
+
+    def __init__(self, workers: int = None, language: str = None):
+        self.workers = workers or int(os.getenv('LOCAL_OCR_WORKERS', '0')) or os.cpu_count() or 1
+        self.language = language or os.getenv('LOCAL_OCR_LANGUAGE', 'eng')
+        self.config = os.getenv('LOCAL_OCR_CONFIG', '--oem 1 --psm 6')
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._available = None
+
+    @property
+    def available(self) -> bool:
+        """pytesseract/Pillow are installed and the tesseract binary is on PATH"""
+        if self._available is None:
+            self._available = (
+                pytesseract is not None
+                and shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+            )
+        return self._available
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn avoids forking a process that already runs executor/audit threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._pool
+
+    def submit(self, image_bytes: bytes) -> Future:
+        return self._get_pool().submit(_ocr_in_worker, image_bytes, self.language, self.config)
+
+    def extract_text_from_image(self, image_path: str, document_type: str = 'general') -> Dict[str, Any]:
+        """
+        Extract text and document fields from an image file.
+
+        Returns:
+            Dictionary with extracted text, fields and confidence
+            (confidence_score is Tesseract's mean word confidence, 0-100)
+        """
+        try:
+            document = DocumentBuffer.from_path(image_path)
+        except FileNotFoundError:
+            return {'success': False, 'error': f'File not found: {image_path}'}
+        with document:
+            try:
+                prepared = image_preprocessor.process(document)
+            except ImageRejectedError as e:
+                return {'success': False, 'error': str(e)}
+            result = self.extract_document(prepared, document_type)
+            if prepared is not document:
+                prepared.close()
+            return result
+
+    def extract_document(self, document: DocumentBuffer, document_type: str = 'general') -> Dict[str, Any]:
+        if not self.available:
+            return {'success': False, 'error': 'Local OCR engine (tesseract) not installed'}
+        try:
+            ocr = self.submit(document.read_bytes()).result()
+        except Exception as e:
+            return {'success': False, 'error': f'Local OCR failed: {str(e)}'}
+        return self._parse(ocr, document_type)
+
+    async def aextract_document(self, document: DocumentBuffer, document_type: str = 'general') -> Dict[str, Any]:
+        if not self.available:
+            return {'success': False, 'error': 'Local OCR engine (tesseract) not installed'}
+        try:
+            ocr = await asyncio.wrap_future(self.submit(document.read_bytes()))
+        except Exception as e:
+            return {'success': False, 'error': f'Local OCR failed: {str(e)}'}
+        return self._parse(ocr, document_type)
+
+    def _parse(self, ocr: Dict[str, Any], document_type: str) -> Dict[str, Any]:
+        score = ocr['confidence']
+        return {
+            'success': True,
+            'document_type': DOCUMENT_TYPE_NAMES.get(document_type.lower(), 'general'),
+            'extracted_data': parse_document_text(ocr['text'], document_type),
+            'raw_text': ocr['text'],
+            'confidence': 'high' if score >= 85 else 'medium' if score >= 60 else 'low',
+            'confidence_score': round(score, 1),
+            'provider': 'tesseract'
+        }
+
+    def validate_kyc_document(self, image_path: str, document_type: str) -> Dict[str, Any]:
+        extraction_result = self.extract_text_from_image(image_path, document_type)
+        return self.validate_extraction(extraction_result, document_type)
+
+    def extract_and_validate(self, image_path: str, document_type: str) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        extraction_result = self.extract_text_from_image(image_path, document_type)
+        return extraction_result, self.validate_extraction(extraction_result, document_type)
+
+    def validate_extraction(self, extraction_result: Dict[str, Any], document_type: str) -> Dict[str, Any]:
+        """Same result shape as EdenAIOCRService.validate_extraction"""
+        return validate_extraction(extraction_result, document_type)
+
+    def shutdown(self, wait: bool = True):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+
+# Singleton instance
+local_ocr_service = LocalOCRService()
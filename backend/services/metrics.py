@@ -0,0 +1,198 @@
+"""
+Lightweight in-process metrics: latency histograms, counters and pluggable stats collectors
+"""
+import bisect
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# Latency buckets in seconds, from 5ms up to 30s
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (seconds by convention)"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound containing the q-th quantile (None if empty or in +Inf)"""
+        with self._lock:
+            if not self.count:
+                return None
+            target = q * self.count
+            running = 0
+            for bound, bucket_count in zip(self.buckets, self._counts):
+                running += bucket_count
+                if running >= target:
+                    return bound
+            return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative = []
+            running = 0
+            for bucket_count in self._counts:
+                running += bucket_count
+                cumulative.append(running)
+            count, total = self.count, self.total
+
+        return {
+            'count': count,
+            'sum': round(total, 6),
+            'avg': round(total / count, 6) if count else 0.0,
+            'buckets': {
+                **{str(bound): cumulative[i] for i, bound in enumerate(self.buckets)},
+                '+Inf': cumulative[-1]
+            }
+        }
+
+class Counter:
+    """Monotonic, thread-safe event counter"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+def labelled(name: str, **labels: str) -> str:
+    """Metric name with Prometheus labels, e.g. http.request.seconds{method="GET",route="/health"}"""
+    return name + '{' + ','.join(f'{key}="{value}"' for key, value in sorted(labels.items())) + '}'
+
+_INVALID_NAME_CHARS = re.compile(r'[^a-zA-Z0-9_]')
+
+def _prometheus_name(name: str) -> str:
+    name = _INVALID_NAME_CHARS.sub('_', name)
+    return name if not name[:1].isdigit() else f'_{name}'
+
+def _split_labels(name: str):
+    """'a.b{x="1"}' -> ('a_b', 'x="1"')"""
+    base, _, labels = name.partition('{')
+    return _prometheus_name(base), labels.rstrip('}')
+
+def _label_set(*parts: str) -> str:
+    parts = [part for part in parts if part]
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+def _flatten(prefix: str, value: Any, out: Dict[str, float]):
+    """Numeric leaves of a collector dict, keyed by their underscore-joined path"""
+    if isinstance(value, bool):
+        out[prefix] = int(value)
+    elif isinstance(value, (int, float)):
+        out[prefix] = value
+    elif isinstance(value, dict):
+        for key, child in value.items():
+            _flatten(f'{prefix}_{key}', child, out)
+
+class MetricsRegistry:
+    """
+    Process-wide registry of named histograms, counters and stats collectors.
+    Collectors are callables returning a dict, evaluated when a snapshot is taken.
+    """
+
+    def __init__(self):
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, Counter] = {}
+        self._collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create the histogram registered under name"""
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(buckets)
+            return self._histograms[name]
+
+    def counter(self, name: str) -> Counter:
+        """Get or create the counter registered under name"""
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter()
+            return self._counters[name]
+
+    def register_collector(self, name: str, collector: Callable[[], Dict[str, Any]]):
+        """Register (or replace) a stats callable included in every snapshot"""
+        with self._lock:
+            self._collectors[name] = collector
+
+    def _collect(self, collectors: Dict[str, Callable[[], Dict[str, Any]]]) -> Dict[str, Any]:
+        result = {}
+        for name, collector in collectors.items():
+            try:
+                result[name] = collector()
+            except Exception as e:
+                result[name] = {'error': str(e)}
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            histograms = dict(self._histograms)
+            counters = dict(self._counters)
+            collectors = dict(self._collectors)
+
+        return {
+            'histograms': {name: h.snapshot() for name, h in histograms.items()},
+            'counters': {name: c.value for name, c in counters.items()},
+            **self._collect(collectors)
+        }
+
+    def prometheus(self) -> str:
+        """
+        Prometheus text exposition: histograms, counters (suffixed _total) and the numeric
+        values of every collector as gauges (e.g. audit_writer_queue_depth)
+        """
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            collectors = dict(self._collectors)
+
+        lines = []
+        declared = set()
+
+        def declare(name: str, kind: str):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for full_name, histogram in histograms:
+            name, labels = _split_labels(full_name)
+            snapshot = histogram.snapshot()
+            declare(name, 'histogram')
+            for bound, count in snapshot['buckets'].items():
+                le = 'le="%s"' % bound
+                lines.append(f'{name}_bucket{_label_set(labels, le)} {count}')
+            lines.append(f'{name}_sum{_label_set(labels)} {snapshot["sum"]}')
+            lines.append(f'{name}_count{_label_set(labels)} {snapshot["count"]}')
+
+        for full_name, counter in counters:
+            name, labels = _split_labels(full_name)
+            name = f'{name}_total'
+            declare(name, 'counter')
+            lines.append(f'{name}{_label_set(labels)} {counter.value}')
+
+        gauges: Dict[str, float] = {}
+        for collector_name, stats in self._collect(collectors).items():
+            _flatten(collector_name, stats, gauges)
+        for full_name, value in sorted(gauges.items()):
+            name = _prometheus_name(full_name)
+            declare(name, 'gauge')
+            lines.append(f'{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+# Singleton instance
+metrics_registry = MetricsRegistry()
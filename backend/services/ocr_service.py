@@ -1,6 +1,7 @@
 import os
-import requests
 from dotenv import load_dotenv
+from services.http_transport import http_transport
+from services.kyc_validators import validate_document_fields
 
 load_dotenv()
 
@@ -14,6 +15,18 @@ class OCRService:
         Extract text from image using OCR.space API
         Returns: dict with 'success', 'text', and 'error' keys
         """
+        try:
+            with open(image_path, 'rb') as image_file:
+                return self.extract_from_file(image_file)
+        except Exception as e:
+            return {
+                'success': False,
+                'text': '',
+                'error': str(e)
+            }
+    
+    def extract_from_file(self, image_file, filename: str = None) -> dict:
+        """Same as extract_text_from_image, for an open binary file or bytes"""
         if not self.api_key:
             return {
                 'success': False,
@@ -22,37 +35,36 @@ class OCRService:
             }
         
         try:
-            with open(image_path, 'rb') as image_file:
-                payload = {
-                    'apikey': self.api_key,
-                    'language': 'eng',
-                    'isOverlayRequired': False,
-                }
-                
-                files = {
-                    'file': image_file
-                }
-                
-                response = requests.post(self.api_url, data=payload, files=files)
-                result = response.json()
-                
-                if result.get('IsErroredOnProcessing'):
-                    return {
-                        'success': False,
-                        'text': '',
-                        'error': result.get('ErrorMessage', ['Unknown error'])[0]
-                    }
-                
-                # Extract text from parsed results
-                text = ''
-                if result.get('ParsedResults'):
-                    text = result['ParsedResults'][0].get('ParsedText', '')
-                
+            payload = {
+                'apikey': self.api_key,
+                'language': 'eng',
+                'isOverlayRequired': False,
+            }
+            
+            files = {
+                'file': (filename, image_file) if filename else image_file
+            }
+            
+            response = http_transport.post(self.api_url, data=payload, files=files)
+            result = response.json()
+            
+            if result.get('IsErroredOnProcessing'):
                 return {
-                    'success': True,
-                    'text': text,
-                    'error': None
+                    'success': False,
+                    'text': '',
+                    'error': result.get('ErrorMessage', ['Unknown error'])[0]
                 }
+            
+            # Extract text from parsed results
+            text = ''
+            if result.get('ParsedResults'):
+                text = result['ParsedResults'][0].get('ParsedText', '')
+            
+            return {
+                'success': True,
+                'text': text,
+                'error': None
+            }
         
         except Exception as e:
             return {
@@ -63,29 +75,28 @@ class OCRService:
     
     def validate_kyc_document(self, extracted_text: str, document_type: str = 'PAN') -> dict:
         """
-        Mock validation of KYC documents
-        In production, this would use actual validation logic
+        Validate KYC document text: the PAN/Aadhaar number must be present and pass
+        format (and, for Aadhaar, Verhoeff checksum) checks after OCR-confusion correction
         """
-        text_upper = extracted_text.upper()
+        check = validate_document_fields(document_type, {}, extracted_text)
         
-        if document_type == 'PAN':
-            # Mock PAN validation - check for PAN-like pattern
-            if 'PAN' in text_upper or len(extracted_text) > 20:
-                return {
-                    'valid': True,
-                    'document_type': 'PAN',
-                    'message': 'PAN card verified successfully'
-                }
-        elif document_type == 'AADHAAR':
-            # Mock Aadhaar validation
-            if 'AADHAAR' in text_upper or 'GOVERNMENT' in text_upper:
-                return {
-                    'valid': True,
-                    'document_type': 'AADHAAR',
-                    'message': 'Aadhaar card verified successfully'
-                }
+        if check['field'] and check['valid']:
+            label = 'PAN card' if check['field'] == 'panNumber' else 'Aadhaar card'
+            return {
+                'valid': True,
+                'document_type': document_type,
+                'document_number': check['value'],
+                'message': f'{label} verified successfully'
+            }
+        
+        if check['field']:
+            return {
+                'valid': False,
+                'document_type': document_type,
+                'message': f"{check['error']}. Please ensure the image is clear and readable."
+            }
         
-        # If text is extracted but doesn't match patterns
+        # Other documents: accept readable text for manual verification
         if len(extracted_text) > 10:
             return {
                 'valid': True,
@@ -0,0 +1,71 @@
+"""
+Pagination - Keyset (cursor) pagination and column projection for Supabase list queries
+"""
+import base64
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Every page is ordered by these columns (newest first); they are always selected
+KEYSET_COLUMNS = ('created_at', 'id')
+
+class InvalidCursorError(ValueError):
+    """The cursor was not produced by encode_cursor (or was tampered with)"""
+
+class InvalidFieldsError(ValueError):
+    """A requested column is not in the endpoint's allowed projection"""
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just after `row` in (created_at DESC, id DESC) order"""
+    payload = json.dumps([row['created_at'], row['id']], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(payload)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError(f'Invalid cursor: {e}')
+    if not isinstance(created_at, str) or not isinstance(row_id, str):
+        raise InvalidCursorError('Invalid cursor')
+    return created_at, row_id
+
+def clamp_limit(limit: Optional[int]) -> int:
+    return max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+
+def select_columns(fields: Optional[str], allowed: Sequence[str], default: Sequence[str]) -> List[str]:
+    """
+    Columns to select: the comma-separated `fields` (each must be in `allowed`) or
+    `default`, plus the keyset columns the cursor is built from
+    """
+    if fields:
+        requested = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in requested if field not in allowed]
+        if unknown:
+            raise InvalidFieldsError(f"Unknown fields: {', '.join(unknown)}")
+    else:
+        requested = list(default)
+    return list(dict.fromkeys([*KEYSET_COLUMNS, *requested]))
+
+def keyset_query(query, cursor: Optional[str], limit: int):
+    """
+    Apply the page filter and order to a PostgREST query builder. Fetches limit + 1 rows
+    so paginate() can tell whether another page exists; served by a
+    (<filter column>, created_at DESC, id DESC) index without an OFFSET scan.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt."{row_id}")'
+        )
+    return query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1)
+
+def paginate(rows: Iterable[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim the extra look-ahead row and build the next cursor"""
+    rows = list(rows or [])
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(page[-1])
@@ -0,0 +1,171 @@
+"""
+PDF Artifact Store - Content-addressed storage for generated sanction letters
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+from services.lru_cache import LRUCache
+
+# Only plain file names inside the store directory may be served
+SAFE_FILENAME = re.compile(r'^[A-Za-z0-9_.-]+\.pdf$')
+CONTENT_ADDRESSED = re.compile(r'^([0-9a-f]{64})\.pdf$')
+STREAM_CHUNK_BYTES = 64 * 1024
+
+class PDFArtifactStore:
+    """
+    Stores PDFs under `<sha256>.pdf`, so identical letters are written once.
+
+    - Old files are evicted by age (max_age_seconds) and total size (max_bytes),
+      oldest first; eviction runs at most every `eviction_interval` seconds.
+    - Recently stored letters are kept in an in-memory hot cache so download spikes
+      after approvals do not hit disk (hot_cache_entries=0 disables it); other
+      downloads are streamed from disk in chunks rather than read whole.
+    - Legacy files (e.g. sanction_letter_<user>_<ts>.pdf) in the directory are still served.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024,
+                 max_age_seconds: float = 30 * 24 * 3600, hot_cache_entries: int = 256,
+                 eviction_interval: float = 60.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.eviction_interval = eviction_interval
+        self.hot_cache = LRUCache(max_size=hot_cache_entries) if hot_cache_entries > 0 else None
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+
+        self.stored = 0
+        self.deduplicated = 0
+        self.evicted = 0
+        self.disk_reads = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def put(self, pdf_bytes: bytes) -> str:
+        """Store a PDF and return its content-addressed file name"""
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        filename = f'{digest}.pdf'
+        path = self._path(filename)
+
+        if os.path.exists(path):
+            # Refresh the age of re-issued letters so eviction keeps them
+            os.utime(path)
+            self.deduplicated += 1
+        else:
+            temp_path = f'{path}.{threading.get_ident()}.tmp'
+            with open(temp_path, 'wb') as pdf_file:
+                pdf_file.write(pdf_bytes)
+            os.replace(temp_path, path)
+            self.stored += 1
+
+        if self.hot_cache is not None:
+            self.hot_cache.set(filename, pdf_bytes)
+
+        self.maybe_evict()
+        return filename
+
+    def stat(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Size, ETag and modification time for a stored PDF, or None if unknown"""
+        if not SAFE_FILENAME.match(filename):
+            return None
+        try:
+            st = os.stat(self._path(filename))
+        except FileNotFoundError:
+            return None
+
+        match = CONTENT_ADDRESSED.match(filename)
+        # Content-addressed files carry their hash; legacy files get a size/mtime validator
+        etag = f'"{match.group(1)}"' if match else f'W/"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        return {
+            'filename': filename,
+            'size': st.st_size,
+            'etag': etag,
+            'mtime': st.st_mtime,
+        }
+
+    def iter_range(self, filename: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+        """
+        Yield bytes [start, end] (inclusive) of a stored PDF in chunks, from the hot cache
+        when it holds the letter, otherwise read from disk `chunk_size` bytes at a time.
+        """
+        data = self.hot_cache.get(filename) if self.hot_cache is not None else None
+        if data is not None:
+            stop = len(data) if end is None else end + 1
+            for offset in range(start, stop, chunk_size):
+                yield data[offset:min(offset + chunk_size, stop)]
+            return
+
+        self.disk_reads += 1
+        with open(self._path(filename), 'rb') as pdf_file:
+            pdf_file.seek(start)
+            remaining = None if end is None else end + 1 - start
+            while remaining is None or remaining > 0:
+                chunk = pdf_file.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def maybe_evict(self):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_eviction < self.eviction_interval:
+                return
+            self._last_eviction = now
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove PDFs older than max_age, then the oldest until under max_bytes"""
+        cutoff = time.time() - self.max_age_seconds
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.pdf'):
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.name))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for mtime, size, name in files:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                continue
+            if self.hot_cache is not None:
+                self.hot_cache.delete(name)
+            total -= size
+            removed += 1
+
+        self.evicted += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'stored': self.stored,
+            'deduplicated': self.deduplicated,
+            'evicted': self.evicted,
+            'disk_reads': self.disk_reads,
+            'hot_cache': self.hot_cache.stats() if self.hot_cache is not None else None
+        }
+
+# Singleton instance
+pdf_store = PDFArtifactStore(
+    directory=os.getenv(
+        'PDF_STORE_DIR',
+        os.path.join(os.path.dirname(__file__), '..', 'generated_pdfs')
+    ),
+    max_bytes=int(os.getenv('PDF_STORE_MAX_MB', '512')) * 1024 * 1024,
+    max_age_seconds=float(os.getenv('PDF_STORE_MAX_AGE_DAYS', '30')) * 24 * 3600,
+    hot_cache_entries=int(os.getenv('PDF_HOT_CACHE_ENTRIES', '256'))
+)
@@ -0,0 +1,524 @@
+"""
+Repositories - Persistence backends (Supabase, embedded SQLite, in-memory) for users, loan
+applications, audit logs and KYC documents
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from services.pagination import decode_cursor, keyset_query, paginate
+
+TABLE_COLUMNS = {
+    'users': ('id', 'name', 'email', 'created_at'),
+    'loan_applications': (
+        'id', 'user_id', 'income', 'employment_type', 'credit_score', 'loan_amount',
+        'interest_rate', 'status', 'created_at', 'updated_at'
+    ),
+    'audit_logs': ('id', 'user_id', 'action', 'agent_name', 'details', 'timestamp'),
+    'kyc_documents': (
+        'id', 'user_id', 'document_type', 'file_name', 'extracted_data',
+        'validation_status', 'confidence', 'created_at'
+    ),
+}
+
+# CHECK constraints of database/schema.sql
+ALLOWED_VALUES = {
+    'loan_applications': {'status': ('PENDING', 'APPROVED', 'REJECTED', 'REVIEW')},
+    'kyc_documents': {'validation_status': ('verified', 'failed')},
+}
+
+class Repository:
+    """
+    Interface for persistence backends. Rows are plain dicts with the columns of
+    database/schema.sql; every method raises on database errors.
+    """
+
+    backend = None
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def upsert_user(self, data: dict) -> dict:
+        raise NotImplementedError
+
+    def insert_loan_application(self, data: dict) -> List[dict]:
+        raise NotImplementedError
+
+    def update_loan_application(self, application_id: str, data: dict) -> List[dict]:
+        """Returns the updated rows (empty when the id does not exist)"""
+        raise NotImplementedError
+
+    def upsert_loan_applications(self, rows: List[dict]) -> List[dict]:
+        raise NotImplementedError
+
+    def list_loan_applications(self, user_id: str, columns: Sequence[str],
+                               cursor: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+        """One keyset page, newest first: (rows, next_cursor)"""
+        raise NotImplementedError
+
+    def insert_audit_logs(self, rows: List[dict]) -> List[dict]:
+        raise NotImplementedError
+
+    def list_audit_logs(self, user_id: str, limit: int = 100) -> List[dict]:
+        """A user's audit events, newest first"""
+        raise NotImplementedError
+
+    def insert_kyc_document(self, data: dict) -> List[dict]:
+        raise NotImplementedError
+
+    def list_kyc_documents(self, user_id: str, columns: Sequence[str],
+                           cursor: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+        raise NotImplementedError
+
+    def commit_unit(self, updates: List[dict], audits: List[dict]):
+        """
+        Apply application updates ({'id', **columns}, one per id) and audit inserts atomically.
+        Raises (writing nothing) when an update matches no application.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def _columns(self, table: str, columns: Sequence[str]) -> List[str]:
+        """Only schema columns are accepted (the SQLite backend interpolates them into SQL)"""
+        unknown = [column for column in columns if column not in TABLE_COLUMNS[table]]
+        if unknown:
+            raise ValueError(f"Unknown {table} columns: {', '.join(unknown)}")
+        return list(columns)
+
+class SupabaseRepository(Repository):
+    """PostgREST tables of a Supabase project; commit_unit needs database/migrations/003"""
+
+    backend = 'supabase'
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        response = self.client.table('users').select('*').eq('id', user_id).limit(1).execute()
+        return response.data[0] if response.data else None
+
+    def upsert_user(self, data: dict) -> dict:
+        response = self.client.table('users').upsert(data, on_conflict='id').execute()
+        return response.data[0] if response.data else data
+
+    def insert_loan_application(self, data: dict) -> List[dict]:
+        return self.client.table('loan_applications').insert(data).execute().data
+
+    def update_loan_application(self, application_id: str, data: dict) -> List[dict]:
+        return self.client.table('loan_applications').update(data).eq('id', application_id).execute().data
+
+    def upsert_loan_applications(self, rows: List[dict]) -> List[dict]:
+        return self.client.table('loan_applications').upsert(rows, on_conflict='id').execute().data
+
+    def _page(self, table: str, user_id: str, columns: Sequence[str], cursor: Optional[str], limit: int):
+        query = self.client.table(table).select(','.join(columns)).eq('user_id', user_id)
+        response = keyset_query(query, cursor, limit).execute()
+        return paginate(response.data, limit)
+
+    def list_loan_applications(self, user_id, columns, cursor, limit):
+        return self._page('loan_applications', user_id, columns, cursor, limit)
+
+    def insert_audit_logs(self, rows: List[dict]) -> List[dict]:
+        return self.client.table('audit_logs').insert(rows).execute().data
+
+    def list_audit_logs(self, user_id: str, limit: int = 100) -> List[dict]:
+        response = (
+            self.client.table('audit_logs').select('*').eq('user_id', user_id)
+            .order('timestamp', desc=True).limit(limit).execute()
+        )
+        return response.data
+
+    def insert_kyc_document(self, data: dict) -> List[dict]:
+        return self.client.table('kyc_documents').insert(data).execute().data
+
+    def list_kyc_documents(self, user_id, columns, cursor, limit):
+        return self._page('kyc_documents', user_id, columns, cursor, limit)
+
+    def commit_unit(self, updates: List[dict], audits: List[dict]):
+        self.client.rpc('commit_unit_of_work', {'updates': updates, 'audits': audits}).execute()
+
+def _timestamp(value: Any = None) -> str:
+    """UTC ISO-8601 with microseconds, so stored timestamps sort as text"""
+    if value is None:
+        moment = datetime.now(timezone.utc)
+    else:
+        moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    email TEXT NOT NULL UNIQUE,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS loan_applications (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    income REAL NOT NULL,
+    employment_type TEXT NOT NULL,
+    credit_score INTEGER,
+    loan_amount REAL,
+    interest_rate REAL,
+    status TEXT NOT NULL DEFAULT 'PENDING' CHECK (status IN ('PENDING', 'APPROVED', 'REJECTED', 'REVIEW')),
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS audit_logs (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    action TEXT NOT NULL,
+    agent_name TEXT NOT NULL,
+    details TEXT NOT NULL DEFAULT '{}',
+    timestamp TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS kyc_documents (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    document_type TEXT NOT NULL,
+    file_name TEXT,
+    extracted_data TEXT NOT NULL DEFAULT '{}',
+    validation_status TEXT NOT NULL DEFAULT 'failed' CHECK (validation_status IN ('verified', 'failed')),
+    confidence TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_loan_applications_user_created ON loan_applications(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_logs_user_timestamp ON audit_logs(user_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_kyc_documents_user_created ON kyc_documents(user_id, created_at DESC, id DESC);
+'''
+
+class SQLiteRepository(Repository):
+    """
+    Embedded backend with the schema.sql tables (no foreign keys, so local runs work
+    without auth users). One connection per thread in WAL mode, so readers never block
+    the writer; every statement is parameterised and reused from the connection's
+    prepared statement cache.
+    """
+
+    backend = 'sqlite'
+
+    # JSON columns are stored as text
+    JSON_COLUMNS = {'details', 'extracted_data'}
+
+    def __init__(self, path: str, statement_cache_size: int = 256):
+        self.path = path
+        self.statement_cache_size = statement_cache_size
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SQLITE_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, cached_statements=self.statement_cache_size,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _encode(self, column: str, value: Any) -> Any:
+        if column in self.JSON_COLUMNS:
+            return json.dumps(value if value is not None else {})
+        if column in ('created_at', 'updated_at', 'timestamp'):
+            return _timestamp(value)
+        return value
+
+    def _decode(self, row: sqlite3.Row) -> dict:
+        data = dict(row)
+        for column in self.JSON_COLUMNS & data.keys():
+            data[column] = json.loads(data[column])
+        return data
+
+    def _prepare(self, table: str, data: dict, defaults: Dict[str, Any]) -> dict:
+        row = {**defaults, **{key: value for key, value in data.items() if value is not None or key not in defaults}}
+        self._columns(table, row)
+        return {column: self._encode(column, value) for column, value in row.items()}
+
+    def _insert(self, table: str, rows: List[dict], defaults: Dict[str, Any], upsert: bool = False) -> List[dict]:
+        prepared = [self._prepare(table, row, {'id': str(uuid.uuid4()), **defaults}) for row in rows]
+        if not prepared:
+            return []
+        conn = self._connection()
+        inserted = []
+        with conn:
+            # Rows with the same column set share one prepared statement (executemany)
+            groups: Dict[Tuple[str, ...], List[dict]] = {}
+            for row in prepared:
+                groups.setdefault(tuple(row), []).append(row)
+            for columns, group in groups.items():
+                sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+                if upsert:
+                    updates = [column for column in columns if column not in ('id', 'created_at')]
+                    sql += ' ON CONFLICT(id) DO UPDATE SET ' + ', '.join(f'{c} = excluded.{c}' for c in updates)
+                conn.executemany(sql, [tuple(row[column] for column in columns) for row in group])
+            ids = [row['id'] for row in prepared]
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                inserted.extend(conn.execute(
+                    f"SELECT * FROM {table} WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ))
+        by_id = {row['id']: self._decode(row) for row in inserted}
+        return [by_id[row_id] for row_id in ids if row_id in by_id]
+
+    def _page(self, table: str, user_id: str, columns: Sequence[str], cursor: Optional[str], limit: int):
+        columns = self._columns(table, columns)
+        sql = f"SELECT {', '.join(columns)} FROM {table} WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            sql += ' AND (created_at < ? OR (created_at = ? AND id < ?))'
+            created_at = _timestamp(created_at)
+            params += [created_at, created_at, row_id]
+        sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+        rows = [self._decode(row) for row in self._connection().execute(sql, params)]
+        return paginate(rows, limit)
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        row = self._connection().execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def upsert_user(self, data: dict) -> dict:
+        return self._insert('users', [data], {'created_at': None}, upsert=True)[0]
+
+    def insert_loan_application(self, data: dict) -> List[dict]:
+        now = _timestamp()
+        return self._insert('loan_applications', [data], {'created_at': now, 'updated_at': now})
+
+    def update_loan_application(self, application_id: str, data: dict) -> List[dict]:
+        columns = self._columns('loan_applications', [column for column in data if column not in ('id', 'updated_at')])
+        values = [self._encode(column, data[column]) for column in columns]
+        assignments = ''.join(f'{column} = ?, ' for column in columns)
+        conn = self._connection()
+        with conn:
+            rows = conn.execute(
+                f'UPDATE loan_applications SET {assignments}updated_at = ? WHERE id = ? RETURNING *',
+                [*values, _timestamp(), application_id]
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def upsert_loan_applications(self, rows: List[dict]) -> List[dict]:
+        now = _timestamp()
+        rows = [{**row, 'updated_at': now} for row in rows]
+        return self._insert('loan_applications', rows, {'created_at': now}, upsert=True)
+
+    def list_loan_applications(self, user_id, columns, cursor, limit):
+        return self._page('loan_applications', user_id, columns, cursor, limit)
+
+    def insert_audit_logs(self, rows: List[dict]) -> List[dict]:
+        return self._insert('audit_logs', rows, {'details': {}, 'timestamp': None})
+
+    def list_audit_logs(self, user_id: str, limit: int = 100) -> List[dict]:
+        rows = self._connection().execute(
+            'SELECT * FROM audit_logs WHERE user_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?',
+            (user_id, limit)
+        )
+        return [self._decode(row) for row in rows]
+
+    def insert_kyc_document(self, data: dict) -> List[dict]:
+        return self._insert('kyc_documents', [data], {'extracted_data': {}, 'created_at': None})
+
+    def list_kyc_documents(self, user_id, columns, cursor, limit):
+        return self._page('kyc_documents', user_id, columns, cursor, limit)
+
+    def commit_unit(self, updates: List[dict], audits: List[dict]):
+        conn = self._connection()
+        now = _timestamp()
+        audit_rows = [self._prepare('audit_logs', row, {'id': str(uuid.uuid4()), 'details': {}, 'timestamp': None})
+                      for row in audits]
+        with conn:
+            for update in updates:
+                columns = self._columns('loan_applications', [c for c in update if c not in ('id', 'updated_at')])
+                assignments = ''.join(f'{column} = ?, ' for column in columns)
+                cursor = conn.execute(
+                    f'UPDATE loan_applications SET {assignments}updated_at = ? WHERE id = ?',
+                    [*(update[column] for column in columns), now, update['id']]
+                )
+                if cursor.rowcount == 0:
+                    raise ValueError(f"loan_applications.id {update['id']} does not exist")
+            conn.executemany(
+                'INSERT INTO audit_logs (id, user_id, action, agent_name, details, timestamp) VALUES (?, ?, ?, ?, ?, ?)',
+                [(row['id'], row['user_id'], row['action'], row['agent_name'], row['details'], row['timestamp'])
+                 for row in audit_rows]
+            )
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+class MemoryRepository(Repository):
+    """
+    Process-local tables (lost on restart) for tests and local runs without a database.
+    Enforces the schema.sql constraints the other backends do (NOT NULL, CHECK, unique
+    email); writes are staged and validated before any is applied, under one lock, so a
+    failing commit_unit changes nothing.
+    """
+
+    backend = 'memory'
+
+    NOT_NULL = {
+        'users': ('name', 'email', 'created_at'),
+        'loan_applications': ('user_id', 'income', 'employment_type', 'status', 'created_at', 'updated_at'),
+        'audit_logs': ('user_id', 'action', 'agent_name', 'details', 'timestamp'),
+        'kyc_documents': ('user_id', 'document_type', 'extracted_data', 'validation_status', 'created_at'),
+    }
+    TIMESTAMP_COLUMNS = ('created_at', 'updated_at', 'timestamp')
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, dict]] = {table: {} for table in TABLE_COLUMNS}
+        self._lock = threading.RLock()
+
+    def _validate(self, table: str, row: dict) -> dict:
+        missing = [column for column in self.NOT_NULL[table] if row.get(column) is None]
+        if missing:
+            raise ValueError(f'{table}.{missing[0]} must not be null')
+        for column, allowed in ALLOWED_VALUES.get(table, {}).items():
+            if row[column] not in allowed:
+                raise ValueError(f'{table}.{column} must be one of {", ".join(allowed)}')
+        if table == 'users' and any(
+            other['email'] == row['email'] and other['id'] != row['id'] for other in self.tables['users'].values()
+        ):
+            raise ValueError(f"users.email {row['email']} already exists")
+        return row
+
+    def _merge(self, table: str, existing: Optional[dict], data: dict, defaults: Dict[str, Any]) -> dict:
+        """A new row (columns from data, else defaults, else null) or existing updated with data"""
+        if existing is None:
+            data = {**{column: None for column in TABLE_COLUMNS[table]}, 'id': str(uuid.uuid4()), **defaults,
+                    **{key: value for key, value in data.items() if value is not None or key not in defaults}}
+        self._columns(table, data)
+        row = {**(existing or {}), **copy.deepcopy(data)}
+        for column in self.TIMESTAMP_COLUMNS:
+            if column in data:
+                row[column] = _timestamp(row[column])
+        return self._validate(table, row)
+
+    def _write(self, table: str, rows: List[dict], defaults: Dict[str, Any], upsert: bool = False) -> List[dict]:
+        with self._lock:
+            staged = {}
+            for data in rows:
+                existing = staged.get(data.get('id')) or self.tables[table].get(data.get('id'))
+                if existing is not None and not upsert:
+                    raise ValueError(f"{table}.id {data['id']} already exists")
+                if existing is not None:
+                    data = {key: value for key, value in data.items() if key != 'created_at'}
+                row = self._merge(table, existing, data, defaults)
+                staged[row['id']] = row
+            self.tables[table].update(staged)
+            return copy.deepcopy(list(staged.values()))
+
+    def _updated(self, application_id: str, data: dict, now: str) -> Optional[dict]:
+        existing = self.tables['loan_applications'].get(application_id)
+        if existing is None:
+            return None
+        changes = {key: value for key, value in data.items() if key not in ('id', 'updated_at')}
+        return self._merge('loan_applications', existing, {**changes, 'updated_at': now}, {})
+
+    def _page(self, table: str, user_id: str, columns: Sequence[str], cursor: Optional[str], limit: int):
+        columns = self._columns(table, columns)
+        after = None
+        if cursor:
+            created_at, row_id = decode_cursor(cursor)
+            after = (_timestamp(created_at), row_id)
+        with self._lock:
+            rows = [row for row in self.tables[table].values() if row['user_id'] == user_id
+                    and (after is None or (row['created_at'], row['id']) < after)]
+        rows.sort(key=lambda row: (row['created_at'], row['id']), reverse=True)
+        return paginate([{column: copy.deepcopy(row[column]) for column in columns} for row in rows[:limit + 1]], limit)
+
+    def get_user(self, user_id: str) -> Optional[dict]:
+        with self._lock:
+            return copy.deepcopy(self.tables['users'].get(user_id))
+
+    def upsert_user(self, data: dict) -> dict:
+        return self._write('users', [data], {'created_at': None}, upsert=True)[0]
+
+    def insert_loan_application(self, data: dict) -> List[dict]:
+        now = _timestamp()
+        return self._write('loan_applications', [data], {'status': 'PENDING', 'created_at': now, 'updated_at': now})
+
+    def update_loan_application(self, application_id: str, data: dict) -> List[dict]:
+        with self._lock:
+            row = self._updated(application_id, data, _timestamp())
+            if row is None:
+                return []
+            self.tables['loan_applications'][application_id] = row
+            return [copy.deepcopy(row)]
+
+    def upsert_loan_applications(self, rows: List[dict]) -> List[dict]:
+        now = _timestamp()
+        rows = [{**row, 'updated_at': now} for row in rows]
+        return self._write('loan_applications', rows, {'status': 'PENDING', 'created_at': now}, upsert=True)
+
+    def list_loan_applications(self, user_id, columns, cursor, limit):
+        return self._page('loan_applications', user_id, columns, cursor, limit)
+
+    def insert_audit_logs(self, rows: List[dict]) -> List[dict]:
+        return self._write('audit_logs', rows, {'details': {}, 'timestamp': None})
+
+    def list_audit_logs(self, user_id: str, limit: int = 100) -> List[dict]:
+        with self._lock:
+            rows = [row for row in self.tables['audit_logs'].values() if row['user_id'] == user_id]
+        rows.sort(key=lambda row: (row['timestamp'], row['id']), reverse=True)
+        return copy.deepcopy(rows[:limit])
+
+    def insert_kyc_document(self, data: dict) -> List[dict]:
+        return self._write('kyc_documents', [data], {'extracted_data': {}, 'validation_status': 'failed', 'created_at': None})
+
+    def list_kyc_documents(self, user_id, columns, cursor, limit):
+        return self._page('kyc_documents', user_id, columns, cursor, limit)
+
+    def commit_unit(self, updates: List[dict], audits: List[dict]):
+        with self._lock:
+            now = _timestamp()
+            rows = [self._updated(update['id'], update, now) for update in updates]
+            missing = [update['id'] for update, row in zip(updates, rows) if row is None]
+            if missing:
+                raise ValueError(f"loan_applications.id {missing[0]} does not exist")
+            events = [self._merge('audit_logs', None, event, {'details': {}, 'timestamp': None}) for event in audits]
+            for row in rows:
+                self.tables['loan_applications'][row['id']] = row
+            self.tables['audit_logs'].update((event['id'], event) for event in events)
+
+def create_repository(client=None) -> Optional[Repository]:
+    """
+    Build the backend selected by PERSISTENCE_BACKEND: 'supabase' (the default; needs
+    SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY, else None), 'sqlite' (PERSISTENCE_SQLITE_PATH)
+    or 'memory' (nothing persists across restarts)
+    """
+    backend = os.getenv('PERSISTENCE_BACKEND', 'supabase').lower()
+    if backend == 'memory':
+        return MemoryRepository()
+    if backend == 'sqlite':
+        path = os.getenv(
+            'PERSISTENCE_SQLITE_PATH',
+            os.path.join(os.path.dirname(__file__), '..', 'loanflow.db')
+        )
+        return SQLiteRepository(path)
+
+    if client is None:
+        url = os.getenv('SUPABASE_URL')
+        key = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
+        if not url or not key:
+            return None
+        from supabase import create_client
+        client = create_client(url, key)
+    return SupabaseRepository(client)
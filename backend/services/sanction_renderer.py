@@ -0,0 +1,230 @@
+"""
+Sanction Letter Renderer - Precompiled letter template with sync and process-pool rendering
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict
+from xml.sax.saxutils import escape
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.enums import TA_CENTER
+from services.tracing import span
+
+APPROVAL_TEXT = """
+We are pleased to inform you that your personal loan application has been <b>APPROVED</b>.
+After careful evaluation of your application and credit profile, we are happy to offer you
+the following loan terms:
+"""
+
+TERMS_TEXT = """
+1. This sanction is valid for 30 days from the date of this letter.<br/>
+2. The loan is subject to completion of documentation and verification.<br/>
+3. The interest rate is subject to change based on RBI guidelines.<br/>
+4. Prepayment charges: 2% of outstanding principal amount.<br/>
+5. Late payment charges: 2% per month on overdue amount.<br/>
+"""
+
+CLOSING_TEXT = """
+We look forward to serving you. For any queries, please contact our customer service
+at support@ailoanassistant.com or call us at 1800-XXX-XXXX.
+"""
+
+class SanctionLetterTemplate:
+    """
+    Letter skeleton compiled once: styles, table style and every static paragraph.
+    Only the per-applicant fields are turned into flowables on each render.
+    Instances are not thread-safe; use one per thread or process.
+    """
+
+    def __init__(self):
+        self.styles = getSampleStyleSheet()
+        normal = self.styles['Normal']
+
+        self.title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=self.styles['Heading1'],
+            fontSize=24,
+            textColor=colors.HexColor('#4338ca'),
+            spaceAfter=30,
+            alignment=TA_CENTER
+        )
+
+        self.heading_style = ParagraphStyle(
+            'CustomHeading',
+            parent=self.styles['Heading2'],
+            fontSize=14,
+            textColor=colors.HexColor('#4338ca'),
+            spaceAfter=12,
+        )
+
+        self.table_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#4338ca')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+        ])
+
+        # Static flowables, parsed once
+        self.header = [
+            Paragraph("AI Loan Sales Assistant", self.title_style),
+            Paragraph("Powered by Tata Capital BFSI", normal),
+            Spacer(1, 0.3*inch),
+        ]
+        self.title = [
+            Spacer(1, 0.3*inch),
+            Paragraph("LOAN SANCTION LETTER", self.heading_style),
+            Spacer(1, 0.2*inch),
+        ]
+        self.approval = [
+            Spacer(1, 0.2*inch),
+            Paragraph(APPROVAL_TEXT, normal),
+            Spacer(1, 0.2*inch),
+        ]
+        self.footer = [
+            Spacer(1, 0.3*inch),
+            Paragraph("Terms and Conditions:", self.heading_style),
+            Paragraph(TERMS_TEXT, normal),
+            Spacer(1, 0.3*inch),
+            Paragraph(CLOSING_TEXT, normal),
+            Spacer(1, 0.3*inch),
+            Paragraph("Sincerely,", normal),
+            Spacer(1, 0.1*inch),
+            Paragraph("<b>AI Loan Sales Assistant</b>", normal),
+            Paragraph("Automated Loan Processing System", normal),
+        ]
+
+    def build_story(self, fields: Dict[str, Any]) -> list:
+        normal = self.styles['Normal']
+        tenure = fields['tenure']
+
+        loan_details = [
+            ['Loan Details', ''],
+            ['Sanctioned Amount', f"₹{fields['loan_amount']:,.2f}"],
+            ['Interest Rate', f"{fields['interest_rate']}% per annum"],
+            ['Loan Tenure', f'{tenure} months ({tenure//12} years)'],
+            ['Credit Score', str(fields['credit_score'])],
+            ['Processing Fee', '₹1,000 + GST'],
+            ['Disbursement', 'Within 48 hours of documentation'],
+        ]
+        table = Table(loan_details, colWidths=[3*inch, 3*inch])
+        table.setStyle(self.table_style)
+
+        return [
+            *self.header,
+            Paragraph(f"Date: {fields['date']}", normal),
+            Paragraph(f"Reference: {fields['reference']}", normal),
+            *self.title,
+            Paragraph(f"Dear {escape(fields['applicant_name'])},", normal),
+            *self.approval,
+            table,
+            *self.footer,
+        ]
+
+    def render(self, fields: Dict[str, Any]) -> bytes:
+        """Render the letter and return the PDF bytes"""
+        buffer = io.BytesIO()
+        # invariant output (no embedded timestamp/random ID) lets identical letters de-duplicate
+        doc = SimpleDocTemplate(buffer, pagesize=A4, invariant=1)
+        doc.build(self.build_story(fields))
+        return buffer.getvalue()
+
+def letter_fields(applicant_name: str, loan_amount: float, interest_rate: float,
+                  tenure: int, credit_score: int, issued_at: datetime = None) -> Dict[str, Any]:
+    """Per-applicant values that fill the template"""
+    issued_at = issued_at or datetime.now()
+    return {
+        'applicant_name': applicant_name,
+        'loan_amount': loan_amount,
+        'interest_rate': interest_rate,
+        'tenure': tenure,
+        'credit_score': credit_score,
+        'date': issued_at.strftime('%B %d, %Y'),
+        'reference': f"LOAN/{issued_at.strftime('%Y%m%d')}/AUTO",
+    }
+
+# Template owned by a pool worker process
+_worker_template = None
+
+def _init_worker():
+    global _worker_template
+    _worker_template = SanctionLetterTemplate()
+
+def _render_in_worker(fields: Dict[str, Any]) -> bytes:
+    return _worker_template.render(fields)
+
+class SanctionLetterRenderer:
+    """
+    Rendering engine for sanction letters.
+
+    - render(): synchronous, in the calling thread (template cached per thread)
+    - submit(): queued onto a process pool; returns a concurrent Future of PDF bytes
+    - render_async(): awaitable wrapper around submit() for async handlers
+    - render_to_file(): writes a letter using the configured mode (sync or pool)
+    """
+
+    def __init__(self, mode: str = None, workers: int = None):
+        self.mode = (mode or os.getenv('SANCTION_RENDER_MODE', 'pool')).lower()
+        self.workers = workers or int(os.getenv('SANCTION_RENDER_WORKERS', '0')) or os.cpu_count() or 1
+        self._local = threading.local()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _template(self) -> SanctionLetterTemplate:
+        template = getattr(self._local, 'template', None)
+        if template is None:
+            template = self._local.template = SanctionLetterTemplate()
+        return template
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn avoids forking a process that already runs executor/audit threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._pool
+
+    def render(self, fields: Dict[str, Any]) -> bytes:
+        return self._template().render(fields)
+
+    def submit(self, fields: Dict[str, Any]) -> Future:
+        return self._get_pool().submit(_render_in_worker, fields)
+
+    async def render_async(self, fields: Dict[str, Any]) -> bytes:
+        return await asyncio.wrap_future(self.submit(fields))
+
+    def render_bytes(self, fields: Dict[str, Any]) -> bytes:
+        """Render using the configured mode, blocking until the PDF is ready"""
+        with span('pdf.render'):
+            if self.mode == 'pool':
+                return self.submit(fields).result()
+            return self.render(fields)
+
+    def render_to_file(self, path: str, fields: Dict[str, Any]):
+        pdf_bytes = self.render_bytes(fields)
+        with open(path, 'wb') as pdf_file:
+            pdf_file.write(pdf_bytes)
+
+    def shutdown(self, wait: bool = True):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait)
+                self._pool = None
+
+# Singleton instance
+sanction_renderer = SanctionLetterRenderer()
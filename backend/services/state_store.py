@@ -0,0 +1,374 @@
+"""
+Conversation state stores - bounded, expiring backends for MasterAgent state
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from typing import Any, Dict, Optional
+from services.lru_cache import LRUCache
+
+class StateStore:
+    """
+    Interface for conversation state backends.
+    Values are JSON-serialisable dicts keyed by user id.
+    """
+
+    def get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: dict):
+        raise NotImplementedError
+
+    def merge(self, key: str, changes: dict, default: dict) -> dict:
+        """
+        Atomically apply `changes` to the value at key (starting from a copy of `default`
+        when there is none) and return the result. Dict values are merged into the
+        existing dict (one level deep); other values replace the old ones.
+        """
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def size(self) -> int:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+def apply_changes(value: dict, changes: dict) -> dict:
+    """StateStore.merge semantics, applied in place"""
+    for name, change in changes.items():
+        if isinstance(change, dict) and isinstance(value.get(name), dict):
+            value[name].update(change)
+        else:
+            value[name] = copy.deepcopy(change)
+    return value
+
+class InMemoryStateStore(StateStore):
+    """Process-local LRU store; idle sessions expire after ttl_seconds"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600):
+        self._cache = LRUCache(max_size=max_entries, ttl_seconds=ttl_seconds)
+        self._merge_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: dict):
+        self._cache.set(key, value)
+
+    def merge(self, key: str, changes: dict, default: dict) -> dict:
+        with self._merge_lock:
+            value = self._cache.get(key)
+            if value is None:
+                value = copy.deepcopy(default)
+            apply_changes(value, changes)
+            self._cache.set(key, value)
+            return value
+
+    def delete(self, key: str):
+        self._cache.delete(key)
+
+    def size(self) -> int:
+        return len(self._cache)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': 'memory', **self._cache.stats()}
+
+class SQLiteStateStore(StateStore):
+    """
+    File-backed store. Several workers on one host can share the same database file;
+    hit/miss/eviction counters are per process.
+
+    Reads do not write: recency updates (accessed_at, used to pick eviction victims) are
+    buffered and flushed in one batch every TOUCH_BATCH reads or TOUCH_INTERVAL seconds,
+    and before evicting. The row count checked against max_entries is tracked in process
+    and re-read from the database whenever expired rows are purged, so rows written by
+    other workers are picked up within PURGE_INTERVAL writes.
+    """
+
+    # Purge expired rows (and re-read the row count) once every this many writes
+    PURGE_INTERVAL = 100
+    TOUCH_BATCH = 64
+    TOUCH_INTERVAL = 1.0
+
+    def __init__(self, path: str, max_entries: int = 10000, ttl_seconds: float = 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._touched: Dict[str, float] = {}
+        self._touches_flushed_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS conversation_state ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_conversation_state_accessed_at '
+            'ON conversation_state(accessed_at)'
+        )
+        conn.commit()
+        self._rows = self.size()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def get(self, key: str) -> Optional[dict]:
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            'SELECT value, expires_at FROM conversation_state WHERE key = ?', (key,)
+        ).fetchone()
+
+        if row is None:
+            self._count(misses=1)
+            return None
+
+        value, expires_at = row
+        if expires_at <= now:
+            with conn:
+                cursor = conn.execute('DELETE FROM conversation_state WHERE key = ? AND expires_at <= ?', (key, now))
+            self._count(misses=1, expirations=1, _rows=-cursor.rowcount)
+            return None
+
+        self._count(hits=1)
+        self._touch(key, now)
+        return json.loads(value)
+
+    def _touch(self, key: str, now: float):
+        with self._lock:
+            self._touched[key] = now
+            due = (len(self._touched) >= self.TOUCH_BATCH
+                   or time.monotonic() - self._touches_flushed_at >= self.TOUCH_INTERVAL)
+        if due:
+            self._flush_touches(self._connection())
+
+    def _flush_touches(self, conn: sqlite3.Connection):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._touches_flushed_at = time.monotonic()
+        if touched:
+            with conn:
+                conn.executemany(
+                    'UPDATE conversation_state SET accessed_at = max(accessed_at, ?) WHERE key = ?',
+                    [(accessed_at, key) for key, accessed_at in touched.items()]
+                )
+
+    def _write(self, conn: sqlite3.Connection, key: str, value: dict, now: float):
+        """Insert or replace inside the caller's transaction, keeping the row count"""
+        row = (json.dumps(value), now + self.ttl_seconds, now, key)
+        cursor = conn.execute(
+            'UPDATE conversation_state SET value = ?, expires_at = ?, accessed_at = ? WHERE key = ?', row
+        )
+        if cursor.rowcount == 0:
+            # Another worker may have inserted the key since; then this is an update after all
+            conn.execute(
+                'INSERT INTO conversation_state (value, expires_at, accessed_at, key) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT(key) DO UPDATE SET value = excluded.value, '
+                'expires_at = excluded.expires_at, accessed_at = excluded.accessed_at',
+                row
+            )
+            self._count(_rows=1)
+
+    def set(self, key: str, value: dict):
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            self._write(conn, key, value, now)
+        self._after_write(conn, now)
+
+    def merge(self, key: str, changes: dict, default: dict) -> dict:
+        conn = self._connection()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock before reading, so concurrent merges
+        # (threads or other workers) apply one after the other
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM conversation_state WHERE key = ? AND expires_at > ?', (key, now)
+            ).fetchone()
+            value = json.loads(row[0]) if row else copy.deepcopy(default)
+            apply_changes(value, changes)
+            self._write(conn, key, value, now)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        self._after_write(conn, now)
+        return value
+
+    def _after_write(self, conn: sqlite3.Connection, now: float):
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_INTERVAL == 0
+        if purge:
+            self._purge_expired(conn, now)
+        self._evict_overflow(conn)
+
+    def _purge_expired(self, conn: sqlite3.Connection, now: float):
+        with conn:
+            cursor = conn.execute('DELETE FROM conversation_state WHERE expires_at <= ?', (now,))
+        self._count(expirations=cursor.rowcount)
+        rows = self.size()
+        with self._lock:
+            self._rows = rows
+
+    def _evict_overflow(self, conn: sqlite3.Connection):
+        overflow = self._rows - self.max_entries
+        if overflow <= 0:
+            return
+        # Evict by up-to-date recency
+        self._flush_touches(conn)
+        with conn:
+            cursor = conn.execute(
+                'DELETE FROM conversation_state WHERE key IN ('
+                'SELECT key FROM conversation_state ORDER BY accessed_at ASC LIMIT ?)',
+                (overflow,)
+            )
+        self._count(evictions=cursor.rowcount, _rows=-cursor.rowcount)
+
+    def delete(self, key: str):
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute('DELETE FROM conversation_state WHERE key = ?', (key,))
+        self._count(_rows=-cursor.rowcount)
+
+    def size(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM conversation_state').fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            counters = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+        return {
+            'backend': 'sqlite',
+            'path': self.path,
+            'size': self.size(),
+            'max_size': self.max_entries,
+            'ttl_seconds': self.ttl_seconds,
+            **counters
+        }
+
+class _StateStoreManager(BaseManager):
+    pass
+
+class SharedStateStore(StateStore):
+    """
+    Client for an InMemoryStateStore hosted by a separate manager process
+    (started with `python -m services.state_store`), shared by all uvicorn workers.
+    Counters are kept by the server and therefore aggregate across workers.
+    """
+
+    def __init__(self, address: tuple, authkey: bytes):
+        self.address = address
+        manager = _StateStoreManager(address=address, authkey=authkey)
+        manager.connect()
+        self._store = manager.get_store()
+
+    def get(self, key: str) -> Optional[dict]:
+        return self._store.get(key)
+
+    def set(self, key: str, value: dict):
+        self._store.set(key, value)
+
+    def merge(self, key: str, changes: dict, default: dict) -> dict:
+        # Runs in the server, under the hosted store's lock
+        return self._store.merge(key, changes, default)
+
+    def delete(self, key: str):
+        self._store.delete(key)
+
+    def size(self) -> int:
+        return self._store.size()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._store.stats(), 'backend': 'shared', 'address': f'{self.address[0]}:{self.address[1]}'}
+
+_StateStoreManager.register('get_store')
+
+def _shared_store_settings() -> tuple:
+    """
+    (address, authkey) for the shared store. The manager protocol unpickles requests, so
+    whoever holds the key can run code in the server: there is no default key.
+    """
+    host, _, port = os.getenv('STATE_STORE_ADDRESS', '127.0.0.1:50055').partition(':')
+    authkey = os.getenv('STATE_STORE_AUTHKEY')
+    if not authkey:
+        raise ValueError("STATE_STORE_AUTHKEY must be set to a secret to use the shared state store")
+    return (host, int(port or 50055)), authkey.encode('utf-8')
+
+def serve_shared_state_store():
+    """Run the shared state store server in the foreground"""
+    address, authkey = _shared_store_settings()
+    store = InMemoryStateStore(
+        max_entries=int(os.getenv('STATE_STORE_MAX_ENTRIES', '10000')),
+        ttl_seconds=float(os.getenv('STATE_STORE_TTL', '3600'))
+    )
+    _StateStoreManager.register('get_store', callable=lambda: store)
+    manager = _StateStoreManager(address=address, authkey=authkey)
+    print(f"Shared state store listening on {address[0]}:{address[1]}")
+    manager.get_server().serve_forever()
+
+def create_state_store() -> StateStore:
+    """Build the state store selected by STATE_STORE_BACKEND (memory, sqlite or shared)"""
+    backend = os.getenv('STATE_STORE_BACKEND', 'memory').lower()
+    max_entries = int(os.getenv('STATE_STORE_MAX_ENTRIES', '10000'))
+    ttl_seconds = float(os.getenv('STATE_STORE_TTL', '3600'))
+
+    if backend == 'sqlite':
+        path = os.getenv(
+            'STATE_STORE_PATH',
+            os.path.join(os.path.dirname(__file__), '..', 'conversation_state.db')
+        )
+        return SQLiteStateStore(path, max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    if backend == 'shared':
+        # No per-process fallback: workers would silently keep separate sessions
+        address, authkey = _shared_store_settings()
+        try:
+            return SharedStateStore(address, authkey)
+        except (ConnectionError, OSError) as e:
+            raise RuntimeError(
+                f"Shared state store unreachable at {address[0]}:{address[1]} "
+                f"(start it with `python -m services.state_store`): {e}"
+            ) from e
+
+    return InMemoryStateStore(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
+    serve_shared_state_store()
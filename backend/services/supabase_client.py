@@ -1,73 +1,302 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import List, Optional
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from services.agent_executor import agent_executor
+from services.audit_writer import AuditLogWriter
+from services.lru_cache import LRUCache
+from services.metrics import metrics_registry
+from services.repository import Repository, SupabaseRepository, create_repository
+from services.tracing import span
+from services.unit_of_work import UnitOfWork, _current_unit, current_unit
 
 load_dotenv()
 
+# Columns the dashboard's application list needs (the default projection)
+APPLICATION_LIST_COLUMNS = (
+    'id', 'status', 'loan_amount', 'interest_rate', 'credit_score',
+    'income', 'employment_type', 'created_at', 'updated_at'
+)
+
+# kyc_documents columns without the (large) extracted_data JSON, for summary listings
+KYC_DOCUMENT_SUMMARY_COLUMNS = (
+    'id', 'document_type', 'file_name', 'validation_status', 'confidence', 'created_at'
+)
+KYC_DOCUMENT_COLUMNS = KYC_DOCUMENT_SUMMARY_COLUMNS + ('extracted_data',)
+
+# loan_applications columns the commit_unit_of_work function can update (database/migrations/003)
+UNIT_OF_WORK_RPC_COLUMNS = frozenset({'credit_score', 'loan_amount', 'interest_rate', 'status'})
+
 class SupabaseClient:
     def __init__(self):
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        # Supabase, or the SQLite or in-memory backend (PERSISTENCE_BACKEND=sqlite|memory)
+        self.repository: Optional[Repository] = create_repository()
+        if self.repository is None:
+            print("Warning: Supabase credentials not found in environment variables; persistence is disabled "
+                  "(set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY, or PERSISTENCE_BACKEND=sqlite)")
         
-        if not url or not key:
-            print("Warning: Supabase credentials not found in environment variables")
-            self.client = None
-        else:
-            self.client: Client = create_client(url, key)
+        # Audit events are queued and bulk-inserted in the background
+        self.audit_writer = AuditLogWriter(
+            insert_batch=self._insert_audit_batch,
+            batch_size=int(os.getenv('AUDIT_BATCH_SIZE', '100')),
+            flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', '1.0')),
+            max_retries=int(os.getenv('AUDIT_MAX_RETRIES', '3')),
+            spill_path=os.getenv(
+                'AUDIT_SPILL_PATH',
+                os.path.join(os.path.dirname(__file__), '..', 'audit_spill.jsonl')
+            )
+        )
+        
+        # Application list pages keyed by (user_id, columns, cursor, limit);
+        # a user's pages are dropped whenever one of their applications is written
+        self.applications_cache = LRUCache(
+            max_size=int(os.getenv('APPLICATIONS_CACHE_SIZE', '1024')),
+            ttl_seconds=float(os.getenv('APPLICATIONS_CACHE_TTL', '30'))
+        )
+        
+        # Commit a chat turn's updates and audit events with one RPC call (needs migration 003)
+        self.commit_rpc = os.getenv('UNIT_OF_WORK_RPC', 'off').lower() in ('on', 'true', '1')
+        self._commits = set()
+        # Thread-safe: commits run on executor threads
+        self.unit_stats = {
+            name: metrics_registry.counter(f'unit_of_work.{name}')
+            for name in ('units', 'commits', 'single_call_commits', 'deferred_writes', 'memoized_reads')
+        }
+    
+    @property
+    def configured(self) -> bool:
+        return self.repository is not None
+    
+    @property
+    def client(self):
+        """The supabase Client (None with the SQLite backend or without credentials)"""
+        return getattr(self.repository, 'client', None)
+    
+    @client.setter
+    def client(self, client):
+        self.repository = SupabaseRepository(client) if client is not None else None
+    
+    @asynccontextmanager
+    async def unit_of_work(self):
+        """
+        Collect this request's writes (audits, application updates) and memoize its reads,
+        committing them when the block exits, even if it raised or was cancelled.
+        Nested blocks join the outer unit.
+        """
+        if current_unit() is not None:
+            yield current_unit()
+            return
+        
+        unit = UnitOfWork()
+        token = _current_unit.set(unit)
+        self.unit_stats['units'].inc()
+        try:
+            yield unit
+        finally:
+            try:
+                if unit.pending:
+                    # Shielded so a client disconnect does not drop the turn's writes
+                    commit = asyncio.ensure_future(agent_executor.run('database', self.commit, unit))
+                    self._commits.add(commit)
+                    commit.add_done_callback(self._commits.discard)
+                    await asyncio.shield(commit)
+            finally:
+                self.unit_stats['memoized_reads'].inc(unit.read_hits)
+                _current_unit.reset(token)
+    
+    def commit(self, unit: UnitOfWork):
+        """
+        Write what a unit collected in one call (one transaction with SQLite; the
+        commit_unit_of_work RPC on Supabase when UNIT_OF_WORK_RPC is on), otherwise one
+        update per application plus the audit events queued together (the audit writer
+        inserts them as one batch). A failed single-call commit falls back to the latter.
+        Raises if an application update could not be written.
+        """
+        updates, audits = unit.drain()
+        if not updates and not audits:
+            return
+        self.unit_stats['commits'].inc()
+        self.unit_stats['deferred_writes'].inc(unit.deferred)
+        
+        single_call = self.commit_rpc or self.repository.backend != 'supabase'
+        if single_call and all(set(update['data']) <= UNIT_OF_WORK_RPC_COLUMNS for update in updates.values()):
+            try:
+                with span('supabase.commit_unit_of_work'):
+                    self.repository.commit_unit(
+                        [{'id': application_id, **update['data']} for application_id, update in updates.items()],
+                        audits
+                    )
+                self.unit_stats['single_call_commits'].inc()
+                owners = {update['user_id'] for update in updates.values()}
+                self.applications_cache.delete_matching(lambda key: key[0] in owners)
+                return
+            except Exception as e:
+                print(f"Error committing unit of work in one call, writing separately: {e}")
+        
+        failed = [
+            application_id for application_id, update in updates.items()
+            if self._update_loan_application(application_id, update['data'], update['user_id']) is None
+        ]
+        for event in audits:
+            self.audit_writer.enqueue(event)
+        if failed:
+            raise RuntimeError(f"Unit of work could not update applications {', '.join(failed)}")
     
     def get_user(self, user_id: str):
-        """Get user profile"""
-        if not self.client:
+        """Get user profile (fetched once per unit of work)"""
+        if not self.repository:
             return None
         
         try:
-            response = self.client.table('users').select('*').eq('id', user_id).single().execute()
-            return response.data
+            unit = current_unit()
+            if unit is not None:
+                return unit.read(('user', user_id), lambda: self._fetch_user(user_id))
+            return self._fetch_user(user_id)
         except Exception as e:
             print(f"Error fetching user: {e}")
             return None
     
+    def _fetch_user(self, user_id: str):
+        with span('supabase.get_user'):
+            return self.repository.get_user(user_id)
+    
     def create_loan_application(self, data: dict):
         """Create a new loan application"""
-        if not self.client:
+        if not self.repository:
             return None
         
         try:
-            response = self.client.table('loan_applications').insert(data).execute()
-            return response.data
+            with span('supabase.create_loan_application'):
+                rows = self.repository.insert_loan_application(data)
+            self.invalidate_applications(data.get('user_id'))
+            return rows
         except Exception as e:
             print(f"Error creating loan application: {e}")
             return None
     
-    def update_loan_application(self, application_id: str, data: dict):
-        """Update loan application"""
-        if not self.client:
+    def update_loan_application(self, application_id: str, data: dict, user_id: str = None):
+        """
+        Update loan application (user_id, when known, is used to invalidate cached lists).
+        Inside a unit of work the update is merged and written at commit; the pending row is returned.
+        """
+        if not self.repository:
             return None
         
+        unit = current_unit()
+        if unit is not None:
+            unit.add_update(application_id, data, user_id)
+            return [{'id': application_id, **data}]
+        return self._update_loan_application(application_id, data, user_id)
+    
+    def _update_loan_application(self, application_id: str, data: dict, user_id: str = None):
         try:
-            response = self.client.table('loan_applications').update(data).eq('id', application_id).execute()
-            return response.data
+            with span('supabase.update_loan_application'):
+                rows = self.repository.update_loan_application(application_id, data)
+            owners = {user_id} | {row.get('user_id') for row in rows or []}
+            for owner in owners:
+                self.invalidate_applications(owner)
+            return rows
         except Exception as e:
             print(f"Error updating loan application: {e}")
             return None
     
-    def log_audit(self, user_id: str, action: str, agent_name: str, details: dict = None):
-        """Log audit trail"""
-        if not self.client:
+    def upsert_loan_applications(self, rows: List[dict]) -> list:
+        """
+        Insert or update many applications in one request (conflicts on id).
+        Raises on database errors (and without a database) so bulk imports can count the failed chunk.
+        """
+        if not self.repository:
+            raise RuntimeError("No database configured: set the Supabase credentials or PERSISTENCE_BACKEND=sqlite")
+        with span('supabase.upsert_loan_applications'):
+            written = self.repository.upsert_loan_applications(rows)
+        owners = {row.get('user_id') for row in rows}
+        self.applications_cache.delete_matching(lambda key: key[0] in owners)
+        return written
+    
+    def list_loan_applications(self, user_id: str, columns: List[str],
+                               cursor: Optional[str] = None, limit: int = 20) -> dict:
+        """
+        One page of a user's applications, newest first, read through a short-TTL cache.
+        Returns: dict with 'applications' and 'next_cursor' (None on the last page).
+        Raises on database errors and InvalidCursorError for a malformed cursor.
+        """
+        if not self.repository:
+            return {'applications': [], 'next_cursor': None}
+        
+        key = (user_id, tuple(columns), cursor, limit)
+        page = self.applications_cache.get(key)
+        if page is not None:
+            return page
+        
+        with span('supabase.list_loan_applications'):
+            rows, next_cursor = self.repository.list_loan_applications(user_id, columns, cursor, limit)
+        page = {'applications': rows, 'next_cursor': next_cursor}
+        self.applications_cache.set(key, page)
+        return page
+    
+    def invalidate_applications(self, user_id: Optional[str]):
+        """Drop every cached application page of a user"""
+        if user_id:
+            self.applications_cache.delete_matching(lambda key: key[0] == user_id)
+    
+    def insert_kyc_document(self, data: dict) -> list:
+        """Insert a kyc_documents row (None without a database); raises on database errors so KYC jobs can retry"""
+        if not self.repository:
             return None
         
-        try:
-            data = {
-                'user_id': user_id,
-                'action': action,
-                'agent_name': agent_name,
-                'details': details or {}
-            }
-            response = self.client.table('audit_logs').insert(data).execute()
-            return response.data
-        except Exception as e:
-            print(f"Error logging audit: {e}")
+        with span('supabase.insert_kyc_document'):
+            return self.repository.insert_kyc_document(data)
+    
+    def list_kyc_documents(self, user_id: str, columns: List[str],
+                           cursor: Optional[str] = None, limit: int = 20) -> dict:
+        """
+        One page of a user's KYC documents, newest first.
+        Returns: dict with 'documents' and 'next_cursor' (None on the last page).
+        Raises on database errors and InvalidCursorError for a malformed cursor.
+        """
+        if not self.repository:
+            return {'documents': [], 'next_cursor': None}
+        
+        with span('supabase.list_kyc_documents'):
+            rows, next_cursor = self.repository.list_kyc_documents(user_id, columns, cursor, limit)
+        return {'documents': rows, 'next_cursor': next_cursor}
+    
+    def log_audit(self, user_id: str, action: str, agent_name: str, details: dict = None):
+        """Queue an audit trail entry; it is written by the background audit writer (or unit of work)"""
+        if not self.repository:
             return None
+        
+        data = {
+            'user_id': user_id,
+            'action': action,
+            'agent_name': agent_name,
+            'details': details or {},
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+        unit = current_unit()
+        if unit is not None:
+            unit.add_audit(data)
+        else:
+            self.audit_writer.enqueue(data)
+        return data
+    
+    def _insert_audit_batch(self, rows: list):
+        """Bulk insert audit rows (raises so the writer can retry or spill)"""
+        with span('supabase.insert_audit_batch'):
+            return self.repository.insert_audit_logs(rows)
+    
+    def close(self):
+        """Flush queued audit events before shutdown"""
+        self.audit_writer.stop()
+        if self.repository:
+            self.repository.close()
 
 # Singleton instance
 supabase_client = SupabaseClient()
+metrics_registry.register_collector('audit_writer', supabase_client.audit_writer.stats)
+metrics_registry.register_collector('applications_cache', supabase_client.applications_cache.stats)
+metrics_registry.register_collector(
+    'unit_of_work', lambda: {name: counter.value for name, counter in supabase_client.unit_stats.items()}
+)
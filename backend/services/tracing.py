@@ -0,0 +1,233 @@
+"""
+Tracing - Timing spans, per-request traces and an opt-in sampling profiler for slow requests
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter as StackCounter, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from services.metrics import labelled, metrics_registry
+
+# Trace of the HTTP request being served; copied into executor threads by AgentExecutor
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('request_trace', default=None)
+
+class RequestTrace:
+    """Spans recorded while serving one request, and the threads that ran them"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = time.perf_counter()
+        self.wall_started_at = time.time()
+        self.spans: List[tuple] = []
+        self.threads = {threading.get_ident()}
+        self.seconds = None
+
+class Span:
+    """Handle yielded by span(); set `error` to count a failure that did not raise"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.error = False
+        self.seconds = None
+
+@contextmanager
+def span(name: str) -> Iterator[Span]:
+    """
+    Time a block: observes the `<name>.seconds` histogram, increments `<name>.errors`
+    when the block raises (or sets span.error) and adds the span to the current request trace.
+    """
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.threads.add(threading.get_ident())
+    handle = Span(name)
+    started_at = time.perf_counter()
+    try:
+        yield handle
+    except Exception:
+        handle.error = True
+        raise
+    finally:
+        handle.seconds = time.perf_counter() - started_at
+        metrics_registry.histogram(f'{name}.seconds').observe(handle.seconds)
+        if handle.error:
+            metrics_registry.counter(f'{name}.errors').inc()
+        if trace is not None:
+            trace.spans.append((name, round(handle.seconds * 1000, 2), handle.error))
+
+def traced(name: str) -> Callable:
+    """Decorator form of span() for sync and async functions"""
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+class SlowRequestProfiler:
+    """
+    Opt-in sampling profiler (PROFILE_SLOW_REQUESTS_MS > 0).
+
+    While requests are in flight a daemon thread samples every thread's stack each
+    `interval`. When a request takes longer than `threshold`, the samples taken during it
+    on the threads that ran its spans are written as folded stacks
+    (`frame;frame;frame count`, the input of flamegraph.pl and speedscope) to PROFILE_DIR.
+    """
+
+    def __init__(self, threshold_ms: float = None, interval_ms: float = None,
+                 directory: str = None, max_samples: int = 200000):
+        threshold_ms = threshold_ms if threshold_ms is not None else float(os.getenv('PROFILE_SLOW_REQUESTS_MS', '0'))
+        interval_ms = interval_ms or float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.directory = directory or os.getenv(
+            'PROFILE_DIR',
+            os.path.join(os.path.dirname(__file__), '..', 'profiles')
+        )
+        # (wall time, thread id, folded stack)
+        self.samples = deque(maxlen=max_samples)
+        self.in_flight = 0
+        self.profiles_written = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sample_loop, name='slow-request-profiler', daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _fold(frame) -> str:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(stack))
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while True:
+            if not self.in_flight:
+                self._wake.wait()
+                self._wake.clear()
+            now = time.time()
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.samples.append((now, thread_id, self._fold(frame)))
+            time.sleep(self.interval)
+
+    def request_started(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.in_flight += 1
+            self._ensure_started()
+        self._wake.set()
+
+    def is_slow(self, trace: RequestTrace) -> bool:
+        return self.enabled and trace.seconds >= self.threshold
+
+    def request_finished(self, trace: RequestTrace) -> Optional[str]:
+        """Returns the path of the written profile when the request was slow (and was sampled)"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self.in_flight -= 1
+        if not self.is_slow(trace):
+            return None
+
+        ended_at = trace.wall_started_at + trace.seconds
+        stacks = StackCounter(
+            stack for at, thread_id, stack in list(self.samples)
+            if trace.wall_started_at <= at <= ended_at and thread_id in trace.threads
+        )
+        if not stacks:
+            return None
+
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        slug = re.sub(r'[^a-zA-Z0-9]+', '_', trace.name).strip('_')
+        path = os.path.join(self.directory, f'{stamp}_{slug}_{round(trace.seconds * 1000)}ms.folded')
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        self.profiles_written += 1
+        return path
+
+class TracingMiddleware:
+    """
+    ASGI middleware: one RequestTrace per HTTP request, an `http.request.seconds`
+    histogram per method and route template, and a profile dump for slow requests.
+    Streaming responses are timed until their last body chunk.
+    """
+
+    def __init__(self, app, profiler: SlowRequestProfiler = None):
+        self.app = app
+        self.profiler = profiler or slow_request_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(f"{scope['method']} {scope['path']}")
+        token = _current_trace.set(trace)
+        tracing_stats['in_flight'] += 1
+        self.profiler.request_started()
+        status = 500
+        try:
+            async def send_with_status(message):
+                nonlocal status
+                if message['type'] == 'http.response.start':
+                    status = message['status']
+                await send(message)
+
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_trace.reset(token)
+            tracing_stats['in_flight'] -= 1
+            trace.seconds = time.perf_counter() - trace.started_at
+            route = getattr(scope.get('route'), 'path', None) or 'unmatched'
+            metrics_registry.histogram(
+                labelled('http.request.seconds', method=scope['method'], route=route)
+            ).observe(trace.seconds)
+            if status >= 500:
+                metrics_registry.counter(labelled('http.request.errors', method=scope['method'], route=route)).inc()
+            path = self.profiler.request_finished(trace)
+            if self.profiler.is_slow(trace):
+                tracing_stats['slow_requests'] += 1
+                breakdown = ', '.join(f'{name} {ms:g}ms' + (' (error)' if error else '') for name, ms, error in trace.spans)
+                print(f"Slow request {trace.name} took {trace.seconds * 1000:.0f}ms [{breakdown}]"
+                      + (f"; profile written to {path}" if path else ''))
+
+def stats() -> Dict[str, Any]:
+    return {
+        **tracing_stats,
+        'profiler_enabled': slow_request_profiler.enabled,
+        'profiles_written': slow_request_profiler.profiles_written
+    }
+
+# Singleton instances
+tracing_stats = {'in_flight': 0, 'slow_requests': 0}
+slow_request_profiler = SlowRequestProfiler()
+metrics_registry.register_collector('tracing', stats)
@@ -0,0 +1,78 @@
+"""
+Unit of Work - Request-scoped collection of SupabaseClient writes and memoized reads
+"""
+import contextvars
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Unit of the request being served; copied into executor threads by AgentExecutor
+_current_unit: contextvars.ContextVar = contextvars.ContextVar('unit_of_work', default=None)
+
+def current_unit() -> Optional['UnitOfWork']:
+    return _current_unit.get()
+
+class UnitOfWork:
+    """
+    Writes and reads made while serving one chat turn.
+
+    - Audit events are held until commit and written as one batch
+    - Updates to the same application are merged (later values win)
+    - Reads are memoized; concurrent reads of one key share a single fetch
+
+    Agents run in executor threads that share the unit through the copied context,
+    so all access goes through a lock.
+    """
+
+    def __init__(self):
+        self.audits: List[dict] = []
+        self.updates: Dict[str, Dict[str, Any]] = {}
+        self.reads: Dict[Any, Future] = {}
+        self.deferred = 0
+        self.read_hits = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> bool:
+        return bool(self.audits or self.updates)
+
+    def add_audit(self, event: dict):
+        with self._lock:
+            self.audits.append(event)
+            self.deferred += 1
+
+    def add_update(self, application_id: str, data: dict, user_id: Optional[str] = None):
+        with self._lock:
+            update = self.updates.setdefault(application_id, {'data': {}, 'user_id': None})
+            update['data'].update(data)
+            update['user_id'] = user_id or update['user_id']
+            self.deferred += 1
+
+    def read(self, key: Any, fetch: Callable[[], Any]) -> Any:
+        """fetch() once per key for the rest of the unit; errors are not memoized"""
+        with self._lock:
+            future = self.reads.get(key)
+            owner = future is None
+            if owner:
+                future = self.reads[key] = Future()
+            else:
+                self.read_hits += 1
+        if not owner:
+            return future.result()
+
+        try:
+            value = fetch()
+        except Exception as e:
+            with self._lock:
+                self.reads.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(value)
+        return value
+
+    def drain(self) -> Tuple[Dict[str, Dict[str, Any]], List[dict]]:
+        """Take the collected updates and audit events, leaving the unit empty"""
+        with self._lock:
+            updates, audits = self.updates, self.audits
+            self.updates, self.audits = {}, []
+        return updates, audits
@@ -0,0 +1,14 @@
+"""
+Run from backend/:  python -m pytest tests
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Keep the service singletons offline: no hosted database, no OCR credentials
+os.environ.setdefault('SUPABASE_URL', '')
+os.environ.setdefault('SUPABASE_SERVICE_ROLE_KEY', '')
+os.environ.setdefault('PERSISTENCE_BACKEND', 'supabase')
@@ -0,0 +1,87 @@
+"""
+underwrite_rows must agree with the scalar path (CreditScoringService / UnderwritingAgent)
+field by field, including right at every threshold
+"""
+import math
+import pytest
+import agents.underwriting_agent as underwriting_module
+from services.batch_underwriting import underwrite_rows
+from services.credit_scoring import CreditScoringService
+
+SEED = 7
+EMPLOYMENT_TYPES = ('salaried', 'self-employed', 'business', 'professional', 'other', 'freelance')
+
+def threshold_incomes():
+    """Incomes on, just below and just above every income and loan-amount threshold"""
+    thresholds = [20000, 30000, 50000, 100000, 200000 / 12, 500000 / 12]
+    incomes = [41666.6666, 16666.6666, 29999.996, 30000.004]
+    for threshold in thresholds:
+        incomes += [threshold, math.nextafter(threshold, 0), math.nextafter(threshold, math.inf),
+                    threshold - 0.005, threshold + 0.005, round(threshold, 2)]
+    return incomes
+
+INCOMES = threshold_incomes()
+
+class RecordingMasterAgent:
+    """Just enough of MasterAgent for UnderwritingAgent.process"""
+
+    def __init__(self, income, employment_type):
+        self.data = {'income': income, 'employment_type': employment_type}
+
+    def get_state_data(self, user_id):
+        return self.data
+
+    def get_application_id(self, user_id):
+        return None
+
+    def update_state(self, user_id, stage=None, data=None):
+        if data:
+            self.data.update(data)
+
+    def reset_state(self, user_id):
+        pass
+
+@pytest.fixture
+def scoring(monkeypatch):
+    service = CreditScoringService(mode='deterministic', seed=SEED)
+    monkeypatch.setattr(underwriting_module, 'credit_scoring_service', service)
+    return service
+
+def batch_results():
+    rows = [{'income': income, 'employment_type': employment_type}
+            for income in INCOMES for employment_type in EMPLOYMENT_TYPES]
+    return rows, underwrite_rows(rows, seed=SEED, deterministic=True)
+
+def test_batch_matches_scalar_assessment(scoring):
+    rows, results = batch_results()
+    for row, result in zip(rows, results):
+        scalar = scoring.assess_applicant(row['income'], row['employment_type'])
+        for field in ('credit_score', 'max_loan_amount', 'interest_rate', 'tenure_months', 'risk_level', 'status'):
+            assert result[field] == scalar[field], (row, field)
+
+def test_batch_matches_underwriting_agent(scoring):
+    rows, results = batch_results()
+    agent = underwriting_module.UnderwritingAgent()
+    for row, result in zip(rows, results):
+        master_agent = RecordingMasterAgent(row['income'], row['employment_type'])
+        agent.process('parity-user', '', master_agent)
+        state = master_agent.data
+        assert state['credit_score'] == result['credit_score'], row
+        assert state['loan_amount'] == result['max_loan_amount'], row
+        assert state['interest_rate'] == result['interest_rate'], row
+        assert state['tenure_months'] == result['tenure_months'], row
+        assert state['status'] == result['status'], row
+
+def test_tenure_uses_unrounded_loan_amount():
+    # 41666.6666 * 12 = 499999.9992, which rounds to 500000.00 but is below the 60-month threshold
+    result = underwrite_rows([{'income': 41666.6666, 'employment_type': 'salaried'}], seed=SEED, deterministic=True)[0]
+    assert result['max_loan_amount'] == 500000.0
+    assert result['tenure_months'] == 48
+
+def test_random_mode_matches_seeded_scalar_draws():
+    import random
+    rows = [{'income': income, 'employment_type': 'salaried'} for income in INCOMES]
+    results = underwrite_rows(rows, seed=SEED)
+    rng = random.Random(SEED)
+    for row, result in zip(rows, results):
+        assert result['credit_score'] == CreditScoringService.calculate_credit_score(row['income'], 'salaried', rng=rng)
@@ -0,0 +1,73 @@
+"""
+Bulk pre-approval: record validation, per-chunk id handling and line splitting
+"""
+import pytest
+from pydantic import ValidationError
+from models.schemas import UnderwritingApplicant
+from services.bulk_preapproval import BulkPreapprovalPipeline, iter_text_lines, parse_applicant
+
+class UpsertRecorder:
+    """Stands in for SupabaseClient; like Postgres, one upsert may not touch a row twice"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def upsert_loan_applications(self, rows):
+        ids = [row['id'] for row in rows]
+        if len(set(ids)) != len(ids):
+            raise RuntimeError('ON CONFLICT DO UPDATE command cannot affect row a second time')
+        for row in rows:
+            self.rows[row['id']] = row
+        return rows
+
+def run(lines, fmt='csv', chunk_size=100):
+    database = UpsertRecorder()
+    pipeline = BulkPreapprovalPipeline(database=database, chunk_size=chunk_size, write_concurrency=1)
+    summary = pipeline.run(lines, fmt, 'test-source', seed=1, deterministic=True)
+    return summary, database
+
+@pytest.mark.parametrize('income', ['nan', 'NaN', 'inf', '-inf', 'Infinity', '1e400'])
+def test_non_finite_incomes_are_invalid(income):
+    with pytest.raises(ValueError, match='finite'):
+        parse_applicant({'user_id': 'u1', 'income': income, 'employment_type': 'salaried'}, True)
+
+@pytest.mark.parametrize('income', [float('nan'), float('inf')])
+def test_batch_request_rejects_non_finite_income(income):
+    with pytest.raises(ValidationError):
+        UnderwritingApplicant(income=income, employment_type='salaried')
+
+def test_duplicate_ids_in_a_chunk_keep_the_last_row():
+    lines = [
+        'id,user_id,income,employment_type\n',
+        'a1,u1,40000,salaried\n',
+        'a2,u1,50000,salaried\n',
+        'a1,u1,90000,salaried\n',
+        ',u2,60000,self-employed\n',
+    ]
+    summary, database = run(lines)
+    assert summary['rows'] == 4 and summary['written'] == 3 and summary['write_failed'] == 0
+    assert summary['invalid'] == 1
+    assert summary['errors'] == [{'line': 2, 'error': 'duplicate id a1, superseded by line 4'}]
+    assert database.rows['a1']['income'] == 90000
+    assert len(database.rows) == 3
+
+def test_duplicate_ids_across_chunks_are_upserted():
+    lines = ['{"id": "a1", "user_id": "u1", "income": %d, "employment_type": "salaried"}\n' % income
+             for income in (40000, 90000)]
+    summary, database = run(lines, fmt='jsonl', chunk_size=1)
+    assert summary['written'] == 2 and summary['invalid'] == 0
+    assert database.rows['a1']['income'] == 90000
+
+def test_lines_split_across_chunks():
+    chunks = [b'\xef\xbb\xbfuser_id,inc', b'ome\nu1,4', b'0000\r\nu2,5\xe2\x82', b'\xac\n', b'tail']
+    assert list(iter_text_lines(chunks)) == ['user_id,income\n', 'u1,40000\r\n', 'u2,5€\n', 'tail']
+
+def test_overlong_line_fails_without_buffering_it():
+    def endless():
+        while True:
+            yield b'x' * 1024
+
+    with pytest.raises(ValueError, match='longer than 4096 characters'):
+        list(iter_text_lines(endless(), max_line_chars=4096))
+    with pytest.raises(ValueError, match='longer than 8 characters'):
+        list(iter_text_lines([b'ok\n', b'0123456789'], max_line_chars=8))
@@ -0,0 +1,80 @@
+"""
+Chat turns: the sanction reply is released only after the turn's writes commit
+"""
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+import main
+from services.supabase_client import supabase_client
+
+class RecordingRepository:
+    backend = 'sqlite'
+
+    def __init__(self, events, fail=False):
+        self.events = events
+        self.fail = fail
+
+    def commit_unit(self, updates, audits):
+        if self.fail:
+            raise RuntimeError('database unavailable')
+        self.events.append(('commit', [update['status'] for update in updates]))
+
+    def update_loan_application(self, application_id, data):
+        if self.fail:
+            raise RuntimeError('database unavailable')
+        return [{'id': application_id, **data}]
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def turn(monkeypatch):
+    events = []
+
+    async def run(user_id, message, has_file, master_agent):
+        supabase_client.update_loan_application('app-1', {'status': 'APPROVED'}, user_id)
+        yield {'stage': 'underwriting', 'response': 'Approved', 'data': None}
+        yield {'stage': 'sanction', 'response': 'Your letter', 'data': {'pdf_url': '/api/download-sanction/x.pdf'}}
+
+    monkeypatch.setattr(main.pipeline, 'run', run)
+    monkeypatch.setattr(supabase_client, 'repository', RecordingRepository(events))
+    return events
+
+def consume(events):
+    async def scenario():
+        message = main.ChatMessage(message='hi', user_id='u1', has_file=False)
+        async for stage in main.chat_stages(message):
+            events.append(('yield', stage['stage']))
+    asyncio.run(scenario())
+
+def test_sanction_is_yielded_after_the_commit(turn):
+    consume(turn)
+    assert turn == [('yield', 'underwriting'), ('commit', ['APPROVED']), ('yield', 'sanction')]
+
+def test_failed_commit_withholds_the_sanction(turn):
+    supabase_client.repository.fail = True
+    with pytest.raises(RuntimeError):
+        consume(turn)
+    assert turn == [('yield', 'underwriting')]
+
+def test_stream_ends_with_error_instead_of_done_when_the_commit_fails(turn):
+    supabase_client.repository.fail = True
+    # No lifespan: shutdown_services would close the shared executors for later tests
+    body = TestClient(main.app).post('/api/chat/stream', json={'message': 'hi', 'user_id': 'u1'}).text
+    events = [block.split('\n')[0] for block in body.strip().split('\n\n')]
+    assert events == ['event: message', 'event: error']
+    assert 'download-sanction' not in body
+    assert json.loads(body.strip().split('\n\n')[0].split('data: ', 1)[1])['stage'] == 'underwriting'
+
+def test_lifespan_runs_shutdown_services(monkeypatch):
+    stopped = []
+
+    async def shutdown_services():
+        stopped.append(True)
+
+    monkeypatch.setattr(main, 'shutdown_services', shutdown_services)
+    with TestClient(main.app) as http:
+        assert http.get('/health').status_code == 200
+        assert not stopped
+    assert stopped == [True]
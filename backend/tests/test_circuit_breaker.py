@@ -0,0 +1,80 @@
+"""
+OCR provider circuit breaker and DocumentExtractor routing
+"""
+import asyncio
+import time
+from services.document_extractor import CircuitBreaker, DocumentExtractor
+
+class FakeProvider:
+    name = 'fake'
+    configured = True
+
+    def __init__(self):
+        self.behaviour = 'fail'
+        self.calls = 0
+
+    async def extract(self, document, document_type):
+        self.calls += 1
+        if self.behaviour == 'hang':
+            await asyncio.sleep(3600)
+        if self.behaviour == 'fail':
+            raise RuntimeError('provider down')
+        return {'success': True, 'document_type': 'general', 'raw_text': 'some text'}
+
+def test_breaker_opens_and_closes_after_a_trial():
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=2, open_seconds=0.01)
+    assert breaker.allow()
+    breaker.record(False, 1, 1)
+    assert breaker.state == 'closed'
+    breaker.record(False, 2, 2)
+    assert breaker.state == 'open' and not breaker.allow()
+
+    time.sleep(0.02)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow(), 'only one trial call at a time'
+    assert breaker.record(True, 1, 0)
+    assert breaker.state == 'closed'
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker(error_rate=0.5, min_calls=1, open_seconds=0.01)
+    breaker.record(False, 1, 1)
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record(False, 1, 1)
+    assert breaker.state == 'open' and breaker.times_opened == 2
+
+def test_cancelled_trial_is_released():
+    provider = FakeProvider()
+    extractor = DocumentExtractor([provider], timeout=5, min_calls=1, error_rate=0.5, open_seconds=0.01)
+    health = extractor.health['fake']
+
+    async def scenario():
+        await extractor._route(None, 'general')
+        assert health.breaker.state == 'open'
+        await asyncio.sleep(0.02)
+
+        provider.behaviour = 'hang'
+        trial = asyncio.create_task(extractor._route(None, 'general'))
+        await asyncio.sleep(0.01)
+        assert health.breaker.trial_in_flight
+        trial.cancel()
+        await asyncio.gather(trial, return_exceptions=True)
+        assert not health.breaker.trial_in_flight
+
+        provider.behaviour = 'ok'
+        return await extractor._route(None, 'general')
+
+    result = asyncio.run(scenario())
+    assert result['success'] and provider.calls == 3
+    assert health.breaker.state == 'closed'
+
+def test_local_provider_stays_first_however_slow():
+    local, cloud_a, cloud_b = FakeProvider(), FakeProvider(), FakeProvider()
+    local.name, local.local = 'local', True
+    cloud_a.name, cloud_b.name = 'cloud_a', 'cloud_b'
+    extractor = DocumentExtractor([local, cloud_a, cloud_b], timeout=5)
+    extractor.health['local'].record(4.0, True)
+    extractor.health['cloud_a'].record(2.0, True)
+    extractor.health['cloud_b'].record(0.1, True)
+    assert [provider.name for provider in extractor.ranked()] == ['local', 'cloud_b', 'cloud_a']
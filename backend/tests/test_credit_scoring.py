@@ -0,0 +1,18 @@
+"""
+Deterministic-mode memo of CreditScoringService.assess_applicant
+"""
+from services.credit_scoring import CreditScoringService
+
+def test_memo_does_not_merge_incomes_across_a_threshold():
+    service = CreditScoringService(mode='deterministic', seed=7)
+    below = service.assess_applicant(29999.996, 'salaried')
+    above = service.assess_applicant(30000.004, 'salaried')
+    assert below == service._assess(29999.996, 'salaried', service.stable_random_factor(29999.996, 'salaried', 7))
+    assert above == service._assess(30000.004, 'salaried', service.stable_random_factor(30000.004, 'salaried', 7))
+    assert below['credit_score'] != above['credit_score']
+
+def test_memo_hits_repeat_applicants():
+    service = CreditScoringService(mode='deterministic', seed=7)
+    first = service.assess_applicant(45000, 'Salaried')
+    assert service.assess_applicant(45000.0, 'salaried') == first
+    assert service.assessment_cache.stats()['hits'] == 1
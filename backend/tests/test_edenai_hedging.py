@@ -0,0 +1,81 @@
+"""
+EdenAI hedged extraction: a failed provider releases only the next one
+"""
+import asyncio
+import httpx
+import pytest
+from services import edenai_ocr_service
+from services.document_stream import DocumentBuffer
+from services.edenai_ocr_service import EdenAIOCRService
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv('EDENAI_API_KEY', 'test')
+    monkeypatch.setenv('EDENAI_PROVIDERS', 'amazon,google,microsoft,mistral')
+    monkeypatch.setenv('EDENAI_HEDGE_DELAYS', '0,5,5,5')
+    service = EdenAIOCRService()
+    # The provider name stands in for the request body, so the fake transport knows who was called
+    monkeypatch.setattr(service, '_route', lambda document_type: ('https://edenai.test/ocr', {}, lambda payload: payload))
+    monkeypatch.setattr(service, '_abody', lambda document, extra_fields, provider=None: provider)
+    return service
+
+def test_failure_starts_only_the_next_provider(service, monkeypatch):
+    started = []
+
+    async def apost(url, content, headers):
+        started.append(content)
+        await asyncio.sleep(0.01)
+        if content == 'amazon':
+            raise httpx.ConnectError('provider down')
+        return FakeResponse({'success': True, 'document_type': 'general', 'raw_text': f'text read by {content}'})
+
+    monkeypatch.setattr(edenai_ocr_service.http_transport, 'apost', apost)
+    result = asyncio.run(asyncio.wait_for(service._ahedged_extract(None, 'general'), timeout=2))
+
+    assert result['provider'] == 'google'
+    assert started == ['amazon', 'google']
+    assert service.hedge_stats['amazon']['errors'] == 1
+    assert service.hedge_stats['google']['wins'] == 1
+
+def test_failures_cascade_one_provider_at_a_time(service, monkeypatch):
+    started = []
+
+    async def apost(url, content, headers):
+        started.append(content)
+        await asyncio.sleep(0.01)
+        if content != 'mistral':
+            raise httpx.ConnectError('provider down')
+        return FakeResponse({'success': True, 'document_type': 'general', 'raw_text': 'text read by mistral'})
+
+    monkeypatch.setattr(edenai_ocr_service.http_transport, 'apost', apost)
+    result = asyncio.run(asyncio.wait_for(service._ahedged_extract(None, 'general'), timeout=2))
+
+    assert result['provider'] == 'mistral'
+    assert started == ['amazon', 'google', 'microsoft', 'mistral']
+
+def test_cached_results_are_copies(service, monkeypatch):
+    calls = []
+
+    async def aextract(document, document_type):
+        calls.append(document_type)
+        return {'success': True, 'document_type': 'PAN Card', 'extracted_data': {'panNumber': 'ABCPE1234F'}}
+
+    monkeypatch.setattr(service, '_aextract', aextract)
+    document = DocumentBuffer.from_bytes(b'same image')
+    first = asyncio.run(service.aextract_document(document, 'pan'))
+    first['extracted_data']['panNumber'] = 'changed by the caller'
+    second = asyncio.run(service.aextract_document(document, 'pan'))
+    second['extracted_data'].clear()
+    third = service.extract_document(document, 'pan')
+    assert calls == ['pan']
+    assert third['extracted_data'] == {'panNumber': 'ABCPE1234F'}
@@ -0,0 +1,48 @@
+"""
+HTTPTransport async clients: one per event loop, closed with the loop or by aclose()
+"""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from services.http_transport import HTTPTransport
+
+class OkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def url():
+    server = HTTPServer(('127.0.0.1', 0), OkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+def test_clients_close_with_their_event_loop(url):
+    transport = HTTPTransport()
+
+    async def get():
+        return (await transport.arequest('GET', url)).status_code
+
+    assert asyncio.run(get()) == 200
+    first = transport._async_client
+    assert first.is_closed, 'asyncio.run() closed the keep-alive client before closing its loop'
+
+    async def get_and_close():
+        status = await get()
+        client = transport._async_client
+        await transport.aclose()
+        return status, client
+
+    status, second = asyncio.run(get_and_close())
+    assert status == 200 and second is not first and second.is_closed
+    assert transport._async_client is None
@@ -0,0 +1,100 @@
+"""
+JobQueue retries, dead-lettering and status subscriptions
+"""
+import asyncio
+import time
+import pytest
+from services.job_queue import JobQueue, QueueFullError
+
+async def wait_finished(queue: JobQueue, job_id: str) -> dict:
+    async for snapshot in queue.subscribe(job_id, keepalive=1):
+        if snapshot and snapshot['status'] in ('succeeded', 'dead'):
+            return snapshot
+
+def test_retries_until_success_with_backoff():
+    attempted_at = []
+
+    async def flaky(payload):
+        attempted_at.append(time.perf_counter())
+        if len(attempted_at) < 3:
+            raise RuntimeError(f'attempt {len(attempted_at)} failed')
+        return {'value': payload['value']}
+
+    async def scenario():
+        queue = JobQueue('test_flaky', flaky, workers=1, max_retries=3, retry_backoff=0.05)
+        job = queue.submit({'value': 42})
+        statuses = []
+        async for snapshot in queue.subscribe(job.id, keepalive=1):
+            statuses.append(snapshot['status'])
+            if snapshot['status'] == 'succeeded':
+                break
+        await queue.stop()
+        return queue, job, statuses
+
+    queue, job, statuses = asyncio.run(scenario())
+    assert job.result == {'value': 42} and job.attempts == 3 and job.error is None
+    assert statuses.count('retrying') == 2 and statuses[-1] == 'succeeded'
+    # Backoff doubles: 0.05s after the first failure, 0.1s after the second
+    assert attempted_at[1] - attempted_at[0] >= 0.05
+    assert attempted_at[2] - attempted_at[1] >= 0.1
+    assert queue.counts['retried'] == 2 and queue.counts['succeeded'] == 1
+    assert job.payload is None, 'payload is released once the job finishes'
+
+def test_dead_letters_after_max_retries():
+    finished = []
+
+    async def broken(payload):
+        raise ValueError('bad document')
+
+    async def scenario():
+        queue = JobQueue('test_broken', broken, workers=2, max_retries=2, retry_backoff=0.01)
+        job = queue.submit({'user_id': 'u1', 'buffer': object()}, on_finish=lambda: finished.append(True))
+        snapshot = await asyncio.wait_for(wait_finished(queue, job.id), timeout=2)
+        await queue.stop()
+        return queue, job, snapshot
+
+    queue, job, snapshot = asyncio.run(scenario())
+    assert snapshot['status'] == 'dead' and snapshot['attempts'] == 3
+    assert snapshot['error'] == 'bad document'
+    assert queue.counts['dead'] == 1 and queue.counts['retried'] == 2
+    assert list(queue.dead_letter) == [{'job_id': job.id, 'error': 'bad document', 'payload': {'user_id': 'u1'}}]
+    assert finished == [True]
+    assert queue.get(job.id) is job and not queue.active
+
+def test_rejects_when_full():
+    async def slow(payload):
+        await asyncio.sleep(1)
+
+    async def scenario():
+        queue = JobQueue('test_full', slow, workers=1, max_queue=2)
+        queue.submit({})
+        queue.submit({})
+        with pytest.raises(QueueFullError):
+            queue.submit({})
+        await queue.stop()
+        return queue
+
+    assert asyncio.run(scenario()).counts['rejected'] == 1
+
+def test_stop_dead_letters_unfinished_jobs_and_releases_payloads():
+    started = asyncio.Event()
+    released = []
+
+    async def slow(payload):
+        started.set()
+        await asyncio.sleep(3600)
+
+    async def scenario():
+        queue = JobQueue('test_stop', slow, workers=1)
+        running = queue.submit({'n': 1}, on_finish=lambda: released.append(1))
+        queued = queue.submit({'n': 2}, on_finish=lambda: released.append(2))
+        await started.wait()
+        await queue.stop()
+        return queue, running, queued
+
+    queue, running, queued = asyncio.run(scenario())
+    assert running.status == queued.status == 'dead'
+    assert 'shut down' in running.error and running.payload is None
+    assert sorted(released) == [1, 2]
+    assert not queue.active and queue.get(queued.id) is queued
+    assert queue.counts['dead'] == 2 and len(queue.dead_letter) == 2
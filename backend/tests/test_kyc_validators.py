@@ -0,0 +1,70 @@
+"""
+PAN/Aadhaar validators: format, Verhoeff checksum and OCR-confusion correction
+"""
+import pytest
+from services.kyc_validators import (
+    document_kind, find_aadhaar, find_pan, validate_aadhaar, validate_document_fields, validate_pan,
+    verhoeff_check_digit, verhoeff_valid
+)
+
+AADHAAR = '234567890127'
+
+def test_verhoeff_reference_values():
+    assert verhoeff_check_digit('236') == '3'
+    assert verhoeff_valid('2363')
+    assert not verhoeff_valid('2364')
+    assert verhoeff_valid(AADHAAR)
+
+@pytest.mark.parametrize('position', range(12))
+def test_verhoeff_catches_every_single_digit_error(position):
+    for digit in '0123456789':
+        if digit != AADHAAR[position]:
+            assert not verhoeff_valid(AADHAAR[:position] + digit + AADHAAR[position + 1:])
+
+def test_verhoeff_catches_adjacent_transpositions():
+    for i in range(11):
+        swapped = AADHAAR[:i] + AADHAAR[i + 1] + AADHAAR[i] + AADHAAR[i + 2:]
+        if swapped != AADHAAR:
+            assert not verhoeff_valid(swapped)
+
+def test_aadhaar():
+    assert validate_aadhaar('2345 6789 0127') == {'valid': True, 'value': AADHAAR, 'corrected': False, 'error': None}
+    corrected = validate_aadhaar('2345-6789-O127')
+    assert corrected['valid'] and corrected['corrected'] and corrected['value'] == AADHAAR
+    assert validate_aadhaar('234567890128')['error'] == 'Aadhaar checksum mismatch'
+    assert not validate_aadhaar('134567890127')['valid'], 'Aadhaar numbers never start with 0 or 1'
+    assert not validate_aadhaar('')['valid']
+
+def test_pan():
+    assert validate_pan('abcpe 1234f') == {'valid': True, 'value': 'ABCPE1234F', 'corrected': False, 'error': None}
+    corrected = validate_pan('A8CPE12S4F')
+    assert corrected == {'valid': True, 'value': 'ABCPE1254F', 'corrected': True, 'error': None}
+    assert validate_pan('ABCXE1234F')['error'] == 'Invalid PAN holder type "X"'
+    assert not validate_pan('ABCPE123F')['valid']
+    assert not validate_pan(None)['valid']
+
+def test_find_in_ocr_text():
+    assert find_pan('INCOME TAX DEPARTMENT\nPermanent Account Number ABCPE1234F\nGOVT. OF INDIA') == 'ABCPE1234F'
+    assert find_aadhaar('Your Aadhaar No. : 2345 6789 0127 VID') == AADHAAR
+    assert find_aadhaar('Enrolment 2345 6789 0128') is None
+
+def test_document_fields():
+    assert validate_document_fields('PAN Card', {'panNumber': 'ABCPE1234F'})['valid']
+    # Free-form field names (e.g. Gemini) are searched too
+    found = validate_document_fields('pan', {'name': 'A Kumar', 'number': 'ABCPE 1234F'})
+    assert found['valid'] and found['field'] == 'panNumber'
+    missing = validate_document_fields('Aadhaar Card', {'name': 'A Kumar'}, 'no number here')
+    assert missing['error'] == 'Aadhaar number not found in document'
+    assert validate_document_fields('itr', {})['valid']
+
+@pytest.mark.parametrize('label, kind', [
+    ('PAN', 'pan'), ('PAN Card', 'pan'), ('pan_card', 'pan'), ('Aadhaar Card', 'aadhaar'), ('aadhar', 'aadhaar'),
+    # Labels merely containing 'pan' or 'aadhaar' are not ID documents
+    ('company_registration', 'company_registration'), ('japan_visa', 'japan_visa'), ('Aadhaar Enrolment Slip', 'aadhaar enrolment slip'),
+])
+def test_document_kind_matches_exact_labels(label, kind):
+    assert document_kind(label) == kind
+
+def test_other_documents_are_not_checked_as_pan():
+    assert validate_document_fields('company_registration', {'name': 'Acme Pvt Ltd'})['valid']
+    assert validate_document_fields('japan_visa', {}, 'no PAN here')['valid']
@@ -0,0 +1,91 @@
+"""
+Keyset cursors, column projection and the paginated applications endpoint
+"""
+import base64
+import pytest
+from fastapi.testclient import TestClient
+import main
+from services.pagination import (
+    InvalidCursorError, InvalidFieldsError, clamp_limit, decode_cursor, encode_cursor, paginate, select_columns
+)
+from services.repository import MemoryRepository
+from services.supabase_client import supabase_client
+
+def test_cursor_round_trip():
+    row = {'created_at': '2026-01-02T03:04:05.000006+00:00', 'id': 'a1', 'status': 'APPROVED'}
+    cursor = encode_cursor(row)
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == (row['created_at'], 'a1')
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    base64.urlsafe_b64encode(b'{"created_at": "x"}').decode(),
+    base64.urlsafe_b64encode(b'[1, 2]').decode(),
+    base64.urlsafe_b64encode(b'["x"]').decode(),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor)
+
+def test_paginate_uses_the_look_ahead_row():
+    rows = [{'created_at': f't{i}', 'id': str(i)} for i in range(3, 0, -1)]
+    page, cursor = paginate(rows, 2)
+    assert page == rows[:2] and decode_cursor(cursor) == ('t2', '2')
+    assert paginate(rows[:2], 2) == (rows[:2], None)
+    assert paginate(None, 2) == ([], None)
+
+def test_select_columns_and_limits():
+    allowed = ('created_at', 'id', 'status', 'income')
+    assert select_columns(None, allowed, ('status',)) == ['created_at', 'id', 'status']
+    assert select_columns('income, id', allowed, ('status',)) == ['created_at', 'id', 'income']
+    with pytest.raises(InvalidFieldsError):
+        select_columns('income,password', allowed, ('status',))
+    assert (clamp_limit(None), clamp_limit(0), clamp_limit(500), clamp_limit(7)) == (20, 20, 100, 7)
+
+@pytest.fixture
+def client(monkeypatch):
+    repository = MemoryRepository()
+    monkeypatch.setattr(supabase_client, 'repository', repository)
+    supabase_client.applications_cache.clear()
+    yield TestClient(main.app), repository
+    supabase_client.applications_cache.clear()
+
+def test_applications_endpoint_pages_newest_first(client):
+    http, repository = client
+    for i in range(5):
+        repository.insert_loan_application({
+            'user_id': 'u1', 'income': 40000 + i, 'employment_type': 'salaried',
+            'created_at': f'2026-01-01T00:00:0{i}+00:00'
+        })
+
+    incomes, cursor = [], None
+    while True:
+        page = http.get('/api/user/u1/applications', params={'limit': 2, 'fields': 'income', 'cursor': cursor}).json()
+        assert all(set(row) == {'created_at', 'id', 'income'} for row in page['applications'])
+        incomes += [row['income'] for row in page['applications']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert incomes == [40004, 40003, 40002, 40001, 40000]
+
+    assert http.get('/api/user/u1/applications', params={'cursor': 'bogus'}).status_code == 400
+    assert http.get('/api/user/u1/applications', params={'fields': 'password'}).status_code == 400
+
+def test_writes_invalidate_cached_pages(client):
+    http, repository = client
+    assert http.get('/api/user/u2/applications').json()['applications'] == []
+    supabase_client.create_loan_application({'user_id': 'u2', 'income': 50000, 'employment_type': 'salaried'})
+    assert len(http.get('/api/user/u2/applications').json()['applications']) == 1
+
+def test_listing_and_kyc_writes_degrade_without_a_database(monkeypatch):
+    monkeypatch.setattr(supabase_client, 'repository', None)
+    supabase_client.applications_cache.clear()
+    assert TestClient(main.app).get('/api/user/u1/applications').status_code == 200
+    assert supabase_client.list_loan_applications('u1', ['created_at', 'id'], None, 10) == {
+        'applications': [], 'next_cursor': None
+    }
+    assert supabase_client.list_kyc_documents('u1', ['created_at', 'id'], None, 10)['documents'] == []
+    assert supabase_client.insert_kyc_document({'user_id': 'u1', 'document_type': 'pan'}) is None
+    # Bulk imports must not count unwritten rows as written
+    with pytest.raises(RuntimeError, match='No database configured'):
+        supabase_client.upsert_loan_applications([{'id': 'a1'}])
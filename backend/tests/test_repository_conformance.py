@@ -0,0 +1,179 @@
+"""
+Repository conformance - the behaviour every persistence backend must share
+
+    python -m pytest tests/test_repository_conformance.py
+
+Runs against SQLite (a temporary file) and the in-memory backend. To include Supabase,
+point SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY at a scratch project and set
+CONFORMANCE_SUPABASE_USER_ID to an existing auth user; the rows written are left in place.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+import pytest
+from services.pagination import InvalidCursorError
+from services.repository import MemoryRepository, SQLiteRepository, create_repository
+
+class ConformanceContext:
+    """The repository under test, its test user and a clock for distinct timestamps"""
+
+    def __init__(self, repository, user_id: str):
+        self.repository = repository
+        self.user_id = user_id
+        self._clock = datetime.now(timezone.utc) - timedelta(days=1)
+
+    def timestamp(self) -> str:
+        self._clock += timedelta(seconds=1)
+        return self._clock.isoformat()
+
+    def application(self, **fields) -> dict:
+        return {'user_id': self.user_id, 'income': 50000, 'employment_type': 'salaried', **fields}
+
+@pytest.fixture(params=['sqlite', 'memory', 'supabase'])
+def ctx(request, tmp_path, monkeypatch):
+    user_id = None
+    if request.param == 'sqlite':
+        repository = SQLiteRepository(str(tmp_path / 'conformance.db'))
+    elif request.param == 'memory':
+        repository = MemoryRepository()
+    else:
+        user_id = os.getenv('CONFORMANCE_SUPABASE_USER_ID')
+        if not user_id:
+            pytest.skip('set CONFORMANCE_SUPABASE_USER_ID (and Supabase credentials) to run against Supabase')
+        monkeypatch.setenv('PERSISTENCE_BACKEND', 'supabase')
+        repository = create_repository()
+        if repository is None:
+            pytest.skip('SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY are not set')
+
+    if user_id is None:
+        # Supabase users reference auth.users, so only the local backends get a fresh one
+        user_id = str(uuid.uuid4())
+        repository.upsert_user({'id': user_id, 'name': 'Conformance', 'email': f'{user_id}@conformance.test'})
+    yield ConformanceContext(repository, user_id)
+    repository.close()
+
+def test_users_round_trip(ctx):
+    repository = ctx.repository
+    assert repository.get_user(str(uuid.uuid4())) is None
+    user = repository.get_user(ctx.user_id)
+    assert user is not None and user['id'] == ctx.user_id
+    updated = repository.upsert_user({'id': ctx.user_id, 'name': 'Conformance Renamed', 'email': user['email']})
+    assert updated['name'] == 'Conformance Renamed'
+    assert repository.get_user(ctx.user_id)['name'] == 'Conformance Renamed'
+
+def test_insert_and_update_application(ctx):
+    repository = ctx.repository
+    rows = repository.insert_loan_application(ctx.application())
+    assert len(rows) == 1
+    row = rows[0]
+    assert row['id'] and row['created_at'] and row['updated_at']
+    assert row['status'] == 'PENDING'
+
+    updated = repository.update_loan_application(row['id'], {'status': 'APPROVED', 'credit_score': 780})
+    assert len(updated) == 1 and updated[0]['status'] == 'APPROVED'
+    assert updated[0]['credit_score'] == 780 and updated[0]['user_id'] == ctx.user_id
+    assert repository.update_loan_application(str(uuid.uuid4()), {'status': 'REVIEW'}) == []
+    with pytest.raises(Exception):
+        repository.update_loan_application(row['id'], {'status': 'BOGUS'})
+
+def test_upsert_applications(ctx):
+    repository = ctx.repository
+    ids = [str(uuid.uuid4()) for _ in range(3)]
+    rows = [ctx.application(id=row_id, status='REVIEW', credit_score=700) for row_id in ids]
+    assert len(repository.upsert_loan_applications(rows)) == 3
+
+    written = repository.upsert_loan_applications([{**row, 'status': 'APPROVED'} for row in rows])
+    assert sorted(row['id'] for row in written) == sorted(ids)
+    assert all(row['status'] == 'APPROVED' for row in written)
+
+def test_application_pages(ctx):
+    repository = ctx.repository
+    # Two rows share a timestamp so the id tie-break is exercised
+    shared = ctx.timestamp()
+    created = [shared, shared] + [ctx.timestamp() for _ in range(3)]
+    for created_at in created:
+        repository.insert_loan_application(ctx.application(created_at=created_at))
+
+    columns = ['created_at', 'id', 'status']
+    seen, cursor, pages = [], None, 0
+    while True:
+        rows, cursor = repository.list_loan_applications(ctx.user_id, columns, cursor, 2)
+        pages += 1
+        assert len(rows) <= 2
+        assert all(set(row) == set(columns) for row in rows), 'rows hold only the selected columns'
+        seen.extend(rows)
+        if cursor is None:
+            break
+        assert pages < 100, 'pagination should terminate'
+
+    keys = [(row['created_at'], row['id']) for row in seen]
+    assert len(set(keys)) == len(keys), 'pages should not repeat rows'
+    assert keys == sorted(keys, reverse=True), 'rows should be ordered newest first'
+    assert len({row['id'] for row in seen}) >= len(created)
+    with pytest.raises(InvalidCursorError):
+        repository.list_loan_applications(ctx.user_id, columns, 'not-a-cursor', 2)
+
+def test_audit_logs(ctx):
+    repository = ctx.repository
+    action = f'conformance_{uuid.uuid4().hex[:8]}'
+    repository.insert_audit_logs([
+        {'user_id': ctx.user_id, 'action': action, 'agent_name': 'Conformance',
+         'details': {'step': step, 'nested': {'ok': True}}, 'timestamp': ctx.timestamp()}
+        for step in range(3)
+    ])
+    logged = [row for row in repository.list_audit_logs(ctx.user_id, limit=100) if row['action'] == action]
+    assert [row['details']['step'] for row in logged] == [2, 1, 0], 'audit logs should be newest first'
+    assert logged[0]['details']['nested'] == {'ok': True}
+
+def test_kyc_documents(ctx):
+    repository = ctx.repository
+    extracted = {'pan_number': 'ABCDE1234F', 'name': 'Conformance'}
+    rows = repository.insert_kyc_document({
+        'user_id': ctx.user_id, 'document_type': 'pan', 'file_name': 'pan.png',
+        'extracted_data': extracted, 'validation_status': 'verified', 'confidence': 'high',
+        'created_at': ctx.timestamp()
+    })
+    assert len(rows) == 1 and rows[0]['extracted_data'] == extracted
+
+    summary = ['created_at', 'id', 'document_type', 'validation_status']
+    page, _ = repository.list_kyc_documents(ctx.user_id, summary, None, 10)
+    assert page and page[0]['id'] == rows[0]['id']
+    assert 'extracted_data' not in page[0]
+    page, _ = repository.list_kyc_documents(ctx.user_id, summary + ['extracted_data'], None, 1)
+    assert page[0]['extracted_data'] == extracted
+
+def test_commit_unit_is_atomic(ctx):
+    repository = ctx.repository
+    application_id = repository.insert_loan_application(ctx.application())[0]['id']
+    action = f'unit_{uuid.uuid4().hex[:8]}'
+    audit = {'user_id': ctx.user_id, 'action': action, 'agent_name': 'Conformance',
+             'details': {}, 'timestamp': ctx.timestamp()}
+
+    def stored_application() -> dict:
+        page, _ = repository.list_loan_applications(ctx.user_id, ['created_at', 'id', 'status', 'credit_score'], None, 100)
+        return next(row for row in page if row['id'] == application_id)
+
+    repository.commit_unit([{'id': application_id, 'status': 'APPROVED', 'credit_score': 790}], [audit, audit])
+    row = stored_application()
+    assert row['status'] == 'APPROVED' and row['credit_score'] == 790
+    assert len([row for row in repository.list_audit_logs(ctx.user_id) if row['action'] == action]) == 2
+
+    # A failing audit insert must roll the update back too
+    with pytest.raises(Exception):
+        repository.commit_unit([{'id': application_id, 'status': 'REJECTED'}], [{**audit, 'action': None}])
+    assert stored_application()['status'] == 'APPROVED'
+
+def test_commit_unit_rejects_missing_applications(ctx):
+    repository = ctx.repository
+    application_id = repository.insert_loan_application(ctx.application())[0]['id']
+    action = f'unit_{uuid.uuid4().hex[:8]}'
+    audit = {'user_id': ctx.user_id, 'action': action, 'agent_name': 'Conformance',
+             'details': {}, 'timestamp': ctx.timestamp()}
+
+    with pytest.raises(Exception):
+        repository.commit_unit(
+            [{'id': application_id, 'status': 'APPROVED'}, {'id': str(uuid.uuid4()), 'status': 'APPROVED'}], [audit]
+        )
+    page, _ = repository.list_loan_applications(ctx.user_id, ['created_at', 'id', 'status'], None, 100)
+    assert next(row for row in page if row['id'] == application_id)['status'] == 'PENDING'
+    assert not [row for row in repository.list_audit_logs(ctx.user_id) if row['action'] == action]
@@ -0,0 +1,53 @@
+"""
+/download-sanction: conditional GETs and byte ranges, streamed from the PDF store
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routes import sanction_routes
+from services.pdf_store import PDFArtifactStore
+
+PDF = b'%PDF-1.4\n' + bytes(range(256)) * 40 + b'\n%%EOF\n'
+
+@pytest.fixture(params=['hot', 'disk'])
+def download(request, tmp_path, monkeypatch):
+    store = PDFArtifactStore(str(tmp_path), hot_cache_entries=8 if request.param == 'hot' else 0)
+    filename = store.put(PDF)
+    monkeypatch.setattr(sanction_routes, 'pdf_store', store)
+    app = FastAPI()
+    app.include_router(sanction_routes.router)
+    client = TestClient(app)
+    return lambda **headers: client.get(f'/download-sanction/{filename}', headers=headers)
+
+def test_full_download(download):
+    response = download()
+    assert response.status_code == 200
+    assert response.content == PDF
+    assert response.headers['content-length'] == str(len(PDF))
+    assert response.headers['accept-ranges'] == 'bytes'
+
+def test_byte_ranges(download):
+    response = download(range='bytes=100-5000')
+    assert response.status_code == 206
+    assert response.content == PDF[100:5001]
+    assert response.headers['content-range'] == f'bytes 100-5000/{len(PDF)}'
+    assert response.headers['content-length'] == '4901'
+
+    assert download(range='bytes=-10').content == PDF[-10:]
+    assert download(range='bytes=9000-').content == PDF[9000:]
+    assert download(range=f'bytes={len(PDF)}-').status_code == 416
+
+def test_conditional_get(download):
+    etag = download().headers['etag']
+    assert download(**{'if-none-match': etag}).status_code == 304
+    # A stale If-Range serves the whole letter
+    response = download(range='bytes=0-9', **{'if-range': '"stale"'})
+    assert response.status_code == 200 and response.content == PDF
+
+def test_disk_ranges_cross_chunk_boundaries(tmp_path):
+    store = PDFArtifactStore(str(tmp_path), hot_cache_entries=0)
+    filename = store.put(PDF)
+    chunks = list(store.iter_range(filename, 7, 1030, chunk_size=256))
+    assert b''.join(chunks) == PDF[7:1031]
+    assert max(len(chunk) for chunk in chunks) == 256
+    assert b''.join(store.iter_range(filename, 5, None, chunk_size=1000)) == PDF[5:]
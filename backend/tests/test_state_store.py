@@ -0,0 +1,118 @@
+"""
+Conversation state stores: TTL, eviction, counters and atomic merges
+"""
+import threading
+import time
+import pytest
+from agents.master_agent import INITIAL_STATE, MasterAgent
+from services import state_store as state_store_module
+from services.state_store import InMemoryStateStore, SQLiteStateStore, create_state_store
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store_factory(request, tmp_path):
+    def build(max_entries=100, ttl_seconds=3600):
+        if request.param == 'memory':
+            return InMemoryStateStore(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        return SQLiteStateStore(str(tmp_path / 'state.db'), max_entries=max_entries, ttl_seconds=ttl_seconds)
+    return build
+
+def test_expired_sessions_are_misses(store_factory):
+    store = store_factory(ttl_seconds=0.05)
+    store.set('u1', {'stage': 'kyc'})
+    assert store.get('u1') == {'stage': 'kyc'}
+    time.sleep(0.08)
+    assert store.get('u1') is None
+    stats = store.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (1, 1, 1)
+
+def test_least_recently_used_session_is_evicted(store_factory):
+    store = store_factory(max_entries=3)
+    for key in ('a', 'b', 'c'):
+        store.set(key, {'key': key})
+        time.sleep(0.002)
+    assert store.get('a') == {'key': 'a'}
+    store.set('d', {'key': 'd'})
+    assert store.size() == 3
+    assert store.get('b') is None
+    assert all(store.get(key) for key in ('a', 'c', 'd'))
+    assert store.stats()['evictions'] == 1
+
+def test_merge_updates_nested_data(store_factory):
+    store = store_factory()
+    created = store.merge('u1', {}, INITIAL_STATE)
+    assert created == INITIAL_STATE and created is not INITIAL_STATE
+    store.merge('u1', {'data': {'income': 50000}}, INITIAL_STATE)
+    store.merge('u1', {'stage': 'kyc', 'data': {'employment_type': 'salaried'}}, INITIAL_STATE)
+    assert store.get('u1') == {
+        'stage': 'kyc', 'data': {'income': 50000, 'employment_type': 'salaried'}, 'application_id': None
+    }
+    assert INITIAL_STATE['data'] == {}, 'the default is copied, never mutated'
+
+def test_concurrent_updates_are_not_lost(store_factory):
+    agent = MasterAgent(store_factory())
+
+    def writer(worker):
+        for i in range(25):
+            agent.update_state('u1', data={f'{worker}-{i}': i})
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    agent.set_application_id('u1', 'app-1')
+    assert len(agent.get_state_data('u1')) == 100
+    assert agent.get_application_id('u1') == 'app-1'
+
+def test_sqlite_reads_batch_recency_updates(tmp_path, monkeypatch):
+    store = SQLiteStateStore(str(tmp_path / 'state.db'))
+    monkeypatch.setattr(SQLiteStateStore, 'TOUCH_INTERVAL', 3600)
+    keys = [f'u{i}' for i in range(SQLiteStateStore.TOUCH_BATCH)]
+    for key in keys:
+        store.set(key, {})
+    conn = store._connection()
+    changes = conn.total_changes
+    for key in keys[:-1]:
+        assert store.get(key) == {}
+    assert conn.total_changes == changes, 'reads do not write until a batch is due'
+    store.get(keys[-1])
+    assert conn.total_changes == changes + len(keys)
+    assert not store._touched
+
+def test_sqlite_row_count_tracks_writes_and_deletes(tmp_path):
+    store = SQLiteStateStore(str(tmp_path / 'state.db'), max_entries=10)
+    for key in ('a', 'b', 'b', 'c'):
+        store.set(key, {})
+    store.delete('a')
+    store.delete('missing')
+    assert store._rows == store.size() == 2
+    # A second process's rows are counted on reopen
+    assert SQLiteStateStore(str(tmp_path / 'state.db'))._rows == 2
+
+def test_shared_store_requires_an_authkey(monkeypatch):
+    monkeypatch.setenv('STATE_STORE_BACKEND', 'shared')
+    monkeypatch.delenv('STATE_STORE_AUTHKEY', raising=False)
+    with pytest.raises(ValueError, match='STATE_STORE_AUTHKEY'):
+        create_state_store()
+
+def test_unreachable_shared_store_fails_instead_of_falling_back(monkeypatch):
+    monkeypatch.setenv('STATE_STORE_BACKEND', 'shared')
+    monkeypatch.setenv('STATE_STORE_AUTHKEY', 'test-secret')
+    monkeypatch.setenv('STATE_STORE_ADDRESS', '127.0.0.1:1')
+    with pytest.raises(RuntimeError, match='unreachable'):
+        create_state_store()
+
+def test_shared_store_merges_in_the_server(monkeypatch):
+    store = InMemoryStateStore()
+    manager_class = state_store_module._StateStoreManager
+    monkeypatch.setattr(manager_class, '_registry', dict(manager_class._registry))
+    manager_class.register('get_store', callable=lambda: store)
+    manager = manager_class(address=('127.0.0.1', 0), authkey=b'test-secret')
+    manager.start()
+    try:
+        client = state_store_module.SharedStateStore(manager.address, b'test-secret')
+        client.merge('u1', {'data': {'a': 1}}, INITIAL_STATE)
+        client.merge('u1', {'data': {'b': 2}}, INITIAL_STATE)
+        assert client.get('u1')['data'] == {'a': 1, 'b': 2}
+    finally:
+        manager.shutdown()
@@ -0,0 +1,7 @@
+-- Migration 001: composite index for /api/user/{user_id}/applications
+-- Serves WHERE user_id = $1 [AND (created_at, id) < ($2, $3)] ORDER BY created_at DESC, id DESC LIMIT n
+-- from one index range scan, with no sort and no OFFSET.
+-- Execute in the Supabase SQL Editor on databases created from an older schema.sql.
+
+CREATE INDEX IF NOT EXISTS idx_loan_applications_user_created
+    ON public.loan_applications(user_id, created_at DESC, id DESC);
@@ -0,0 +1,34 @@
+-- Migration 002: kyc_documents table (written by /api/upload-kyc) and its listing index
+-- The (user_id, created_at DESC, id DESC) index serves the cursor-paginated
+-- /api/kyc-documents/{user_id} listing without a sort or OFFSET scan.
+-- Execute in the Supabase SQL Editor on databases created from an older schema.sql.
+
+CREATE TABLE IF NOT EXISTS public.kyc_documents (
+    id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
+    user_id UUID REFERENCES public.users(id) ON DELETE CASCADE NOT NULL,
+    document_type TEXT NOT NULL,
+    file_name TEXT,
+    extracted_data JSONB DEFAULT '{}'::jsonb,
+    validation_status TEXT NOT NULL DEFAULT 'failed' CHECK (validation_status IN ('verified', 'failed')),
+    confidence TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_kyc_documents_user_created
+    ON public.kyc_documents(user_id, created_at DESC, id DESC);
+
+ALTER TABLE public.kyc_documents ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "Users can view own KYC documents" ON public.kyc_documents;
+CREATE POLICY "Users can view own KYC documents"
+    ON public.kyc_documents FOR SELECT
+    USING (auth.uid() = user_id);
+
+DROP POLICY IF EXISTS "Service role can manage all KYC documents" ON public.kyc_documents;
+CREATE POLICY "Service role can manage all KYC documents"
+    ON public.kyc_documents FOR ALL
+    USING (auth.jwt()->>'role' = 'service_role');
+
+GRANT ALL ON public.kyc_documents TO anon, authenticated;
+
+COMMENT ON TABLE public.kyc_documents IS 'KYC document OCR results and verification status';
@@ -0,0 +1,39 @@
+-- Migration 003: commit_unit_of_work(updates, audits) for UNIT_OF_WORK_RPC=on
+-- Applies a chat turn's loan_applications updates and audit_logs inserts in one call
+-- and one transaction, instead of one request per write. Keys absent from an update keep
+-- the column; a null value sets it NULL (as in a PostgREST update).
+-- Execute in the Supabase SQL Editor on databases created from an older schema.sql.
+
+CREATE OR REPLACE FUNCTION public.commit_unit_of_work(updates JSONB, audits JSONB)
+RETURNS VOID AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE public.loan_applications AS a
+    SET credit_score = CASE WHEN u ? 'credit_score' THEN (u->>'credit_score')::INTEGER ELSE a.credit_score END,
+        loan_amount = CASE WHEN u ? 'loan_amount' THEN (u->>'loan_amount')::NUMERIC ELSE a.loan_amount END,
+        interest_rate = CASE WHEN u ? 'interest_rate' THEN (u->>'interest_rate')::NUMERIC ELSE a.interest_rate END,
+        status = CASE WHEN u ? 'status' THEN u->>'status' ELSE a.status END
+    FROM jsonb_array_elements(updates) AS u
+    WHERE a.id = (u->>'id')::UUID;
+
+    -- One update per id: fewer rows means an application does not exist (rolls everything back)
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    IF updated < jsonb_array_length(updates) THEN
+        RAISE EXCEPTION 'commit_unit_of_work: % of % applications do not exist',
+            jsonb_array_length(updates) - updated, jsonb_array_length(updates);
+    END IF;
+
+    INSERT INTO public.audit_logs (user_id, action, agent_name, details, timestamp)
+    SELECT (e->>'user_id')::UUID,
+           e->>'action',
+           e->>'agent_name',
+           COALESCE(e->'details', '{}'::jsonb),
+           COALESCE((e->>'timestamp')::TIMESTAMPTZ, TIMEZONE('utc'::text, NOW()))
+    FROM jsonb_array_elements(audits) AS e;
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER SET search_path = public;
+
+-- Server-side only: runs with the caller's rights, and only service_role (which bypasses RLS) may call it
+REVOKE EXECUTE ON FUNCTION public.commit_unit_of_work(JSONB, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.commit_unit_of_work(JSONB, JSONB) TO service_role;
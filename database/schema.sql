@@ -57,12 +57,25 @@ CREATE TABLE IF NOT EXISTS public.audit_logs (
     timestamp TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
 );
 
+-- KYC Documents table (OCR results of uploaded PAN/Aadhaar/financial documents)
+CREATE TABLE IF NOT EXISTS public.kyc_documents (
+    id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
+    user_id UUID REFERENCES public.users(id) ON DELETE CASCADE NOT NULL,
+    document_type TEXT NOT NULL,
+    file_name TEXT,
+    extracted_data JSONB DEFAULT '{}'::jsonb,
+    validation_status TEXT NOT NULL DEFAULT 'failed' CHECK (validation_status IN ('verified', 'failed')),
+    confidence TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc'::text, NOW()) NOT NULL
+);
+
 -- Row Level Security (RLS) Policies
 
 -- Enable RLS
 ALTER TABLE public.users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.loan_applications ENABLE ROW LEVEL SECURITY;
 ALTER TABLE public.audit_logs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.kyc_documents ENABLE ROW LEVEL SECURITY;
 
 -- Users table policies
 CREATE POLICY "Users can view own profile"
@@ -99,10 +112,23 @@ CREATE POLICY "Service role can insert audit logs"
     ON public.audit_logs FOR INSERT
     WITH CHECK (true);
 
+-- KYC Documents policies
+CREATE POLICY "Users can view own KYC documents"
+    ON public.kyc_documents FOR SELECT
+    USING (auth.uid() = user_id);
+
+CREATE POLICY "Service role can manage all KYC documents"
+    ON public.kyc_documents FOR ALL
+    USING (auth.jwt()->>'role' = 'service_role');
+
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_loan_applications_user_id ON public.loan_applications(user_id);
 CREATE INDEX IF NOT EXISTS idx_loan_applications_status ON public.loan_applications(status);
 CREATE INDEX IF NOT EXISTS idx_loan_applications_created_at ON public.loan_applications(created_at DESC);
+-- Keyset pagination of a user's applications (newest first, id breaks ties)
+CREATE INDEX IF NOT EXISTS idx_loan_applications_user_created ON public.loan_applications(user_id, created_at DESC, id DESC);
+-- Keyset pagination of a user's KYC documents
+CREATE INDEX IF NOT EXISTS idx_kyc_documents_user_created ON public.kyc_documents(user_id, created_at DESC, id DESC);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_user_id ON public.audit_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_audit_logs_timestamp ON public.audit_logs(timestamp DESC);
 
@@ -121,6 +147,43 @@ CREATE TRIGGER update_loan_applications_updated_at
     FOR EACH ROW
     EXECUTE FUNCTION update_updated_at_column();
 
+-- Commit a chat turn's writes in one round-trip (SupabaseClient.commit, UNIT_OF_WORK_RPC=on):
+-- updates = [{"id", "credit_score", "loan_amount", "interest_rate", "status"}] (absent keys are kept, null sets NULL),
+-- audits = [{"user_id", "action", "agent_name", "details", "timestamp"}]
+CREATE OR REPLACE FUNCTION public.commit_unit_of_work(updates JSONB, audits JSONB)
+RETURNS VOID AS $$
+DECLARE
+    updated INTEGER;
+BEGIN
+    UPDATE public.loan_applications AS a
+    SET credit_score = CASE WHEN u ? 'credit_score' THEN (u->>'credit_score')::INTEGER ELSE a.credit_score END,
+        loan_amount = CASE WHEN u ? 'loan_amount' THEN (u->>'loan_amount')::NUMERIC ELSE a.loan_amount END,
+        interest_rate = CASE WHEN u ? 'interest_rate' THEN (u->>'interest_rate')::NUMERIC ELSE a.interest_rate END,
+        status = CASE WHEN u ? 'status' THEN u->>'status' ELSE a.status END
+    FROM jsonb_array_elements(updates) AS u
+    WHERE a.id = (u->>'id')::UUID;
+
+    -- One update per id: fewer rows means an application does not exist (rolls everything back)
+    GET DIAGNOSTICS updated = ROW_COUNT;
+    IF updated < jsonb_array_length(updates) THEN
+        RAISE EXCEPTION 'commit_unit_of_work: % of % applications do not exist',
+            jsonb_array_length(updates) - updated, jsonb_array_length(updates);
+    END IF;
+
+    INSERT INTO public.audit_logs (user_id, action, agent_name, details, timestamp)
+    SELECT (e->>'user_id')::UUID,
+           e->>'action',
+           e->>'agent_name',
+           COALESCE(e->'details', '{}'::jsonb),
+           COALESCE((e->>'timestamp')::TIMESTAMPTZ, TIMEZONE('utc'::text, NOW()))
+    FROM jsonb_array_elements(audits) AS e;
+END;
+$$ LANGUAGE plpgsql SECURITY INVOKER SET search_path = public;
+
+-- Server-side only: runs with the caller's rights, and only service_role (which bypasses RLS) may call it
+REVOKE EXECUTE ON FUNCTION public.commit_unit_of_work(JSONB, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.commit_unit_of_work(JSONB, JSONB) TO service_role;
+
 -- Grant permissions
 GRANT USAGE ON SCHEMA public TO anon, authenticated;
 GRANT ALL ON ALL TABLES IN SCHEMA public TO anon, authenticated;
@@ -130,3 +193,4 @@ GRANT ALL ON ALL SEQUENCES IN SCHEMA public TO anon, authenticated;
 COMMENT ON TABLE public.users IS 'User profiles extending Supabase auth';
 COMMENT ON TABLE public.loan_applications IS 'Loan application records with status tracking';
 COMMENT ON TABLE public.audit_logs IS 'Audit trail for all user and agent actions';
+COMMENT ON TABLE public.kyc_documents IS 'KYC document OCR results and verification status';